@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Приближённый поиск ближайших соседей (IVF) по нормированным эмбеддингам — чистый NumPy.
+
+Эмбеддинги разбиваются на n_lists кластеров (сферический k-means); на запрос просматриваются
+nprobe ближайших к запросу кластеров, и косинус считается только по их строкам. Фильтр
+(булева маска по строкам) применяется до подсчёта близости: чем он уже, тем больше кластеров
+просматривается, и в любом случае — пока не наберётся n подходящих строк.
+
+Компромисс recall@n / задержка: scripts/bench_ann.py.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+import numpy as np
+
+# Сколько строк назначаем кластерам за один матричный шаг (ограничивает пиковую память)
+_ASSIGN_CHUNK = 16384
+
+
+def default_n_lists(n_rows: int) -> int:
+    """Число кластеров: ~sqrt(N), но не меньше 16 и не больше 4096."""
+    return int(min(4096, max(16, round(np.sqrt(n_rows)))))
+
+
+def top_n(scores: np.ndarray, n: int, ids: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Индексы n наибольших scores по убыванию (argpartition, без полной сортировки).
+    При равенстве — по возрастанию ids (по умолчанию — позиции в scores).
+    """
+    if ids is None:
+        ids = np.arange(len(scores))
+    if len(scores) > n:
+        idx = np.argpartition(-scores, n - 1)[:n]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.lexsort((ids[idx], -scores[idx]))]
+
+
+def _assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Номер ближайшего (по косинусу) центроида для каждой строки x."""
+    labels = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), _ASSIGN_CHUNK):
+        chunk = np.asarray(x[start:start + _ASSIGN_CHUNK], dtype=np.float32)
+        labels[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return labels
+
+
+def _normalize_rows(x: np.ndarray) -> np.ndarray:
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-12)
+
+
+def _spherical_kmeans(x: np.ndarray, k: int, iters: int, rng: np.random.Generator) -> np.ndarray:
+    """Сферический k-means: центроиды — нормированные средние своих строк."""
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(x, centroids)
+        order = np.argsort(labels, kind="stable")
+        sorted_labels = labels[order]
+        present, starts = np.unique(sorted_labels, return_index=True)
+        sums = np.add.reduceat(x[order], starts, axis=0)
+        centroids[present] = _normalize_rows(sums)
+        # Пустые кластеры — переинициализируем случайными строками
+        empty = np.setdiff1d(np.arange(k), present)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), size=len(empty), replace=False)]
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Инвертированный индекс: центроиды (n_lists, dim) + строки, сгруппированные по кластерам
+    (rows[offsets[i]:offsets[i + 1]] — строки кластера i).
+    """
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.rows = np.asarray(rows, dtype=np.int64)
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        n_lists: Optional[int] = None,
+        train_size: Optional[int] = None,
+        iters: int = 10,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """
+        Обучение центроидов на подвыборке (по умолчанию 64 строки на кластер) и назначение всех строк.
+        embeddings — нормированные (как в индексе эмбеддингов PlaceSearch).
+        """
+        n = len(embeddings)
+        n_lists = min(n_lists or default_n_lists(n), n)
+        rng = np.random.default_rng(seed)
+        train_size = min(n, train_size or max(64 * n_lists, 10_000))
+        sample_rows = np.sort(rng.choice(n, size=train_size, replace=False))
+        sample = np.asarray(embeddings[sample_rows], dtype=np.float32)
+        centroids = _spherical_kmeans(sample, n_lists, iters, rng)
+
+        labels = _assign(embeddings, centroids)
+        rows = np.argsort(labels, kind="stable")
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+        return cls(centroids, offsets, rows)
+
+    def save(self, path: str) -> None:
+        """Атомарная запись в .npz (временный файл + переименование)."""
+        tmp_path = f"{path}.tmp{os.getpid()}.npz"
+        np.savez(tmp_path, centroids=self.centroids, offsets=self.offsets, rows=self.rows)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, n_rows: int) -> Optional["IVFIndex"]:
+        """Загрузить индекс; None — если файла нет или он построен для другого числа строк."""
+        if not os.path.isfile(path):
+            return None
+        try:
+            with np.load(path) as data:
+                index = cls(data["centroids"], data["offsets"], data["rows"])
+        except (OSError, ValueError, KeyError):
+            return None
+        return index if index.n_rows == n_rows else None
+
+    def search(
+        self,
+        embeddings: np.ndarray,
+        query: np.ndarray,
+        n: int,
+        mask: Optional[np.ndarray] = None,
+        nprobe: int = 16,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Топ-n строк по косинусу с запросом: (номера строк, близости) по убыванию близости.
+        mask — булев фильтр по строкам (применяется до подсчёта близости).
+        Просматривается не меньше nprobe / sqrt(доля строк, прошедших фильтр) кластеров и не меньше,
+        чем нужно для n подходящих строк.
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        if mask is not None:
+            # Узкий фильтр: подходящих строк в каждом кластере мало — просматриваем больше кластеров
+            selectivity = max(float(np.count_nonzero(mask)) / max(len(mask), 1), 1e-6)
+            nprobe = int(np.ceil(nprobe / np.sqrt(selectivity)))
+        list_order = np.argsort(-(self.centroids @ query), kind="stable")
+        candidates: list[np.ndarray] = []
+        found = 0
+        for probed, list_id in enumerate(list_order, 1):
+            rows = self.rows[self.offsets[list_id]:self.offsets[list_id + 1]]
+            if mask is not None:
+                rows = rows[mask[rows]]
+            if len(rows):
+                candidates.append(rows)
+                found += len(rows)
+            if probed >= nprobe and found >= n:
+                break
+        if not candidates:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        rows = np.sort(np.concatenate(candidates))
+        scores = np.asarray(embeddings[rows], dtype=np.float32) @ query
+        top = top_n(scores, n, ids=rows)
+        return rows[top], scores[top]
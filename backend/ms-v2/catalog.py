@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Колоночный каталог заведений: CSV один раз конвертируется в Parquet, дальше каждый потребитель
+читает только нужные ему колонки (без повторного парсинга CSV в каждом блоке).
+
+Каталог — папка с тремя файлами:
+  places.parquet — уже схлопнутый по названию датафрейм (build_places_df) для PlaceSearch;
+  rows.parquet   — исходные строки CSV + нормализованные колонки для матчинга по названию/адресу;
+  meta.json      — отпечаток CSV (sha256, размер, mtime), по которому проверяется свежесть.
+Повторяющиеся строковые колонки (типы, кухни, типы меню…) хранятся как categorical.
+
+Сборка:
+  python catalog.py build-catalog --csv /app/final_blyat_v3.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+# Папка с каталогами (одна подпапка на CSV)
+_CATALOG_ROOT = os.environ.get("PLACE_CATALOG_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "catalog"
+)
+_PLACES_FILE = "places.parquet"
+_ROWS_FILE = "rows.parquet"
+_META_FILE = "meta.json"
+# Повышать при изменении состава файлов или правил нормализации
+CATALOG_FORMAT_VERSION = 1
+
+# Нормализованные колонки в rows.parquet:
+#   _name_key  — название по правилам block2 (_norm): регистр, ё→е, пробелы;
+#   _name_norm — название по правилам block3 (_norm_text): то же + без кавычек;
+#   _addr_norm — адрес по правилам block3.
+NORM_COLUMNS = ("_name_key", "_name_norm", "_addr_norm")
+
+# Строковые колонки с долей уникальных значений не выше порога храним как categorical
+_CATEGORICAL_MAX_UNIQUE_RATIO = 0.5
+
+
+def normalize_name(value: Any) -> str:
+    """Ключ названия для поиска ссылок на меню (как _norm в block2)."""
+    return re.sub(r"\s+", " ", str(value or "").strip().lower().replace("ё", "е"))
+
+
+def normalize_text(value: Any) -> str:
+    """Нормализация названия/адреса для матчинга строк базы (как _norm_text в block3)."""
+    s = str(value or "").strip().lower().replace("ё", "е")
+    s = re.sub(r"[\"'`«»]", "", s)
+    s = re.sub(r"\s+", " ", s)
+    return s
+
+
+def _add_norm_columns(df: pd.DataFrame, columns: tuple[str, ...] = NORM_COLUMNS) -> pd.DataFrame:
+    """Добавляет NORM_COLUMNS (или только columns); каждая уникальная строка нормализуется один раз."""
+    sources = {"_name_key": ("название", normalize_name), "_name_norm": ("название", normalize_text),
+               "_addr_norm": ("адрес", normalize_text)}
+    df = df.copy()
+    for column in columns:
+        source, normalize = sources[column]
+        values = df[source].fillna("").astype(str) if source in df.columns else pd.Series("", index=df.index)
+        unique = values.unique()
+        df[column] = values.map(dict(zip(unique, map(normalize, unique))))
+    return df
+
+
+def _categorize(df: pd.DataFrame, exclude: tuple[str, ...] = ()) -> pd.DataFrame:
+    """Строковые колонки с большим числом повторов → categorical (меньше места, быстрее чтение)."""
+    df = df.copy()
+    n = max(len(df), 1)
+    for col in df.columns:
+        if col in exclude or df[col].dtype != object:
+            continue
+        values = df[col].dropna()
+        if len(values) == 0 or not values.map(type).eq(str).all():
+            continue
+        if values.nunique() / n <= _CATEGORICAL_MAX_UNIQUE_RATIO:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def catalog_dir_for(csv_path: str) -> str:
+    """Папка каталога для CSV (по имени файла + хешу абсолютного пути)."""
+    abs_path = os.path.abspath(csv_path)
+    stem = os.path.splitext(os.path.basename(abs_path))[0]
+    key = hashlib.sha256(abs_path.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(_CATALOG_ROOT, f"{stem}_{key}")
+
+
+def read_catalog_meta(catalog_dir: str) -> Optional[dict[str, Any]]:
+    """meta.json каталога или None, если каталога нет / он другой версии формата."""
+    try:
+        with open(os.path.join(catalog_dir, _META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format_version") != CATALOG_FORMAT_VERSION:
+        return None
+    return meta
+
+
+def _refresh_meta_stat(catalog_dir: str, meta: dict[str, Any], st: os.stat_result) -> None:
+    """
+    Содержимое CSV то же (совпал sha256), изменились только размер/mtime (touch, копия, деплой) —
+    обновить их в meta.json, чтобы следующая проверка свежести снова обошлась без хеширования.
+    """
+    if (st.st_size, st.st_mtime_ns) == (meta.get("csv_size"), meta.get("csv_mtime_ns")):
+        return
+    meta = {**meta, "csv_size": st.st_size, "csv_mtime_ns": st.st_mtime_ns}
+    tmp_path = os.path.join(catalog_dir, f"{_META_FILE}.tmp{os.getpid()}")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, os.path.join(catalog_dir, _META_FILE))
+    except OSError:
+        # Каталог только для чтения или его подменили — проверка просто останется по sha256
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+
+
+def find_catalog(csv_path: str, fingerprint: Optional[str] = None) -> Optional[str]:
+    """
+    Папка свежего каталога для CSV или None.
+    Свежесть: совпали размер и mtime файла; иначе — совпал sha256 (fingerprint можно передать готовым).
+    """
+    catalog_dir = catalog_dir_for(csv_path)
+    meta = read_catalog_meta(catalog_dir)
+    if meta is None:
+        return None
+    try:
+        st = os.stat(csv_path)
+    except OSError:
+        return None
+    if fingerprint is None and (st.st_size, st.st_mtime_ns) == (meta.get("csv_size"), meta.get("csv_mtime_ns")):
+        return catalog_dir
+    from place_search import dataset_fingerprint
+    fingerprint = fingerprint or dataset_fingerprint(csv_path)
+    if fingerprint != meta.get("fingerprint"):
+        return None
+    _refresh_meta_stat(catalog_dir, meta, st)
+    return catalog_dir
+
+
+def build_catalog(csv_path: str, force: bool = False) -> str:
+    """
+    Собрать каталог для CSV (если свежий уже есть и не force — вернуть его).
+    Пишется во временную папку и подменяется целиком, чтобы читатели не видели полусобранный каталог.
+    """
+    from place_search import build_places_df, dataset_fingerprint
+
+    out_dir = catalog_dir_for(csv_path)
+    fingerprint = dataset_fingerprint(csv_path)
+    if not force:
+        meta = read_catalog_meta(out_dir)
+        if meta is not None and meta.get("fingerprint") == fingerprint:
+            _refresh_meta_stat(out_dir, meta, os.stat(csv_path))
+            return out_dir
+
+    st = os.stat(csv_path)
+    t0 = time.perf_counter()
+    # Читаем так же, как PlaceSearch.from_csv, — чтобы places.parquet совпадал с его датафреймом
+    raw = pd.read_csv(csv_path)
+    places = build_places_df(raw)
+    rows = _add_norm_columns(raw)
+
+    os.makedirs(_CATALOG_ROOT, exist_ok=True)
+    tmp_dir = f"{out_dir}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    _categorize(places, exclude=("название",)).to_parquet(os.path.join(tmp_dir, _PLACES_FILE), index=False)
+    _categorize(rows, exclude=NORM_COLUMNS).to_parquet(os.path.join(tmp_dir, _ROWS_FILE), index=False)
+    meta = {
+        "format_version": CATALOG_FORMAT_VERSION,
+        "csv_path": os.path.abspath(csv_path),
+        "csv_size": st.st_size,
+        "csv_mtime_ns": st.st_mtime_ns,
+        "fingerprint": fingerprint,
+        "n_rows": len(rows),
+        "n_places": len(places),
+        "build_seconds": round(time.perf_counter() - t0, 2),
+    }
+    with open(os.path.join(tmp_dir, _META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    old_dir = f"{out_dir}.old{os.getpid()}"
+    if os.path.isdir(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return out_dir
+
+
+def _read_parquet(path: str, columns: Optional[list[str]]) -> pd.DataFrame:
+    """Parquet → DataFrame; пропуски в строковых колонках — NaN (как после read_csv), а не None."""
+    df = pd.read_parquet(path, columns=columns)
+    for col in df.columns:
+        if df[col].dtype == object:
+            missing = df[col].isna()
+            if missing.any():
+                df[col] = df[col].where(~missing, np.nan)
+    return df
+
+
+def read_places(catalog_dir: str, columns: Optional[list[str]] = None) -> pd.DataFrame:
+    """Схлопнутые заведения из каталога (только нужные колонки)."""
+    return _read_parquet(os.path.join(catalog_dir, _PLACES_FILE), columns)
+
+
+def read_rows(catalog_dir: str, columns: Optional[list[str]] = None) -> pd.DataFrame:
+    """Исходные строки CSV + NORM_COLUMNS из каталога (только нужные колонки)."""
+    return _read_parquet(os.path.join(catalog_dir, _ROWS_FILE), columns)
+
+
+def load_rows(csv_path: str, columns: Optional[list[str]] = None) -> pd.DataFrame:
+    """
+    Строки базы для потребителей (block2/block3): из каталога, если он свежий, иначе — из CSV
+    с теми же нормализованными колонками. columns=None — все колонки, включая NORM_COLUMNS.
+    """
+    catalog_dir = find_catalog(csv_path)
+    if catalog_dir is not None:
+        try:
+            return read_rows(catalog_dir, columns)
+        except Exception as e:
+            print(f"[catalog] Не удалось прочитать {catalog_dir}: {e} — читаем CSV", flush=True)
+
+    wanted_norm = list(NORM_COLUMNS) if columns is None else [c for c in columns if c in NORM_COLUMNS]
+    usecols = None
+    if columns is not None:
+        # Для нормализованных колонок читаем только их исходные (название и/или адрес)
+        sources = {"адрес" if c == "_addr_norm" else "название" for c in wanted_norm}
+        usecols = {c for c in columns if c not in NORM_COLUMNS} | sources
+    df = pd.read_csv(csv_path, usecols=(lambda c: c in usecols) if usecols is not None else None)
+    if wanted_norm:
+        df = _add_norm_columns(df, tuple(wanted_norm))
+    return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Колоночный каталог заведений (CSV → Parquet)")
+    sub = p.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build-catalog", help="Собрать каталог из CSV")
+    build.add_argument("--csv", default=os.environ.get("SOURCE_CSV", "final_blyat_v3.csv"), help="Путь к CSV")
+    build.add_argument("--force", action="store_true", help="Пересобрать, даже если каталог свежий")
+    args = p.parse_args(argv)
+
+    if args.command == "build-catalog":
+        if not os.path.isfile(args.csv):
+            print(f"[catalog] CSV не найден: {args.csv}", file=sys.stderr)
+            return 1
+        out_dir = build_catalog(args.csv, force=args.force)
+        meta = read_catalog_meta(out_dir) or {}
+        print(
+            f"[catalog] {out_dir}: {meta.get('n_rows')} строк, {meta.get('n_places')} заведений "
+            f"(fingerprint {meta.get('fingerprint')})",
+            flush=True,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
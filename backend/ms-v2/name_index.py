@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Индекс нормализованных названий (или адресов) для поиска строк базы без полного прохода по датафрейму.
+
+Точное совпадение — хеш-таблица «ключ → строки»; мягкий поиск по вхождению (как
+Series.str.contains(..., regex=False)) — инвертированный индекс символьных триграмм:
+кандидаты — ключи, содержащие все триграммы запроса, затем проверка `needle in key`.
+Строки возвращаются в порядке позиций в датафрейме, поэтому «первая найденная» строка
+та же, что и при фильтрации маской.
+
+Хеш-таблица строится сразу. Триграммы на сотнях тысяч уникальных названий строятся пару секунд,
+а один проход `needle in key` по ним — десятки миллисекунд, поэтому первые _SCANS_BEFORE_POSTINGS
+мягких запросов идут проходом по уникальным ключам, и только потом строится индекс триграмм.
+Индекс переиспользуется: PlaceSearch.name_index() — на движок, load_name_index() — на CSV/каталог.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Callable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+_EMPTY = np.empty(0, dtype=np.int64)
+# Столько мягких запросов — проходом по ключам; дальше строится индекс триграмм
+_SCANS_BEFORE_POSTINGS = 64
+
+# Процессный кэш load_name_index: (путь, колонка) → (размер, mtime, индекс)
+_LOADED: dict[tuple[str, str], tuple[int, int, "NameIndex"]] = {}
+_LOADED_LOCK = threading.Lock()
+
+
+def _trigrams(s: str) -> set[str]:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class NameIndex:
+    """
+    Ключи по строкам датафрейма (позиции 0..n-1). normalize применяется к значениям колонки
+    (NaN → "") и к запросам; None — значения уже нормализованы (например, колонки каталога _name_key).
+    """
+
+    def __init__(self, values: Iterable[Any], normalize: Optional[Callable[[str], str]] = None):
+        self._normalize = normalize
+        raw = pd.Series(values.to_numpy() if isinstance(values, pd.Series) else list(values), dtype=object)
+        codes, uniques = pd.factorize(raw.fillna("").astype(str), sort=False)
+        if normalize is not None:
+            # Нормализуем только уникальные значения; разные исходные строки могут слиться в один ключ
+            normalized = np.asarray([normalize(u) for u in uniques], dtype=object)
+            codes, keys = pd.factorize(normalized[codes], sort=False)
+        else:
+            keys = uniques
+        self._keys: list[str] = [str(k) for k in keys]
+        self._key_id = {key: i for i, key in enumerate(self._keys)}
+        self.n_rows = len(codes)
+
+        # Строки ключа i — _order[_offsets[i]:_offsets[i + 1]] (по возрастанию позиции)
+        self._order = np.argsort(codes, kind="stable").astype(np.int64)
+        self._offsets = np.zeros(len(self._keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(self._keys)), out=self._offsets[1:])
+        self._first_row = self._order[self._offsets[:-1]] if len(self._keys) else _EMPTY
+        self._postings: Optional[dict[str, np.ndarray]] = None
+        self._postings_lock = threading.Lock()
+        self._n_scans = 0
+
+    def _get_postings(self) -> dict[str, np.ndarray]:
+        """Триграмма → номера ключей, которые её содержат (по возрастанию)."""
+        with self._postings_lock:
+            if self._postings is None:
+                postings: dict[str, list[int]] = {}
+                for key_id, key in enumerate(self._keys):
+                    for gram in _trigrams(key):
+                        postings.setdefault(gram, []).append(key_id)
+                self._postings = {gram: np.asarray(ids, dtype=np.int64) for gram, ids in postings.items()}
+            return self._postings
+
+    def _norm(self, query: Any) -> str:
+        query = "" if query is None else str(query)
+        return self._normalize(query) if self._normalize is not None else query
+
+    def _rows_of(self, key_ids: np.ndarray) -> np.ndarray:
+        if len(key_ids) == 0:
+            return _EMPTY
+        parts = [self._order[self._offsets[k]:self._offsets[k + 1]] for k in key_ids]
+        return np.sort(np.concatenate(parts))
+
+    def _matching_keys(self, needle: str) -> np.ndarray:
+        """Номера ключей, содержащих needle как подстроку."""
+        grams = _trigrams(needle)
+        if grams and self._postings is None:
+            with self._postings_lock:
+                self._n_scans += 1
+                scan = self._n_scans <= _SCANS_BEFORE_POSTINGS
+            if scan:
+                return np.asarray([k for k, key in enumerate(self._keys) if needle in key], dtype=np.int64)
+        if grams:
+            postings = self._get_postings()
+            lists = [postings.get(gram) for gram in grams]
+            if any(ids is None for ids in lists):
+                return _EMPTY
+            lists.sort(key=len)
+            candidates = lists[0]
+            for ids in lists[1:]:
+                candidates = np.intersect1d(candidates, ids, assume_unique=True)
+                if len(candidates) == 0:
+                    return _EMPTY
+        else:
+            # Запрос короче триграммы — проверяем все уникальные ключи (их всё равно меньше, чем строк)
+            candidates = np.arange(len(self._keys), dtype=np.int64)
+        return np.asarray([k for k in candidates if needle in self._keys[k]], dtype=np.int64)
+
+    def exact(self, query: Any) -> np.ndarray:
+        """Позиции строк с ключом, равным нормализованному запросу (по возрастанию)."""
+        key_id = self._key_id.get(self._norm(query))
+        if key_id is None:
+            return _EMPTY
+        return self._order[self._offsets[key_id]:self._offsets[key_id + 1]]
+
+    def contains(self, query: Any) -> np.ndarray:
+        """Позиции строк, ключ которых содержит нормализованный запрос (как str.contains(regex=False))."""
+        return self._rows_of(self._matching_keys(self._norm(query)))
+
+    def first(self, query: Any, fuzzy: bool = True) -> Optional[int]:
+        """
+        Позиция первой строки: с точным совпадением ключа, иначе (fuzzy) — первой строки,
+        ключ которой содержит запрос. None — если не нашлось.
+        """
+        rows = self.exact(query)
+        if len(rows):
+            return int(rows[0])
+        if not fuzzy:
+            return None
+        key_ids = self._matching_keys(self._norm(query))
+        if len(key_ids) == 0:
+            return None
+        return int(self._first_row[key_ids].min())
+
+
+def load_name_index(csv_path: str, column: str) -> NameIndex:
+    """
+    NameIndex по уже нормализованной колонке строк базы (catalog.load_rows, например "_name_key").
+    Позиции совпадают с порядком строк load_rows. Хранится в процессе, пока не изменился CSV.
+    """
+    from catalog import load_rows
+
+    abs_path = os.path.abspath(csv_path)
+    st = os.stat(abs_path)
+    with _LOADED_LOCK:
+        cached = _LOADED.get((abs_path, column))
+        if cached is not None and cached[:2] == (st.st_size, st.st_mtime_ns):
+            return cached[2]
+        index = NameIndex(load_rows(abs_path, columns=[column])[column])
+        _LOADED[(abs_path, column)] = (st.st_size, st.st_mtime_ns, index)
+        return index
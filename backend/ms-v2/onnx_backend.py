@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Инференс CPU-моделей через ONNX Runtime с динамическим int8-квантованием — вместо eager PyTorch
+для энкодера описаний (place_search.py) и модели тональности отзывов (block3, sentiment.py).
+
+Модель один раз экспортируется из PyTorch в ONNX (нужны torch и transformers, для энкодера —
+sentence-transformers), веса линейных слоёв квантуются в int8 (onnxruntime.quantization.quantize_dynamic),
+и результат вместе с токенизатором сохраняется в ONNX_MODEL_DIR. Дальше для инференса нужны
+только onnxruntime и токенизатор. Выход int8 немного отличается от PyTorch, поэтому индекс
+эмбеддингов для ONNX-энкодера хранится отдельно (см. encoder_key). Сверка меток и косинусов
+с PyTorch, а также замер задержки и памяти — scripts/bench_onnx.py.
+
+Настройки (env):
+  INFERENCE_BACKEND=onnx    — ONNX Runtime для обеих моделей (по умолчанию torch);
+  ONNX_QUANTIZE=0           — без int8-квантования (fp32 ONNX);
+  ONNX_MODEL_DIR            — папка экспортированных моделей (по умолчанию <project>/onnx_models);
+  ONNX_THREADS              — потоков ONNX Runtime на сессию (по умолчанию min(4, число ядер)).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from typing import Any, NamedTuple, Optional
+
+import numpy as np
+
+_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch").strip().lower()
+_QUANTIZE = os.environ.get("ONNX_QUANTIZE", "1") != "0"
+_MODEL_ROOT = os.environ.get("ONNX_MODEL_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "onnx_models"
+)
+_THREADS = int(os.environ.get("ONNX_THREADS", "0")) or min(4, os.cpu_count() or 1)
+
+_MODEL_FILE = "model.onnx"
+_META_FILE = "meta.json"
+_OPSET = 17
+# Входы трансформера, которые может отдавать токенизатор (порядок — как в экспорте)
+_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def onnx_enabled() -> bool:
+    """Выбран ли ONNX Runtime (INFERENCE_BACKEND=onnx)."""
+    return _BACKEND == "onnx"
+
+
+def _variant() -> str:
+    return "onnx-int8" if _QUANTIZE else "onnx-fp32"
+
+
+def encoder_key(model_name: str) -> str:
+    """Имя энкодера для ключа индекса эмбеддингов: с ONNX — с суффиксом варианта, иначе как есть."""
+    return f"{model_name}:{_variant()}" if onnx_enabled() else model_name
+
+
+def _model_dir(model_name: str, kind: str) -> str:
+    safe_name = model_name.replace("/", "_").replace(os.sep, "_").strip()
+    return os.path.join(_MODEL_ROOT, f"{safe_name}_{kind}_{_variant()}")
+
+
+def _session(model_dir: str):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = max(1, _THREADS)
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(
+        os.path.join(model_dir, _MODEL_FILE), sess_options=options, providers=["CPUExecutionProvider"]
+    )
+
+
+def _export(model_dir: str, hf_model, tokenizer, output_axes: dict[int, str], meta: dict[str, Any]) -> None:
+    """
+    Экспорт HF-модели (первый выход forward) в ONNX с динамическими batch/seq, int8-квантование,
+    токенизатор и meta.json рядом. Пишется во временную папку, затем переименование.
+    """
+    import torch
+
+    sample = tokenizer(["пример текста", "ещё один, немного длиннее"], padding=True, return_tensors="pt")
+    names = [name for name in _INPUT_NAMES if name in sample]
+
+    class _FirstOutput(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(names, inputs)))[0]
+
+    os.makedirs(_MODEL_ROOT, exist_ok=True)
+    tmp_dir = f"{model_dir}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    fp32_path = os.path.join(tmp_dir, "model.fp32.onnx")
+    export_kwargs: dict[str, Any] = {
+        "input_names": names,
+        "output_names": ["output"],
+        "dynamic_axes": {**{name: {0: "batch", 1: "seq"} for name in names}, "output": output_axes},
+        "opset_version": _OPSET,
+    }
+    hf_model.eval()
+    with torch.no_grad():
+        args = tuple(sample[name] for name in names)
+        try:
+            # torch >= 2.5: экспорт через TorchScript (dynamic_axes), а не через dynamo
+            torch.onnx.export(_FirstOutput(hf_model), args, fp32_path, dynamo=False, **export_kwargs)
+        except TypeError:
+            torch.onnx.export(_FirstOutput(hf_model), args, fp32_path, **export_kwargs)
+
+    model_path = os.path.join(tmp_dir, _MODEL_FILE)
+    if _QUANTIZE:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(fp32_path, model_path, weight_type=QuantType.QInt8)
+        os.remove(fp32_path)
+    else:
+        os.replace(fp32_path, model_path)
+    tokenizer.save_pretrained(tmp_dir)
+    with open(os.path.join(tmp_dir, _META_FILE), "w", encoding="utf-8") as f:
+        json.dump({**meta, "inputs": names, "variant": _variant()}, f, ensure_ascii=False, indent=2)
+    try:
+        os.replace(tmp_dir, model_dir)
+    except OSError:
+        # Модель уже экспортировал параллельный процесс — оставляем её
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _read_meta(model_dir: str) -> Optional[dict[str, Any]]:
+    try:
+        with open(os.path.join(model_dir, _META_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class ClassifierOutput(NamedTuple):
+    logits: np.ndarray
+
+
+class OnnxSequenceClassifier:
+    """Классификатор последовательностей в ONNX Runtime: model(**enc).logits, как у HF-модели."""
+
+    # Тензоры, которые нужно просить у токенизатора
+    return_tensors = "np"
+
+    def __init__(self, model_dir: str):
+        self._session = _session(model_dir)
+        self._inputs = [i.name for i in self._session.get_inputs()]
+
+    def __call__(self, **enc: Any) -> ClassifierOutput:
+        feeds = {name: np.asarray(enc[name], dtype=np.int64) for name in self._inputs}
+        return ClassifierOutput(self._session.run(None, feeds)[0])
+
+
+def load_sequence_classifier(model_name: str):
+    """(OnnxSequenceClassifier, токенизатор) для HF-классификатора; при первом вызове — экспорт."""
+    from transformers import AutoTokenizer
+
+    model_dir = _model_dir(model_name, "cls")
+    if _read_meta(model_dir) is None:
+        from transformers import AutoModelForSequenceClassification
+
+        print(f"[onnx] Экспорт {model_name} ({_variant()}) → {model_dir}", flush=True)
+        _export(
+            model_dir,
+            AutoModelForSequenceClassification.from_pretrained(model_name),
+            AutoTokenizer.from_pretrained(model_name),
+            {0: "batch"},
+            {"model_name": model_name, "kind": "sequence-classification"},
+        )
+    return OnnxSequenceClassifier(model_dir), AutoTokenizer.from_pretrained(model_dir)
+
+
+class OnnxSentenceEncoder:
+    """
+    Энкодер предложений в ONNX Runtime с интерфейсом SentenceTransformer.encode: промпты
+    (prompt_name), пулинг (cls / mean) и усечение — из настроек исходной модели.
+    """
+
+    def __init__(self, model_dir: str, meta: dict[str, Any]):
+        from transformers import AutoTokenizer
+
+        self._session = _session(model_dir)
+        self._inputs = [i.name for i in self._session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.prompts: dict[str, str] = meta.get("prompts") or {}
+        self.max_seq_length = int(meta.get("max_seq_length") or 512)
+        self._pooling = meta.get("pooling") or "mean"
+        self._normalize = bool(meta.get("normalize"))
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        enc = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np"
+        )
+        feeds = {name: np.asarray(enc[name], dtype=np.int64) for name in self._inputs}
+        hidden = self._session.run(None, feeds)[0]
+        if self._pooling == "cls":
+            return hidden[:, 0]
+        mask = feeds["attention_mask"][..., None].astype(hidden.dtype)
+        return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+    def encode(
+        self,
+        sentences: str | list[str],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        prompt_name: Optional[str] = None,
+        show_progress_bar: Optional[bool] = None,
+        **_kwargs: Any,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else [str(s) for s in sentences]
+        prefix = self.prompts.get(prompt_name, "") if prompt_name else ""
+        texts = [prefix + t for t in texts]
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        # Как в sentence-transformers: батчи из текстов близкой длины, затем исходный порядок
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        chunks = [
+            self._encode_batch([texts[k] for k in order[i:i + batch_size]])
+            for i in range(0, len(texts), batch_size)
+        ]
+        embeddings = np.empty((len(texts), chunks[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(chunks)
+        if normalize_embeddings or self._normalize:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
+
+def load_sentence_encoder(model_name: str, source: Optional[str] = None) -> OnnxSentenceEncoder:
+    """
+    OnnxSentenceEncoder для модели sentence-transformers; при первом вызове — экспорт из source
+    (локальная папка с весами) или из model_name.
+    """
+    model_dir = _model_dir(model_name, "encoder")
+    meta = _read_meta(model_dir)
+    if meta is None:
+        from sentence_transformers import SentenceTransformer
+
+        print(f"[onnx] Экспорт {model_name} ({_variant()}) → {model_dir}", flush=True)
+        st = SentenceTransformer(source or model_name, tokenizer_kwargs={"fix_mistral_regex": True}, device="cpu")
+        pooling = st[1].get_pooling_mode_str() if len(st) > 1 and hasattr(st[1], "get_pooling_mode_str") else "mean"
+        if pooling not in ("cls", "mean"):
+            raise ValueError(f"Пулинг {pooling!r} не поддерживается ONNX-энкодером")
+        _export(
+            model_dir,
+            st[0].auto_model,
+            st[0].tokenizer,
+            {0: "batch", 1: "seq"},
+            {
+                "model_name": model_name,
+                "kind": "sentence-encoder",
+                "prompts": dict(st.prompts or {}),
+                "pooling": pooling,
+                "max_seq_length": st.max_seq_length,
+                "normalize": any(type(module).__name__ == "Normalize" for module in st),
+            },
+        )
+        meta = _read_meta(model_dir)
+        if meta is None:
+            raise RuntimeError(f"Экспорт энкодера в ONNX не удался: {model_dir}")
+    return OnnxSentenceEncoder(model_dir, meta)
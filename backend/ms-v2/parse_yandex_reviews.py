@@ -1,8 +1,11 @@
 import time as t
 import argparse
 import json
+import os
+import queue
 import random
 import re
+import threading
 import time
 from pathlib import Path
 from urllib.parse import quote_plus
@@ -13,10 +16,16 @@ import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.common.exceptions import NoSuchElementException, TimeoutException, StaleElementReferenceException
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
+)
 
 
 # Парсер отзывов (открывает свою страницу по org_id)
+from yandex_cache import ORG_HIT, ORG_NOT_FOUND, OrgIdCache, ReviewStore, review_key
 from yandex_reviews_parser.utils import YandexParser
 from yandex_reviews_parser.parsers import Parser
 from yandex_reviews_parser.helpers import ParserHelper
@@ -166,9 +175,54 @@ _original_open_page = YandexParser._YandexParser__open_page  # noqa: SLF001
 
 
 
+def _open_reviews_page(org_id) -> Parser:
+    """Как YandexParser.__open_page, но по MAPS_BASE_URL (локальная подмена Яндекс Карт для тестов)."""
+    opts = uc.ChromeOptions()
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-dev-shm-usage")
+    opts.add_argument("headless")
+    opts.add_argument("--disable-gpu")
+    driver = uc.Chrome(options=opts)
+    driver.get(f"{MAPS_BASE_URL}/org/{org_id}/reviews/")
+    return Parser(driver)
+
+
+def _sort_reviews_by_newest(driver) -> bool:
+    """Переключить список отзывов на «По новизне»; False — переключатель не найден (порядок по умолчанию)."""
+    try:
+        driver.find_element(By.CLASS_NAME, "rating-ranking-view").click()
+        time.sleep(1)
+        for line in driver.find_elements(By.CLASS_NAME, "rating-ranking-view__popup-line"):
+            if "новизн" in (line.text or "").lower():
+                line.click()
+                time.sleep(3)  # список перезагружается
+                return True
+    except Exception:
+        pass
+    return False
+
+
+def _card_review_key(elem) -> str | None:
+    """Ключ отзыва (yandex_cache.review_key) по карточке на странице: автор + дата, без разбора текста."""
+    try:
+        name = elem.find_element(By.XPATH, ".//span[@itemprop='name']").text
+        date = elem.find_element(By.XPATH, ".//meta[@itemprop='datePublished']").get_attribute("content")
+        return review_key(name or "", ParserHelper.form_date(date))
+    except Exception:
+        return None
+
+
 def _patched_open_page(self):
-    parser = _original_open_page(self)
+    _polite_wait()
+    if MAPS_BASE_URL == DEFAULT_MAPS_BASE_URL:
+        parser = _original_open_page(self)
+    else:
+        parser = _open_reviews_page(self.id_yandex)
     time.sleep(5)  # доп. пауза для загрузки контента
+    # Есть хранилище отзывов: новые первыми, скролл остановится на первом известном
+    known = getattr(self, "known_reviews", None)
+    if known is not None and _sort_reviews_by_newest(parser.driver):
+        parser.known_reviews = known
     return parser
 
 
@@ -183,8 +237,12 @@ _original_scroll_to_bottom = Parser._Parser__scroll_to_bottom  # noqa: SLF001
 
 
 def _patched_scroll_to_bottom(self, elem):
-    """Скроллит лениво-грузящийся список отзывов до лимита, а не до «дна» страницы."""
+    """
+    Скроллит лениво-грузящийся список отзывов до лимита, а не до «дна» страницы.
+    Отзывы отсортированы по новизне и известны хранилищу (known_reviews) — до первого известного.
+    """
     target = int(globals().get("MAX_REVIEWS_PER_PLACE", 100))
+    known = getattr(self, "known_reviews", None)
     cls = "business-reviews-card-view__review"
 
 
@@ -200,6 +258,10 @@ def _patched_scroll_to_bottom(self, elem):
         if cur_len >= target:
             return
 
+        # Дальше — только уже сохранённые (более старые) отзывы
+        if known and elements and _card_review_key(elements[-1]) in known:
+            return
+
 
         # Если список не растёт несколько итераций подряд — выходим
         if cur_len == last_len:
@@ -237,9 +299,52 @@ Parser._Parser__scroll_to_bottom = _patched_scroll_to_bottom  # noqa: SLF001
 # --- константы ---
 DEFAULT_CSV = "final_blyat_v3.csv"
 DEFAULT_OUTPUT = "yandex_reviews_results.json"
-DELAY_BETWEEN_PLACES = (8, 15)  # рандомная задержка между заведениями (мин, макс секунд)
 MAX_REVIEWS_PER_PLACE = 100
 SEARCH_WAIT_TIMEOUT = 15
+# Текст выдачи без результатов: только по нему «не найдено» попадает в кэш org_id
+# (таймаут, капча, недогруженная страница — не попадают)
+SEARCH_NO_RESULTS_MARKERS = ("ничего не нашлось", "ничего не найдено")
+
+# Адрес Яндекс Карт (поиск и страницы отзывов); для тестов — локальная подмена
+# (scripts/yandex_standin_server.py), например YANDEX_MAPS_URL=http://127.0.0.1:8090/maps
+DEFAULT_MAPS_BASE_URL = "https://yandex.ru/maps"
+MAPS_BASE_URL = os.environ.get("YANDEX_MAPS_URL", DEFAULT_MAPS_BASE_URL).rstrip("/")
+
+# Параллельный режим (--workers N): N драйверов поиска со своими профилями и общая очередь заведений.
+# Пауза между загрузками страниц Яндекса (поиск, страница отзывов) — общая на все драйверы
+# (мин, макс секунд); и при одном драйвере вместо фиксированной паузы между заведениями: заведение
+# с org_id из кэша не ждёт за поиск, которого не было.
+DEFAULT_WORKERS = int(os.environ.get("YANDEX_REVIEWS_WORKERS", "1"))
+POLITE_INTERVAL = tuple(float(x) for x in os.environ.get("YANDEX_POLITE_INTERVAL", "4,8").split(",")[:2])
+MAX_PLACE_ATTEMPTS = 2  # попыток на заведение, если драйвер упал посередине
+
+
+class PolitenessLimiter:
+    """
+    Глобальный интервал между загрузками страниц Яндекса для всех потоков процесса:
+    каждый следующий запрос — не раньше чем через случайную паузу из interval после предыдущего.
+    """
+
+    def __init__(self, interval: tuple[float, float]):
+        self.interval = (min(interval), max(interval))
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at)
+            self._next_at = start + random.uniform(*self.interval)
+        if start > now:
+            time.sleep(start - now)
+
+
+_LIMITER: PolitenessLimiter | None = None  # задаётся в main; None — без общей паузы
+
+
+def _polite_wait() -> None:
+    if _LIMITER is not None:
+        _LIMITER.wait()
 
 
 
@@ -260,7 +365,8 @@ def search_yandex_maps_and_get_org_id(driver: uc.Chrome, query: str, max_retries
     Открывает Яндекс Карты, вводит запрос (название + адрес), возвращает org_id первого результата.
     Защита от StaleElementReferenceException через повторный поиск элементов.
     """
-    search_url = "https://yandex.ru/maps/?text=" + quote_plus(query.strip())
+    search_url = f"{MAPS_BASE_URL}/?text=" + quote_plus(query.strip())
+    _polite_wait()
     driver.get(search_url)
 
     wait = WebDriverWait(driver, SEARCH_WAIT_TIMEOUT)
@@ -312,15 +418,32 @@ def parse_reviews_for_place(
     *,
     max_retries: int = 2,
     retry_delay: float = 6.0,
+    review_store: ReviewStore | None = None,
 ) -> dict:
     """
     Парсит отзывы по org_id через yandex-reviews-parser. Возвращает не более MAX_REVIEWS_PER_PLACE отзывов.
     При «Страница не найдена» повторяет попытку до max_retries раз с паузой retry_delay.
+    С хранилищем отзывов (review_store) собираются только отзывы новее сохранённых, в результат
+    идёт объединённый набор; страница не открылась — сохранённые отзывы (с ошибкой в error).
     """
+    # С хранилищем — всегда по новизне (даже в первый раз): в нём оказываются самые свежие отзывы.
+    # Пустой known (первый раз или полный парсинг устарел) — парсинг целиком, без остановки.
+    known = review_store.known_keys(org_id) if review_store is not None else None
+    stored = review_store.reviews(org_id) if review_store is not None else []
+    stored_result = None
+    if stored:
+        stored_result = {
+            "place_name": place_name,
+            "place_address": place_address,
+            "org_id": org_id,
+            "company_info": None,
+            "reviews": stored[:MAX_REVIEWS_PER_PLACE],
+        }
     last_error = None
     for attempt in range(max_retries + 1):
         try:
             parser = YandexParser(int(org_id))
+            parser.known_reviews = known
             data = parser.parse(type_parse="default")
         except Exception as e:
             last_error = str(e)
@@ -337,6 +460,8 @@ def parse_reviews_for_place(
 
 
         if "error" in data:
+            if stored_result is not None:
+                return {**stored_result, "error": data["error"], "company_info": data.get("company_info")}
             return {
                 "place_name": place_name,
                 "place_address": place_address,
@@ -348,6 +473,9 @@ def parse_reviews_for_place(
 
 
         reviews = data.get("company_reviews") or []
+        if review_store is not None:
+            reviews, n_new = review_store.merge(org_id, reviews, full=not known)
+            print(f"      Новых отзывов: {n_new}, всего в хранилище: {len(reviews)}")
         reviews = reviews[:MAX_REVIEWS_PER_PLACE]
         return {
             "place_name": place_name,
@@ -359,6 +487,8 @@ def parse_reviews_for_place(
         }
 
 
+    if stored_result is not None:
+        return {**stored_result, "error": last_error or "Страница не найдена"}
     return {
         "place_name": place_name,
         "place_address": place_address,
@@ -390,7 +520,256 @@ def _detect_chrome_major_version() -> int | None:
     return None
 
 
+def _not_found_result(place_name: str, place_address: str) -> dict:
+    return {
+        "place_name": place_name,
+        "place_address": place_address,
+        "org_id": None,
+        "error": "Организация не найдена в поиске",
+        "company_info": None,
+        "reviews": [],
+    }
+
+
+def _failed_result(place_name: str, place_address: str, error: str) -> dict:
+    return {
+        "place_name": place_name,
+        "place_address": place_address,
+        "org_id": None,
+        "error": error,
+        "company_info": None,
+        "reviews": [],
+    }
+
+
+def _chrome_options(profile_dir: Path) -> "uc.ChromeOptions":
+    options = uc.ChromeOptions()
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument(f"--user-data-dir={profile_dir}")
+
+
+    # --- УСКОРЕНИЕ: отключаем загрузку тяжелых ресурсов (картинки) ---
+    prefs = {
+        "profile.managed_default_content_settings.images": 2,
+    }
+    options.add_experimental_option("prefs", prefs)
+    # На некоторых сборках Chrome дополнительно помогает:
+    options.add_argument("--blink-settings=imagesEnabled=false")
+
+
+    # headless при желании можно включить; иногда поиск ведёт себя иначе
+    # options.add_argument("--headless=new")
+    return options
+
+
+def _worker_profile_dir(profile_dir: Path, worker: int) -> Path:
+    """Свой профиль Chrome на драйвер: первый — основной, остальные — рядом с суффиксом _wN."""
+    if worker == 0:
+        return profile_dir
+    return profile_dir.with_name(f"{profile_dir.name}_w{worker}")
+
+
+def _driver_alive(driver) -> bool:
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+def _quit_driver(driver) -> None:
+    if driver is None:
+        return
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def _search_found_nothing(driver) -> bool:
+    """
+    После поиска без org_id: выдача загрузилась и в ней явно «ничего не нашлось». False — капча,
+    страница не догрузилась или драйвер не отвечает: неизвестно, есть ли заведение в Картах.
+    """
+    try:
+        if "captcha" in (driver.current_url or "").lower():
+            return False
+        if driver.execute_script("return document.readyState") != "complete":
+            return False
+        text = (driver.find_element(By.TAG_NAME, "body").text or "").lower()
+    except Exception:
+        return False
+    return any(marker in text for marker in SEARCH_NO_RESULTS_MARKERS)
+
+
+def resolve_org_id(
+    get_driver, name: str, address: str, tag: str, org_cache: OrgIdCache | None = None
+) -> tuple[str | None, bool]:
+    """
+    org_id заведения и признак «из кэша». Сначала локальный кэш (yandex_cache.py): при попадании
+    браузер не нужен вовсе; иначе — поиск драйвером (с повтором «… Москва») и запись результата
+    в кэш. «Не найдено» пишется, только если обе выдачи загрузились пустыми (_search_found_nothing);
+    таймаут или капча — заведение в этом прогоне не найдено, но в следующем ищется снова.
+    Драйвер поиска упал посередине — WebDriverException (пул перезапустит драйвер и повторит
+    заведение); такой результат в кэш не пишется.
+    """
+    if org_cache is not None:
+        status, org_id = org_cache.lookup(name, address)
+        if status == ORG_HIT:
+            print(f"      {tag} org_id={org_id} из кэша")
+            return org_id, True
+        if status == ORG_NOT_FOUND:
+            print(f"      {tag} Не найдено в Яндекс Картах (кэш): {name[:60]}...")
+            return None, True
+
+    driver = get_driver()
+    query = f"{name} {address}".strip()
+    t0 = t.time()
+    org_id = search_yandex_maps_and_get_org_id(driver, query)
+    found_nothing = not org_id and _search_found_nothing(driver)
+
+    # --- НОВАЯ ЛОГИКА: повторный поиск с добавлением "Москва" ---
+    if not org_id:
+        print(f"      {tag} Первый поиск не дал результатов, пробую с добавлением 'Москва'...")
+        query_with_city = f"{name} Москва".strip()
+        org_id = search_yandex_maps_and_get_org_id(driver, query_with_city)
+        found_nothing = found_nothing and not org_id and _search_found_nothing(driver)
+
+    print(f"      {tag} Поиск: {t.time()-t0:.1f} с")
+
+    if not org_id:
+        if not _driver_alive(driver):
+            raise WebDriverException("драйвер поиска не отвечает")
+        print(f"      {tag} Не найдено в Яндекс Картах даже с 'Москва': {name[:60]}...")
+        if not found_nothing:
+            print(f"      {tag} Выдача не загрузилась или капча — в кэш org_id не пишу")
+            return None, False
+    if org_cache is not None:
+        org_cache.store(name, address, org_id)
+    return org_id, False
+
+
+def process_place(
+    get_driver,
+    name: str,
+    address: str,
+    tag: str,
+    save_page: Path | None = None,
+    org_cache: OrgIdCache | None = None,
+    review_store: ReviewStore | None = None,
+) -> dict:
+    """
+    Одно заведение: org_id (кэш или поиск, см. resolve_org_id), затем отзывы.
+    get_driver() — драйвер поиска; запускается, только если он действительно нужен.
+    org_id из кэша не открылся («Страница не найдена») — запись забывается и заведение ищется заново.
+    """
+    print(f"  {tag} {name[:50]}...")
+    org_id, from_cache = resolve_org_id(get_driver, name, address, tag, org_cache)
+    if not org_id:
+        return _not_found_result(name, address)
+
+
+    # По желанию сохраняем HTML страницы отзывов для поиска нужного блока (один раз)
+    if save_page is not None:
+        print(f"      {tag} Сохраняю HTML страницы отзывов в {save_page}...")
+        try:
+            driver = get_driver()
+            _polite_wait()
+            driver.get(f"{MAPS_BASE_URL}/org/{org_id}/reviews/")
+            time.sleep(6)
+            save_page.write_text(driver.page_source, encoding="utf-8")
+            print("      Готово. Открой файл в браузере/редакторе и найди класс блока с текстом отзыва.")
+        except Exception as e:
+            print(f"      Ошибка сохранения HTML: {e}")
+
+
+    print(f"      {tag} org_id={org_id}, парсинг отзывов (<= {MAX_REVIEWS_PER_PLACE})...")
+    t1 = t.time()
+    place_result = parse_reviews_for_place(name, address, org_id, review_store=review_store)
+    print(f"      {tag} Парсинг: {t.time()-t1:.1f} с")
+    if from_cache and place_result.get("error") == "Страница не найдена":
+        print(f"      {tag} org_id={org_id} из кэша не открылся — ищу заведение заново")
+        org_cache.forget(name, address)
+        fresh_org_id, _ = resolve_org_id(get_driver, name, address, tag, org_cache)
+        if not fresh_org_id:
+            return _not_found_result(name, address)
+        if fresh_org_id != org_id:
+            t1 = t.time()
+            place_result = parse_reviews_for_place(name, address, fresh_org_id, review_store=review_store)
+            print(f"      {tag} Парсинг: {t.time()-t1:.1f} с")
+    n_reviews = len(place_result.get("reviews") or [])
+    print(f"      {tag} Отзывов: {n_reviews}")
+    return place_result
+
+
+def run_pool(
+    tasks: list[tuple[int, str, str]],
+    n_workers: int,
+    make_driver,
+    process,
+    on_result,
+    max_attempts: int = MAX_PLACE_ATTEMPTS,
+) -> None:
+    """
+    Общая очередь заведений (num, название, адрес) на n_workers потоков, у каждого — свой драйвер.
+    make_driver(worker) создаёт драйвер, process(get_driver, task, worker) → результат заведения,
+    on_result(num, result) — сохранение. Драйвер запускается лениво, при первом get_driver()
+    (заведениям с org_id из кэша поиск не нужен). Драйвер не отвечает или упал во время заведения —
+    перезапускается, заведение возвращается в очередь (до max_attempts попыток, затем — ошибка).
+    """
+    work: queue.Queue = queue.Queue()
+    for task in tasks:
+        work.put((task, 1))
+
+    def _worker(worker: int) -> None:
+        driver = None
+
+        def _get_driver():
+            nonlocal driver
+            if driver is not None and not _driver_alive(driver):
+                print(f"      [w{worker}] Драйвер не отвечает — перезапуск")
+                _quit_driver(driver)
+                driver = None
+            if driver is None:
+                driver = make_driver(worker)
+            return driver
+
+        try:
+            while True:
+                try:
+                    task, attempt = work.get_nowait()
+                except queue.Empty:
+                    return
+                num, name, address = task
+                try:
+                    result = process(_get_driver, task, worker)
+                except Exception as e:
+                    _quit_driver(driver)
+                    driver = None
+                    if attempt < max_attempts:
+                        print(f"      [w{worker}] Сбой драйвера на [{num}] ({e}) — перезапуск и повтор")
+                        work.put((task, attempt + 1))
+                        continue
+                    print(f"      [w{worker}] Сбой драйвера на [{num}] ({e}) — заведение пропущено")
+                    result = _failed_result(name, address, f"Сбой драйвера: {e}")
+                on_result(num, result)
+        finally:
+            _quit_driver(driver)
+
+    threads = [
+        threading.Thread(target=_worker, args=(k,), name=f"yandex-w{k}", daemon=True)
+        for k in range(max(1, min(n_workers, len(tasks))))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
 def main():
+    global MAPS_BASE_URL, _LIMITER
+
     parser = argparse.ArgumentParser(description="Парсинг отзывов Яндекс Карт по CSV заведений")
     parser.add_argument(
         "--csv",
@@ -437,8 +816,32 @@ def main():
         default=str(Path.home() / ".chrome_yandex_profile"),
         help="Папка профиля Chrome (куки сохраняются между запусками). По умолчанию ~/.chrome_yandex_profile",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=(
+            "Сколько драйверов поиска работают параллельно (у каждого свой профиль: <profile-dir>_wN). "
+            f"По умолчанию YANDEX_REVIEWS_WORKERS или {DEFAULT_WORKERS}."
+        ),
+    )
+    parser.add_argument(
+        "--maps-url",
+        default=MAPS_BASE_URL,
+        help=f"Адрес Яндекс Карт (для тестов — локальная подмена). По умолчанию {MAPS_BASE_URL}",
+    )
+    parser.add_argument(
+        "--resolve-only",
+        action="store_true",
+        help=(
+            "Только найти org_id и заполнить кэш (yandex_cache.py), без парсинга отзывов; "
+            "--output не пишется. Заведения, уже известные кэшу, пропускаются."
+        ),
+    )
     args = parser.parse_args()
 
+    MAPS_BASE_URL = args.maps_url.rstrip("/")
+
     chrome_major = args.chrome_version
     if chrome_major is None:
         chrome_major = _detect_chrome_major_version() or 145
@@ -448,9 +851,35 @@ def main():
 
     _chrome_version = chrome_major
     _original_chrome_init = uc.Chrome.__init__
+    # undetected_chromedriver при каждом запуске скачивает/патчит бинарник chromedriver, и параллельные
+    # запуски мешают друг другу. Поэтому бинарник готовится один раз (при первом запуске, под замком),
+    # а дальше все драйверы — и поиска, и страниц отзывов — получают готовый путь и стартуют параллельно.
+    _chromedriver_lock = threading.Lock()
+    _chromedriver: dict = {}
+
+    def _prepatched_chromedriver() -> str | None:
+        with _chromedriver_lock:
+            if "path" not in _chromedriver:
+                try:
+                    patcher = uc.Patcher(version_main=_chrome_version)
+                    patcher.auto()
+                    # Ссылку держим до конца работы: бинарник принадлежит этому Patcher
+                    _chromedriver["patcher"] = patcher
+                    _chromedriver["path"] = patcher.executable_path
+                except Exception as e:
+                    print(f"Не удалось заранее подготовить chromedriver ({e}) — драйверы стартуют по одному")
+                    _chromedriver["path"] = None
+            return _chromedriver["path"]
 
     def _patched_chrome_init(self, *args_init, **kwargs):
         kwargs.setdefault("version_main", _chrome_version)
+        if not kwargs.get("driver_executable_path"):
+            driver_path = _prepatched_chromedriver()
+            if driver_path is None:
+                with _chromedriver_lock:
+                    _original_chrome_init(self, *args_init, **kwargs)
+                return
+            kwargs["driver_executable_path"] = driver_path
         _original_chrome_init(self, *args_init, **kwargs)
 
     uc.Chrome.__init__ = _patched_chrome_init
@@ -478,119 +907,121 @@ def main():
     print(f"Обработка {total} заведений (старт с индекса {args.start}). Результат: {args.output}")
     print(f"Профиль Chrome: {profile_dir}")
 
-    options = uc.ChromeOptions()
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument(f"--user-data-dir={profile_dir}")
-
-
-    # --- УСКОРЕНИЕ: отключаем загрузку тяжелых ресурсов (картинки) ---
-    prefs = {
-        "profile.managed_default_content_settings.images": 2,
-    }
-    options.add_experimental_option("prefs", prefs)
-    # На некоторых сборках Chrome дополнительно помогает:
-    options.add_argument("--blink-settings=imagesEnabled=false")
-
-
-    # headless при желании можно включить; иногда поиск ведёт себя иначе
-    # options.add_argument("--headless=new")
-
+    org_cache = OrgIdCache.from_env()
+    if org_cache is not None:
+        print(f"Кэш org_id: {org_cache.path}")
+    elif args.resolve_only:
+        print("--resolve-only: кэш org_id выключен или недоступен (YANDEX_ORG_CACHE)")
+        return 1
+    review_store = None if args.resolve_only else ReviewStore.from_env()
+    if review_store is not None:
+        print(f"Хранилище отзывов: {review_store.path}")
 
-    results = []
+    results_by_num: dict[int, dict] = {}
+    results_lock = threading.Lock()
 
-    # Пишем прогресс на диск после каждого заведения.
+    # Пишем прогресс на диск после каждого заведения (в порядке строк CSV, как в последовательном режиме).
     # Это важно: Chrome/ChromeDriver могут упасть посередине, тогда всё равно останутся частичные результаты,
     # и block3 сможет продолжить работу с block3_reviews_raw.json.
     out_path = Path(args.output)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     def _flush_results() -> None:
-        try:
-            tmp = out_path.with_suffix(out_path.suffix + ".tmp")
-            with open(tmp, "w", encoding="utf-8") as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
-            tmp.replace(out_path)
-        except Exception as e:
-            print(f"      [WARN] не смог записать прогресс в {out_path}: {e}")
+        with results_lock:
+            results = [results_by_num[num] for num in sorted(results_by_num)]
+            try:
+                tmp = out_path.with_suffix(out_path.suffix + ".tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(results, f, ensure_ascii=False, indent=2)
+                tmp.replace(out_path)
+            except Exception as e:
+                print(f"      [WARN] не смог записать прогресс в {out_path}: {e}")
     print(
         f"Используется ChromeDriver для Chrome {chrome_major} "
         f"({'явный --chrome-version' if args.chrome_version is not None else 'авто из google-chrome'})."
     )
 
+    tasks: list[tuple[int, str, str]] = []
+    for num, (_, row) in enumerate(df.iterrows(), start=1):
+        name = str(row["название"]).strip() if pd.notna(row["название"]) else ""
+        address = str(row["адрес"]).strip() if pd.notna(row["адрес"]) else ""
+        if not name and not address:
+            print(f"  [{num}/{total}] Пропуск: нет названия и адреса")
+            continue
+        tasks.append((num, name, address))
+
+    n_workers = max(1, min(args.workers, len(tasks) or 1))
+    # Пауза — между запросами к Яндексу (общая на все драйверы), а не фиксированная между заведениями
+    _LIMITER = PolitenessLimiter(POLITE_INTERVAL)
+    pause = f"пауза между запросами к Яндексу {POLITE_INTERVAL[0]:g}–{POLITE_INTERVAL[-1]:g} с"
+    if n_workers > 1:
+        print(f"Параллельный режим: {n_workers} драйверов, {pause} (общая)")
+    else:
+        print(pause[0].upper() + pause[1:])
+    save_page_pending = threading.Event()
+    if args.save_page:
+        save_page_pending.set()
+
+    driver_needed = threading.Event()
+    driver_started = threading.Event()
+
+    def _make_driver(worker: int):
+        driver_needed.set()
+        worker_profile = _worker_profile_dir(profile_dir, worker)
+        worker_profile.mkdir(parents=True, exist_ok=True)
+        driver = uc.Chrome(options=_chrome_options(worker_profile))
+        driver_started.set()
+        return driver
+
+    def _resolve(get_driver, task: tuple[int, str, str], worker: int) -> dict:
+        num, name, address = task
+        tag = f"[{num}/{total}]" if n_workers == 1 else f"[{num}/{total} w{worker}]"
+        print(f"  {tag} {name[:50]}...")
+        org_id, from_cache = resolve_org_id(get_driver, name, address, tag, org_cache)
+        return {"org_id": org_id, "from_cache": from_cache}
+
+    def _process(get_driver, task: tuple[int, str, str], worker: int) -> dict:
+        num, name, address = task
+        tag = f"[{num}/{total}]" if n_workers == 1 else f"[{num}/{total} w{worker}]"
+        save_page = Path(args.save_page) if save_page_pending.is_set() else None
+        place_result = process_place(
+            get_driver, name, address, tag, save_page=save_page, org_cache=org_cache, review_store=review_store
+        )
+        if place_result.get("org_id"):
+            # HTML сохраняется один раз — у первого найденного заведения
+            save_page_pending.clear()
+        return place_result
+
+    def _on_result(num: int, result: dict) -> None:
+        with results_lock:
+            results_by_num[num] = result
+        _flush_results()
 
-    try:
-        driver_cm = uc.Chrome(options=options)
-    except Exception as e:
-        print(f"Не удалось запустить Chrome: {e}")
+    if args.resolve_only:
+        resolved: dict[int, dict] = {}
+        run_pool(tasks, n_workers, _make_driver, _resolve, resolved.__setitem__)
+        if driver_needed.is_set() and not driver_started.is_set():
+            print("Не удалось запустить Chrome")
+            return 1
+        found = sum(1 for r in resolved.values() if r.get("org_id"))
+        searched = sum(1 for r in resolved.values() if r.get("from_cache") is False)
+        print(
+            f"Готово. org_id известен для {found} из {len(tasks)} заведений "
+            f"(искали в Картах: {searched}); кэш: {org_cache.stats_snapshot()}"
+        )
+        return 0
+
+    run_pool(tasks, n_workers, _make_driver, _process, _on_result)
+    if org_cache is not None:
+        print(f"Кэш org_id: {org_cache.stats_snapshot()}")
+    if review_store is not None:
+        print(f"Хранилище отзывов: {review_store.stats_snapshot()}")
+    # Драйвер не запускался вовсе, если все org_id нашлись в кэше, — это не сбой
+    if driver_needed.is_set() and not driver_started.is_set():
+        print("Не удалось запустить Chrome")
         _flush_results()
         return 1
 
-    with driver_cm as driver:
-        for num, (_, row) in enumerate(df.iterrows(), start=1):
-            name = str(row["название"]).strip() if pd.notna(row["название"]) else ""
-            address = str(row["адрес"]).strip() if pd.notna(row["адрес"]) else ""
-            if not name and not address:
-                print(f"  [{num}/{total}] Пропуск: нет названия и адреса")
-                continue
-
-
-            query = f"{name} {address}".strip()
-            print(f"  [{num}/{total}] {name[:50]}...")
-            t0 = t.time()
-            org_id = search_yandex_maps_and_get_org_id(driver, query)
-            
-            # --- НОВАЯ ЛОГИКА: повторный поиск с добавлением "Москва" ---
-            if not org_id:
-                print(f"      Первый поиск не дал результатов, пробую с добавлением 'Москва'...")
-                query_with_city = f"{name} Москва".strip()
-                org_id = search_yandex_maps_and_get_org_id(driver, query_with_city)
-            
-            print(f"      Поиск: {t.time()-t0:.1f} с")
-            
-            if not org_id:
-                print(f"      Не найдено в Яндекс Картах даже с 'Москва': {name[:60]}...")
-                results.append({
-                    "place_name": name,
-                    "place_address": address,
-                    "org_id": None,
-                    "error": "Организация не найдена в поиске",
-                    "company_info": None,
-                    "reviews": [],
-                })
-                _flush_results()
-                delay = random.uniform(*DELAY_BETWEEN_PLACES)
-                print(f"      Пауза {delay:.1f} с...")
-                time.sleep(delay)
-                continue
-
-
-            # По желанию сохраняем HTML страницы отзывов для поиска нужного блока (один раз)
-            if args.save_page and not results:
-                save_path = Path(args.save_page)
-                print(f"      Сохраняю HTML страницы отзывов в {save_path}...")
-                try:
-                    driver.get(f"https://yandex.ru/maps/org/{org_id}/reviews/")
-                    time.sleep(6)
-                    save_path.write_text(driver.page_source, encoding="utf-8")
-                    print("      Готово. Открой файл в браузере/редакторе и найди класс блока с текстом отзыва.")
-                except Exception as e:
-                    print(f"      Ошибка сохранения HTML: {e}")
-
-
-            print(f"      org_id={org_id}, парсинг отзывов (<= {MAX_REVIEWS_PER_PLACE})...")
-            t1 = t.time()
-            place_result = parse_reviews_for_place(name, address, org_id)
-            print(f"      Парсинг: {t.time()-t1:.1f} с")
-            results.append(place_result)
-            _flush_results()
-            n_reviews = len(place_result.get("reviews") or [])
-            print(f"      Отзывов: {n_reviews}")
-
-            delay = random.uniform(*DELAY_BETWEEN_PLACES)
-            print(f"      Пауза {delay:.1f} с...")
-            time.sleep(delay)
-
 
     _flush_results()
     print(f"Готово. Результаты сохранены в {out_path}")
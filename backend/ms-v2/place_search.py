@@ -5,12 +5,20 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
 import os
-from typing import Any, Optional
+import shutil
+import threading
+from typing import Any, NamedTuple, Optional
 
 import numpy as np
 import pandas as pd
 
+from ann_index import IVFIndex, top_n
+from name_index import NameIndex
+from onnx_backend import encoder_key, load_sentence_encoder, onnx_enabled
+
 # Папка для кэша весов энкодера (чтобы не скачивать каждый раз)
 _ENCODER_CACHE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "encoder_cache")
 
@@ -29,6 +37,74 @@ def _encoder_cache_exists(cache_dir: str) -> bool:
 # Модель по умолчанию: лёгкий русский энкодер (кэшируется в encoder_cache)
 DEFAULT_ENCODER_MODEL = "sergeyzh/rubert-mini-frida"
 
+# Папка с предпосчитанными эмбеддингами описаний (одна подпапка на версию датасета + энкодер)
+_EMBEDDING_INDEX_ROOT = os.environ.get("PLACE_EMBEDDING_INDEX_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "embedding_index"
+)
+_EMBEDDING_FILE = "embeddings.npy"
+_EMBEDDING_META_FILE = "meta.json"
+_ANN_FILE = "ivf.npz"
+
+# Приближённый поиск (IVF, ann_index.py) поверх индекса эмбеддингов (PLACE_ANN=0 — выключить).
+# Включается, только если после фильтра осталось больше PLACE_ANN_EXACT_MAX строк; иначе — точный косинус.
+_ANN_ENABLED = os.environ.get("PLACE_ANN", "1") != "0"
+_ANN_EXACT_MAX = int(os.environ.get("PLACE_ANN_EXACT_MAX", "20000"))
+_ANN_NPROBE = int(os.environ.get("PLACE_ANN_NPROBE", "16"))
+
+
+def dataset_fingerprint(path: str, chunk_size: int = 1 << 20) -> str:
+    """Отпечаток файла датасета: sha256 содержимого (первые 16 hex-символов)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def _get_embedding_index_dir(dataset_version: str, model_name: str) -> str:
+    """Путь к индексу эмбеддингов для пары (версия датасета, энкодер)."""
+    safe_name = model_name.replace("/", "_").strip()
+    key = hashlib.sha256(f"{dataset_version}|{model_name}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(_EMBEDDING_INDEX_ROOT, f"{safe_name}_{key}")
+
+
+def _load_embedding_index(index_dir: str, n_rows: int) -> Optional[np.ndarray]:
+    """Открывает индекс через memory-map. None — если индекса нет или он не совпадает по числу строк."""
+    emb_path = os.path.join(index_dir, _EMBEDDING_FILE)
+    if not os.path.isfile(emb_path):
+        return None
+    try:
+        embeddings = np.load(emb_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if embeddings.ndim != 2 or embeddings.shape[0] != n_rows:
+        return None
+    return embeddings
+
+
+def _save_embedding_index(index_dir: str, embeddings: np.ndarray, meta: dict[str, Any]) -> None:
+    """Атомарно пишет индекс: сначала во временную папку, затем переименование."""
+    os.makedirs(os.path.dirname(index_dir), exist_ok=True)
+    tmp_dir = f"{index_dir}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, _EMBEDDING_FILE), np.ascontiguousarray(embeddings, dtype=np.float32))
+    with open(os.path.join(tmp_dir, _EMBEDDING_META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    if os.path.isdir(index_dir) and _load_embedding_index(index_dir, len(embeddings)) is None:
+        # Старый индекс битый (обрезанный .npy, другое число строк) — убираем, иначе replace не пройдёт
+        broken_dir = f"{index_dir}.broken{os.getpid()}"
+        try:
+            os.replace(index_dir, broken_dir)
+        except OSError:
+            pass
+        shutil.rmtree(broken_dir, ignore_errors=True)
+    try:
+        os.replace(tmp_dir, index_dir)
+    except OSError:
+        # Индекс уже построил параллельный процесс — оставляем его
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
 
 def download_encoder(
     model_name: str = DEFAULT_ENCODER_MODEL,
@@ -53,6 +129,9 @@ def download_encoder(
 # Обязательные колонки в датафрейме
 REQUIRED_COLUMNS = ["тип_заведения", "средний_чек", "кухня", "описание_полное"]
 
+# Мягкие границы по цене: ±30% от диапазона из запроса
+PRICE_MARGIN = 0.3
+
 
 def _normalize_set(values: Optional[list[str]]) -> set[str]:
     if not values:
@@ -66,6 +145,11 @@ def _split_set(s: str) -> set[str]:
     return {p.strip().lower() for p in str(s).split(",") if p.strip()}
 
 
+def _exact_name_key(name: str) -> str:
+    """Ключ точного совпадения названия с запросом (block1: strip + casefold)."""
+    return name.strip().casefold()
+
+
 def _check_columns(df: pd.DataFrame) -> None:
     """Проверка наличия обязательных полей в датафрейме."""
     missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
@@ -93,41 +177,86 @@ def get_available_types(df: pd.DataFrame) -> list[str]:
     return sorted(all_types)
 
 
-def _filter_df(
-    df: pd.DataFrame,
-    types: Optional[list[str]] = None,
-    price_min: Optional[float] = None,
-    price_max: Optional[float] = None,
-    cuisines: Optional[list[str]] = None,
-) -> pd.DataFrame:
+def _multi_hot_bits(values: pd.Series) -> tuple[dict[str, int], np.ndarray]:
+    """
+    Словарь значений колонки «через запятую» (как в _split_set) и битовая матрица (vocab, ceil(n/8)):
+    строка матрицы — упакованная маска заведений, у которых есть это значение.
+    Строки разбираются только для уникальных комбинаций, дальше — индексация NumPy.
     """
-    Одно логическое условие: (тип ∨ …) И (цена в диапазоне) И (все кухни из запроса есть у заведения).
-    Тип: любое совпадение из списка; цена: средний_чек в [min, max]; кухня: все из запроса должны быть в ответе.
+    row_codes, combos = pd.factorize(values.fillna("").astype(str))
+    vocab: dict[str, int] = {}
+    combo_tokens: list[list[int]] = []
+    for combo in combos:
+        ids = []
+        for token in _split_set(combo):
+            ids.append(vocab.setdefault(token, len(vocab)))
+        combo_tokens.append(ids)
+
+    combo_matrix = np.zeros((len(vocab), len(combos)), dtype=bool)
+    for combo_idx, ids in enumerate(combo_tokens):
+        combo_matrix[ids, combo_idx] = True
+
+    n = len(values)
+    bits = np.zeros((len(vocab), (n + 7) // 8), dtype=np.uint8)
+    if n and len(vocab):
+        # factorize ставит -1 для пропусков — после fillna их нет, но подстрахуемся пустой комбинацией
+        row_codes = np.where(row_codes < 0, len(combos), row_codes)
+        combo_matrix = np.hstack([combo_matrix, np.zeros((len(vocab), 1), dtype=bool)])
+        for token_id in range(len(vocab)):
+            bits[token_id] = np.packbits(combo_matrix[token_id][row_codes])
+    return vocab, bits
+
+
+class _FilterIndex:
+    """
+    Предпосчитанные при загрузке данные для фильтра: битовые матрицы типов и кухонь + цены в float.
+    mask() даёт тот же результат, что построчный фильтр (scripts/bench_place_filter.py), но несколькими
+    векторными операциями.
     """
-    want_types = _normalize_set(types)
-    want_cuisines = _normalize_set(cuisines)
 
-    mask_type = (
-        df["тип_заведения"].apply(lambda x: bool(_split_set(x) & want_types))
-        if want_types
-        else pd.Series(True, index=df.index)
-    )
-    PRICE_MARGIN = 0.3
-    mask_price = pd.Series(True, index=df.index)
-    if price_min is not None:
-        soft_min = price_min * (1 - PRICE_MARGIN)
-        mask_price &= (df["средний_чек"] >= soft_min) | df["средний_чек"].isna()
-    if price_max is not None:
-        soft_max = price_max * (1 + PRICE_MARGIN)
-        mask_price &= (df["средний_чек"] <= soft_max) | df["средний_чек"].isna()
-    # Все кухни из запроса должны быть у заведения (AND)
-    mask_cuisine = (
-        df["кухня"].apply(lambda x: want_cuisines.issubset(_split_set(x)))
-        if want_cuisines
-        else pd.Series(True, index=df.index)
-    )
+    def __init__(self, df: pd.DataFrame):
+        df = df.reset_index(drop=True)
+        self.n_rows = len(df)
+        self.type_vocab, self.type_bits = _multi_hot_bits(df["тип_заведения"])
+        self.cuisine_vocab, self.cuisine_bits = _multi_hot_bits(df["кухня"])
+        # Отсортированные словари — для промптов LLM (get_available_types / get_available_cuisines)
+        self.types = sorted(self.type_vocab)
+        self.cuisines = sorted(self.cuisine_vocab)
+        self.prices = pd.to_numeric(df["средний_чек"], errors="coerce").to_numpy(dtype=float)
 
-    return df.loc[mask_type & mask_price & mask_cuisine].reset_index(drop=True)
+    def _unpack(self, bits: np.ndarray) -> np.ndarray:
+        return np.unpackbits(bits, count=self.n_rows).astype(bool)
+
+    def mask(
+        self,
+        types: Optional[list[str]] = None,
+        price_min: Optional[float] = None,
+        price_max: Optional[float] = None,
+        cuisines: Optional[list[str]] = None,
+    ) -> np.ndarray:
+        """Булева маска по строкам: (тип ∨ …) И (цена в мягком диапазоне) И (все кухни из запроса)."""
+        mask = np.ones(self.n_rows, dtype=bool)
+
+        want_types = _normalize_set(types)
+        if want_types:
+            ids = [self.type_vocab[t] for t in want_types if t in self.type_vocab]
+            if not ids:
+                return np.zeros(self.n_rows, dtype=bool)
+            mask &= self._unpack(np.bitwise_or.reduce(self.type_bits[ids], axis=0))
+
+        want_cuisines = _normalize_set(cuisines)
+        if want_cuisines:
+            if any(c not in self.cuisine_vocab for c in want_cuisines):
+                return np.zeros(self.n_rows, dtype=bool)
+            ids = [self.cuisine_vocab[c] for c in want_cuisines]
+            mask &= self._unpack(np.bitwise_and.reduce(self.cuisine_bits[ids], axis=0))
+
+        missing_price = np.isnan(self.prices)
+        if price_min is not None:
+            mask &= (self.prices >= price_min * (1 - PRICE_MARGIN)) | missing_price
+        if price_max is not None:
+            mask &= (self.prices <= price_max * (1 + PRICE_MARGIN)) | missing_price
+        return mask
 
 
 def _cosine_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
@@ -143,43 +272,119 @@ def _cosine_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     return np.dot(an, bn.T).ravel()
 
 
+# Колонки при схлопывании по названию (порядок как в выходном df);
+# _JOIN_COLUMNS — объединение значений через запятую, остальные — первое непустое
+_JOIN_COLUMNS = ("тип_заведения", "кухня")
+_COLLAPSE_COLUMNS = (
+    "тип_заведения",
+    "кухня",
+    "описание",
+    "средний_чек",
+    "ссылка",
+    "адрес",
+    "описание_полное",
+    "меню_ссылки",
+    "меню_названия",
+    "меню_типы",
+    "меню_количество",
+)
+
+
+def _collapse_join(col: pd.Series, codes: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Для каждой группы: значения через запятую → strip/lower → уникальные → sorted → ", ".join.
+    Без Python-колбэков на группу: строки разбираются только для уникальных значений колонки,
+    дальше — пары (группа, токен), сортировка по целым кодам и np.add.reduceat.
+    """
+    out = np.full(n_groups, "", dtype=object)
+    values = col.reset_index(drop=True)
+    present = values.notna().to_numpy()
+    value_codes, uniques = pd.factorize(values[present].astype(str))
+
+    tokens = pd.Series(uniques).str.split(",").explode().str.strip().str.lower()
+    tokens = tokens[tokens.notna() & (tokens != "")]
+    if len(tokens) == 0:
+        return out
+    # sort=True: порядок кодов токенов совпадает с sorted() по строкам
+    token_codes, token_vocab = pd.factorize(tokens, sort=True)
+    value_tokens = pd.DataFrame({"v": tokens.index.to_numpy(), "t": token_codes})
+
+    group_values = pd.DataFrame({"g": codes[present], "v": value_codes}).drop_duplicates()
+    pairs = group_values.merge(value_tokens, on="v")[["g", "t"]].drop_duplicates()
+    order = np.lexsort((pairs["t"].to_numpy(), pairs["g"].to_numpy()))
+    g = pairs["g"].to_numpy()[order]
+    t = np.asarray(token_vocab, dtype=object)[pairs["t"].to_numpy()[order]]
+
+    first = np.empty(len(g), dtype=bool)
+    first[0] = True
+    first[1:] = g[1:] != g[:-1]
+    pieces = np.where(first, t, ", " + t)
+    starts = np.flatnonzero(first)
+    out[g[starts]] = np.add.reduceat(pieces, starts)
+    return out
+
+
+def _collapse_first_value(col: pd.Series, order: np.ndarray, sorted_codes: np.ndarray) -> pd.Series:
+    """
+    Для каждой группы: первое значение, которое не NaN и не пустое после strip; иначе — первое значение группы.
+    order — стабильная сортировка строк по коду группы, sorted_codes — коды в этом порядке (общие для всех колонок).
+    """
+    values = col.reset_index(drop=True)
+    # Проверка «пусто после strip» — только по уникальным значениям
+    value_codes, uniques = pd.factorize(values)
+    blank = (pd.Series(uniques, dtype=object).astype(str).str.strip() == "").to_numpy()
+    valid = value_codes >= 0
+    valid[valid] = ~blank[value_codes[valid]]
+
+    pick = order[_group_starts(sorted_codes)]
+    valid_pos = np.flatnonzero(valid[order])
+    first_valid = valid_pos[_group_starts(sorted_codes[valid_pos])]
+    pick[sorted_codes[first_valid]] = order[first_valid]
+
+    picked = values.iloc[pick].reset_index(drop=True)
+    if picked.dtype == object:
+        # Как groupby.agg: вывод типа по результатам (например, все NaN → float64)
+        picked = picked.infer_objects()
+    return picked
+
+
+def _group_starts(sorted_codes: np.ndarray) -> np.ndarray:
+    """Позиции, где в отсортированном массиве кодов начинается новая группа."""
+    if len(sorted_codes) == 0:
+        return np.empty(0, dtype=np.intp)
+    return np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+
+
 def build_places_df(raw_df: pd.DataFrame) -> pd.DataFrame:
-    """Схлопывает строки по названию (одна строка на заведение). Нужно, если грузите сырой CSV."""
-    def agg_join(ser: pd.Series) -> str:
-        parts = ser.dropna().astype(str).str.strip()
-        uniq = set()
-        for v in parts:
-            for p in str(v).split(","):
-                if p.strip():
-                    uniq.add(p.strip().lower())
-        return ", ".join(sorted(uniq)) if uniq else ""
-
-    def first_val(ser: pd.Series):
-        for v in ser:
-            if pd.notna(v) and str(v).strip():
-                return v
-        return ser.iloc[0] if len(ser) else None
-
-    agg = {
-        "тип_заведения": lambda s: agg_join(s),
-        "кухня": lambda s: agg_join(s),
-        "описание": first_val,
-        "средний_чек": first_val,
-        "ссылка": first_val,
-        "адрес": first_val,
-        "описание_полное": first_val,
-        "меню_ссылки": first_val,
-        "меню_названия": first_val,
-        "меню_типы": first_val,
-        "меню_количество": first_val,
-    }
-    return raw_df.groupby("название", as_index=False).agg(agg)
+    """
+    Схлопывает строки по названию (одна строка на заведение). Нужно, если грузите сырой CSV.
+    Векторная версия: результат совпадает с groupby + Python-агрегаторами (см. scripts/bench_build_places_df.py).
+    """
+    df = raw_df.loc[raw_df["название"].notna(), ["название", *_COLLAPSE_COLUMNS]]
+    codes, names = pd.factorize(df["название"], sort=True)
+    n_groups = len(names)
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+
+    out: dict[str, Any] = {"название": pd.Series(names, dtype=df["название"].dtype)}
+    for col in _COLLAPSE_COLUMNS:
+        if col in _JOIN_COLUMNS:
+            dtype = df[col].dtype if isinstance(df[col].dtype, pd.StringDtype) else object
+            out[col] = pd.Series(_collapse_join(df[col], codes, n_groups), dtype=dtype)
+        else:
+            out[col] = _collapse_first_value(df[col], order, sorted_codes)
+    return pd.DataFrame(out)
 
 
 class PlaceSearch:
     """
     Поиск по чистому датафрейму: проверка полей → фильтр (тип → цена → кухня) →
     эмбеддинги по всем отфильтрованным + запрос «особенности» → косинусная близость → топ-n.
+
+    Если известна версия датасета (dataset_version, from_csv задаёт её сам), эмбеддинги
+    описаний считаются один раз и хранятся на диске (embedding_index/), при загрузке
+    открываются через memory-map — на запрос кодируется только текст запроса.
+    Для больших отфильтрованных наборов близость считается через IVF-индекс (ann_index.py).
     """
 
     def __init__(
@@ -187,24 +392,64 @@ class PlaceSearch:
         df: pd.DataFrame,
         model_name: str = DEFAULT_ENCODER_MODEL,
         device: Optional[str] = "cpu",
+        dataset_version: Optional[str] = None,
     ):
         _check_columns(df)
-        self._df = df.copy()
+        self._df = df.copy().reset_index(drop=True)
         self._model_name = model_name
+        # Имя энкодера в ключе индекса эмбеддингов: у ONNX-варианта (onnx_backend.py) индекс свой
+        self._encoder_key = encoder_key(model_name)
         self._device = device
         self._model = None
         self._model_ok: Optional[bool] = None
+        self._dataset_version = dataset_version
+        self._embeddings: Optional[np.ndarray] = None
+        self._ann: Optional[IVFIndex] = None
+        self._name_index: Optional[NameIndex] = None
+        self._filter_index = _FilterIndex(self._df)
 
     @classmethod
     def from_csv(
         cls,
         path: str,
         collapse: bool = True,
+        fingerprint: Optional[str] = None,
         **kwargs: Any,
     ) -> "PlaceSearch":
-        """Загрузить датафрейм из CSV. collapse=True — схлопнуть по названию."""
+        """
+        Загрузить датафрейм из CSV. collapse=True — схлопнуть по названию.
+        fingerprint: уже посчитанный dataset_fingerprint(path), чтобы не хешировать файл повторно.
+        """
         raw = pd.read_csv(path)
         df = build_places_df(raw) if collapse else raw
+        fingerprint = fingerprint or dataset_fingerprint(path)
+        kwargs.setdefault("dataset_version", f"{fingerprint}:{'collapsed' if collapse else 'raw'}")
+        return cls(df, **kwargs)
+
+    @classmethod
+    def from_parquet(
+        cls,
+        catalog_dir: str,
+        collapse: bool = True,
+        **kwargs: Any,
+    ) -> "PlaceSearch":
+        """
+        Загрузить датафрейм из колоночного каталога (catalog.py build-catalog): collapse=True —
+        готовый схлопнутый places.parquet, иначе исходные строки. Версия датасета — та же, что у from_csv
+        для исходного CSV, поэтому индекс эмбеддингов общий.
+        """
+        from catalog import NORM_COLUMNS, read_catalog_meta, read_places, read_rows
+
+        meta = read_catalog_meta(catalog_dir)
+        if meta is None:
+            raise FileNotFoundError(f"Каталог не найден или устарел по формату: {catalog_dir}")
+        if collapse:
+            df = read_places(catalog_dir)
+        else:
+            df = read_rows(catalog_dir).drop(columns=list(NORM_COLUMNS))
+        # Категории нужны только для хранения: фильтр и block1 работают со строковыми колонками
+        df = df.astype({col: object for col in df.select_dtypes("category").columns})
+        kwargs.setdefault("dataset_version", f"{meta['fingerprint']}:{'collapsed' if collapse else 'raw'}")
         return cls(df, **kwargs)
 
     def _get_model(self):
@@ -212,9 +457,18 @@ class PlaceSearch:
             return self._model
         if self._model_ok is False:
             return None
+        cache_dir = _get_encoder_cache_dir(self._model_name)
+        if onnx_enabled():
+            try:
+                source = cache_dir if _encoder_cache_exists(cache_dir) else None
+                self._model = load_sentence_encoder(self._model_name, source=source)
+                self._model_ok = True
+                return self._model
+            except Exception as e:
+                print(f"[place_search] ONNX-энкодер недоступен, PyTorch: {e}", flush=True)
+                self._encoder_key = self._model_name
         try:
             from sentence_transformers import SentenceTransformer
-            cache_dir = _get_encoder_cache_dir(self._model_name)
             kwargs = {} if self._device is None else {"device": self._device}
             if _encoder_cache_exists(cache_dir):
                 self._model = SentenceTransformer(cache_dir, tokenizer_kwargs={"fix_mistral_regex": True}, **kwargs)
@@ -228,6 +482,42 @@ class PlaceSearch:
             self._model_ok = False
             return None
 
+    def _get_embeddings(self) -> Optional[np.ndarray]:
+        """
+        Эмбеддинги описаний всех строк df (нормированные, float32, memory-map).
+        Индекс ищется на диске по (версия датасета, энкодер); если его нет — строится и сохраняется.
+        None — если версия датасета неизвестна или энкодер недоступен.
+        """
+        if self._embeddings is not None:
+            return self._embeddings
+        if not self._dataset_version:
+            return None
+        index_dir = _get_embedding_index_dir(self._dataset_version, self._encoder_key)
+        embeddings = _load_embedding_index(index_dir, len(self._df))
+        if embeddings is None:
+            model = self._get_model()
+            if model is None:
+                return None
+            texts = self._df["описание_полное"].fillna("").astype(str).tolist()
+            built = model.encode(
+                texts,
+                normalize_embeddings=True,
+                prompt_name="document",
+                show_progress_bar=False,
+            )
+            _save_embedding_index(index_dir, np.asarray(built, dtype=np.float32), {
+                "dataset_version": self._dataset_version,
+                "model_name": self._model_name,
+                "encoder": self._encoder_key,
+                "n_rows": len(self._df),
+                "dim": int(np.asarray(built).shape[1]),
+            })
+            embeddings = _load_embedding_index(index_dir, len(self._df))
+            if embeddings is None:
+                embeddings = np.asarray(built, dtype=np.float32)
+        self._embeddings = embeddings
+        return self._embeddings
+
     def search(
         self,
         types: Optional[list[str]] = None,
@@ -239,18 +529,19 @@ class PlaceSearch:
         n: int = 20,
     ) -> list[dict[str, Any]]:
         """
-        Фильтр: тип (любое совпадение) → цена → кухня.
+        Фильтр: тип (любое совпадение) → цена → кухня (битовые маски, предпосчитанные при загрузке).
         Для эмбеддинга приоритет: описание_полное (2-3 предложения) > особенности (ключевые слова).
-        Возвращаем топ-n по косинусной близости.
+        Возвращаем топ-n по косинусной близости (точной или через IVF, если после фильтра
+        остаётся больше PLACE_ANN_EXACT_MAX строк).
         """
-        filtered = _filter_df(
-            self._df,
+        mask = self._filter_index.mask(
             types=types,
             price_min=price_min,
             price_max=price_max,
             cuisines=cuisines,
         )
-        if len(filtered) == 0:
+        positions = np.flatnonzero(mask)
+        if len(positions) == 0 or n <= 0:
             return []
 
         price_mid = None
@@ -270,7 +561,7 @@ class PlaceSearch:
 
         query_text = (описание_полное or "").strip() or (особенности or "").strip()
         if not query_text:
-            filtered = _sort_by_price_closeness(filtered)
+            filtered = _sort_by_price_closeness(self._df.iloc[positions].reset_index(drop=True))
             return filtered.head(n).to_dict(orient="records")
 
         model = self._get_model()
@@ -281,34 +572,150 @@ class PlaceSearch:
                 UserWarning,
                 stacklevel=2,
             )
-            filtered = _sort_by_price_closeness(filtered)
+            filtered = _sort_by_price_closeness(self._df.iloc[positions].reset_index(drop=True))
             return filtered.head(n).to_dict(orient="records")
 
-        texts = filtered["описание_полное"].fillna("").astype(str).tolist()
-        place_embs = model.encode(texts, normalize_embeddings=True, prompt_name="document")
         query_emb = model.encode([query_text], normalize_embeddings=True, prompt_name="query")
-        scores = _cosine_similarity(place_embs, query_emb)
-        filtered = filtered.assign(cosine_score=scores)
-        filtered = filtered.sort_values("cosine_score", ascending=False)
-        return filtered.head(n).to_dict(orient="records")
+        embeddings = self._get_embeddings()
+        ann = self._get_ann_index() if len(positions) > _ANN_EXACT_MAX else None
+        if ann is not None:
+            # Большой отфильтрованный набор: просматриваем только ближайшие кластеры IVF
+            top_positions, _ = ann.search(embeddings, query_emb, n, mask=mask, nprobe=_ANN_NPROBE)
+            scores = _cosine_similarity(embeddings[top_positions], query_emb)
+        else:
+            if embeddings is not None:
+                place_embs = embeddings[positions]
+            else:
+                texts = self._df["описание_полное"].iloc[positions].fillna("").astype(str).tolist()
+                place_embs = model.encode(texts, normalize_embeddings=True, prompt_name="document")
+            scores = _cosine_similarity(place_embs, query_emb)
+            top = top_n(scores, n)
+            top_positions, scores = positions[top], scores[top]
+        top_places = self._df.iloc[top_positions].reset_index(drop=True)
+        return top_places.assign(cosine_score=scores).to_dict(orient="records")
+
+    def _get_ann_index(self) -> Optional[IVFIndex]:
+        """
+        IVF-индекс поверх индекса эмбеддингов (строится один раз и хранится рядом с ним).
+        None — если ANN выключен (PLACE_ANN=0), датасет не больше PLACE_ANN_EXACT_MAX строк
+        или индекса эмбеддингов нет.
+        """
+        if self._ann is not None:
+            return self._ann
+        if not _ANN_ENABLED or len(self._df) <= _ANN_EXACT_MAX:
+            return None
+        embeddings = self._get_embeddings()
+        if embeddings is None:
+            return None
+        path = os.path.join(_get_embedding_index_dir(self._dataset_version, self._encoder_key), _ANN_FILE)
+        index = IVFIndex.load(path, len(self._df))
+        if index is None:
+            index = IVFIndex.build(embeddings)
+            try:
+                index.save(path)
+            except OSError:
+                pass
+        self._ann = index
+        return self._ann
+
+    def warm_up(self) -> None:
+        """Загрузить энкодер, индекс эмбеддингов и IVF заранее (чтобы первый запрос не платил за холодный старт)."""
+        if self._get_model() is not None:
+            self._get_embeddings()
+            self._get_ann_index()
+
+    def name_index(self) -> NameIndex:
+        """Индекс названий датасета (ключ — название без пробелов по краям, casefold); строится один раз."""
+        if self._name_index is None:
+            self._name_index = NameIndex(self._df["название"], normalize=_exact_name_key)
+        return self._name_index
+
+    def available_cuisines(self) -> list[str]:
+        """Кухни датасета (как get_available_cuisines(df)) — из словаря фильтра, без прохода по колонке."""
+        return list(self._filter_index.cuisines)
+
+    def available_types(self) -> list[str]:
+        """Типы заведений датасета (как get_available_types(df)) — из словаря фильтра."""
+        return list(self._filter_index.types)
 
     @property
     def df(self) -> pd.DataFrame:
         return self._df
 
 
+class _RegistryEntry(NamedTuple):
+    stamp: tuple[int, int]
+    fingerprint: str
+    engine: PlaceSearch
+
+
+# Процессный реестр движков: один PlaceSearch на (путь к CSV, collapse) на процесс воркера
+_ENGINE_REGISTRY: dict[tuple[str, bool], _RegistryEntry] = {}
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_place_search(path: str, collapse: bool = True, **kwargs: Any) -> PlaceSearch:
+    """
+    Тёплый PlaceSearch для CSV из процессного реестра.
+    Перезагружается, только если у файла изменились mtime/размер и при этом изменился sha256;
+    при перезагрузке уже загруженный энкодер переиспользуется.
+    """
+    key = (os.path.abspath(path), collapse)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _ENGINE_LOCK:
+        entry = _ENGINE_REGISTRY.get(key)
+        if entry is not None and entry.stamp == stamp:
+            return entry.engine
+        fingerprint = dataset_fingerprint(path)
+        if entry is not None and entry.fingerprint == fingerprint:
+            _ENGINE_REGISTRY[key] = entry._replace(stamp=stamp)
+            return entry.engine
+        engine = _load_engine(path, collapse, fingerprint, **kwargs)
+        if entry is not None and entry.engine._model_name == engine._model_name:
+            engine._model = entry.engine._model
+            engine._model_ok = entry.engine._model_ok
+            engine._encoder_key = entry.engine._encoder_key
+        _ENGINE_REGISTRY[key] = _RegistryEntry(stamp, fingerprint, engine)
+        return engine
+
+
+def _load_engine(path: str, collapse: bool, fingerprint: str, **kwargs: Any) -> PlaceSearch:
+    """PlaceSearch из свежего каталога (catalog.py), если он собран для этого CSV, иначе — из CSV."""
+    from catalog import find_catalog
+
+    catalog_dir = find_catalog(path, fingerprint=fingerprint)
+    if catalog_dir is not None:
+        try:
+            return PlaceSearch.from_parquet(catalog_dir, collapse=collapse, **kwargs)
+        except Exception as e:
+            import warnings
+            warnings.warn(f"Каталог {catalog_dir} не прочитан ({e}) — читаем CSV", UserWarning, stacklevel=2)
+    return PlaceSearch.from_csv(path, collapse=collapse, fingerprint=fingerprint, **kwargs)
+
+
+def warm_up_place_search(path: str, collapse: bool = True) -> PlaceSearch:
+    """Загрузить датафрейм, энкодер и индекс эмбеддингов в реестр (вызывается при старте процесса воркера)."""
+    engine = get_place_search(path, collapse=collapse)
+    engine.warm_up()
+    return engine
+
+
 def search_places(
     df: pd.DataFrame,
     query: dict[str, Any],
     n: int = 20,
+    engine: Optional[PlaceSearch] = None,
 ) -> list[dict[str, Any]]:
     """
     Упрощённая точка входа: чистый датафрейм + запрос → топ-n (по умолчанию 20).
 
     query: types, price_min, price_max, cuisines, особенности, описание_полное.
+    engine: уже загруженный PlaceSearch над этим df (с индексом эмбеддингов) — иначе создаётся новый.
     """
-    _check_columns(df)
-    engine = PlaceSearch(df)
+    if engine is None:
+        _check_columns(df)
+        engine = PlaceSearch(df)
     return engine.search(
         types=query.get("types"),
         price_min=query.get("price_min"),
@@ -6,6 +6,13 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from functools import lru_cache
 from typing import TYPE_CHECKING, Any, Optional
 
 if TYPE_CHECKING:
@@ -13,6 +20,14 @@ if TYPE_CHECKING:
 
 from pydantic import BaseModel, Field
 
+# Кэш разобранных запросов (SQLite): повторные/перезапущенные задачи с тем же текстом не ходят в LLM.
+# Ключ — нормализованный текст + модель + словарь кухонь + версия промпта. QUERY_CACHE=0 — выключить.
+_QUERY_CACHE_ENABLED = os.environ.get("QUERY_CACHE", "1") != "0"
+_QUERY_CACHE_PATH = os.environ.get("QUERY_CACHE_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cache", "parsed_queries.sqlite"
+)
+_QUERY_CACHE_TTL_DAYS = float(os.environ.get("QUERY_CACHE_TTL_DAYS", "30"))
+
 
 class SearchQueryFromLLM(BaseModel):
     """Структура ответа LLM для подстановки в фильтры поиска заведений."""
@@ -45,12 +60,89 @@ USER_PROMPT_TEMPLATE = """Пользователь ищет заведение.
 Верни структурированный JSON для поиска по базе."""
 
 
+def _query_cache_key(user_input: str, model: str, available_cuisines: Optional[list[str]]) -> str:
+    """sha256 от нормализованного текста, модели, словаря кухонь и версии промпта/схемы ответа."""
+    from catalog import normalize_text
+
+    payload = json.dumps(
+        {
+            "text": normalize_text(user_input),
+            "model": model,
+            "cuisines": list(available_cuisines or []),
+            "prompt": [SYSTEM_PROMPT, USER_PROMPT_TEMPLATE, SearchQueryFromLLM.model_json_schema()],
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _open_query_cache() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(_QUERY_CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(_QUERY_CACHE_PATH, timeout=30)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS parsed_queries ("
+        " key TEXT PRIMARY KEY,"
+        " user_input TEXT,"
+        " model TEXT,"
+        " result TEXT NOT NULL,"
+        " created_at REAL NOT NULL)"
+    )
+    return conn
+
+
+def _query_cache_get(key: str) -> Optional[dict[str, Any]]:
+    """Разобранный запрос из кэша (не старше QUERY_CACHE_TTL_DAYS) или None."""
+    try:
+        with closing(_open_query_cache()) as conn:
+            row = conn.execute(
+                "SELECT result FROM parsed_queries WHERE key = ? AND created_at >= ?",
+                (key, time.time() - _QUERY_CACHE_TTL_DAYS * 86400),
+            ).fetchone()
+        return SearchQueryFromLLM.model_validate_json(row[0]).model_dump() if row else None
+    except (OSError, sqlite3.Error, ValueError):
+        return None
+
+
+def _query_cache_put(key: str, user_input: str, model: str, result: dict[str, Any]) -> None:
+    try:
+        with closing(_open_query_cache()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO parsed_queries (key, user_input, model, result, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, user_input.strip(), model, json.dumps(result, ensure_ascii=False), time.time()),
+            )
+            conn.commit()
+    except (OSError, sqlite3.Error):
+        pass
+
+
+@lru_cache(maxsize=8)
+def _get_llm(api_key: str, model: str):
+    """Клиент ChatPerplexity — один на (ключ, модель) на процесс."""
+    try:
+        from langchain_perplexity import ChatPerplexity
+    except Exception:
+        import warnings
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="The class `ChatPerplexity` was deprecated.*")
+            from langchain_community.chat_models import ChatPerplexity
+
+    return ChatPerplexity(
+        api_key=api_key,
+        model=model,
+        temperature=0.1,
+        max_tokens=1024,
+    )
+
+
 def query_from_perplexity(
     user_input: str,
     *,
     available_cuisines: Optional[list[str]] = None,
     api_key: Optional[str] = None,
     model: str = "sonar",
+    use_cache: bool = True,
 ) -> dict[str, Any]:
     """
     По тексту пользователя (название, адрес или описание) получает от Perplexity
@@ -58,21 +150,21 @@ def query_from_perplexity(
 
     available_cuisines: список кухонь из нашей базы — в промпте просим выбрать 1–2 самых подходящих.
     api_key: ключ Perplexity (PPLX_API_KEY). Если не передан — берётся из os.environ["PPLX_API_KEY"].
+    use_cache: брать/сохранять разобранный ответ в кэше (cache/parsed_queries.sqlite, QUERY_CACHE=0 — выкл.).
     """
-    import os
     key = api_key or os.environ.get("PPLX_API_KEY")
     if not key:
         raise ValueError(
             "Нужен API-ключ Perplexity: передайте api_key в функцию или задайте переменную окружения PPLX_API_KEY."
         )
 
-    try:
-        from langchain_perplexity import ChatPerplexity
-    except Exception:
-        import warnings
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore", message="The class `ChatPerplexity` was deprecated.*")
-            from langchain_community.chat_models import ChatPerplexity
+    use_cache = use_cache and _QUERY_CACHE_ENABLED
+    cache_key = _query_cache_key(user_input, model, available_cuisines) if use_cache else ""
+    if use_cache:
+        cached = _query_cache_get(cache_key)
+        if cached is not None:
+            return cached
+
     from langchain_core.messages import HumanMessage, SystemMessage
     from langchain_core.output_parsers import PydanticOutputParser
 
@@ -83,12 +175,7 @@ def query_from_perplexity(
     else:
         cuisines_block = ""
 
-    llm = ChatPerplexity(
-        api_key=key,
-        model=model,
-        temperature=0.1,
-        max_tokens=1024,
-    )
+    llm = _get_llm(key, model)
 
     system_text = SYSTEM_PROMPT.format(format_instructions=parser.get_format_instructions())
     user_text = USER_PROMPT_TEMPLATE.format(
@@ -104,7 +191,10 @@ def query_from_perplexity(
     content = response.content if hasattr(response, "content") else str(response)
     result: SearchQueryFromLLM = parser.parse(content)
 
-    return result.model_dump()
+    parsed = result.model_dump()
+    if use_cache:
+        _query_cache_put(cache_key, user_input, model, parsed)
+    return parsed
 
 
 def search_by_user_text(
@@ -0,0 +1,238 @@
+"""
+Локальный кэш обогащения заведений (Perplexity) в SQLite: ключ — нормализованные название + адрес,
+значение — проверенные поля EnrichmentResponse (site, delivery, time_work, average_check).
+
+У каждого поля своё время получения и свой TTL. Запись «свежая», если свежие все поля;
+«устаревшая» (stale), если какое-то поле старше TTL, но не старше TTL + окно stale — такую
+запись отдаём сразу, а обновление запускаем в фоне (stale-while-revalidate). Иначе — промах.
+
+Настройки (env):
+  ENRICHMENT_CACHE=0                 — выключить кэш;
+  ENRICHMENT_CACHE_PATH              — путь к файлу SQLite (по умолчанию <project>/cache/place_enrichment.sqlite);
+  ENRICHMENT_CACHE_TTL_DAYS          — TTL в днях: одно число для всех полей или "time_work=3,site=60";
+  ENRICHMENT_CACHE_STALE_DAYS        — сколько дней после TTL ещё отдавать устаревшую запись (по умолчанию 7).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+ENRICHMENT_FIELDS = ("site", "delivery", "time_work", "average_check")
+
+# TTL по умолчанию: часы работы (и «закрыто навсегда») меняются чаще, чем сайт и чек
+_DEFAULT_TTL_DAYS = {"site": 30.0, "delivery": 30.0, "time_work": 7.0, "average_check": 30.0}
+_DEFAULT_STALE_DAYS = 7.0
+_DAY = 86400.0
+
+# Фоновые обновления устаревших записей — общие на процесс, не больше 2 одновременно
+_REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="enrichment-refresh")
+_REFRESH_IN_FLIGHT: set[str] = set()
+_REFRESH_LOCK = threading.Lock()
+
+# Кэш процесса: одно соединение SQLite на воркер (и фоновые обновления), а не новое на каждую задачу
+_SHARED_LOCK = threading.Lock()
+_SHARED: Optional["EnrichmentCache"] = None
+
+
+def _project_root() -> Path:
+    return Path(__file__).resolve().parents[3]
+
+
+def _parse_ttl_days(raw: str) -> dict[str, float]:
+    """"30" → одинаковый TTL для всех полей; "time_work=3,site=60" → переопределение отдельных полей."""
+    ttl = dict(_DEFAULT_TTL_DAYS)
+    raw = (raw or "").strip()
+    if not raw:
+        return ttl
+    if "=" not in raw:
+        return {field: float(raw) for field in ENRICHMENT_FIELDS}
+    for part in raw.split(","):
+        field, _, value = part.partition("=")
+        field = field.strip()
+        if field in ttl and value.strip():
+            ttl[field] = float(value)
+    return ttl
+
+
+def place_cache_key(place: dict) -> str:
+    """Ключ кэша: нормализованные название и адрес (те же правила, что при матчинге по базе)."""
+    root = _project_root()
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from catalog import normalize_text
+
+    return f"{normalize_text(place.get('название'))}|{normalize_text(place.get('адрес'))}"
+
+
+class EnrichmentCache:
+    """
+    Кэш обогащения + счётчики за один прогон block1 (hits / stale / misses / revalidations / writes / errors).
+    Потокобезопасен: обогащение в block1 идёт из пула потоков.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_days: Optional[dict[str, float]] = None,
+        stale_days: Optional[float] = None,
+    ):
+        self.path = path or os.environ.get("ENRICHMENT_CACHE_PATH") or str(
+            _project_root() / "cache" / "place_enrichment.sqlite"
+        )
+        ttl_days = ttl_days or _parse_ttl_days(os.environ.get("ENRICHMENT_CACHE_TTL_DAYS", ""))
+        self._ttl = {field: ttl_days.get(field, _DEFAULT_TTL_DAYS[field]) * _DAY for field in ENRICHMENT_FIELDS}
+        if stale_days is None:
+            stale_days = float(os.environ.get("ENRICHMENT_CACHE_STALE_DAYS", _DEFAULT_STALE_DAYS))
+        self._stale = stale_days * _DAY
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "revalidations": 0, "writes": 0, "errors": 0}
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS place_enrichment ("
+            " key TEXT PRIMARY KEY,"
+            " name TEXT,"
+            " address TEXT,"
+            " fields TEXT NOT NULL,"
+            " model TEXT,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["EnrichmentCache"]:
+        """Кэш с настройками из env; None — если выключен (ENRICHMENT_CACHE=0) или файл недоступен."""
+        if os.environ.get("ENRICHMENT_CACHE", "1") == "0":
+            return None
+        try:
+            return cls()
+        except (OSError, sqlite3.Error) as e:
+            print(f"[block1] Кэш обогащения недоступен: {e}", flush=True)
+            return None
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _read(self, key: str) -> Optional[dict[str, dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute("SELECT fields FROM place_enrichment WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def lookup(self, place: dict) -> tuple[str, Optional[dict[str, Any]]]:
+        """
+        ("fresh" | "stale" | "miss", поля). Для fresh/stale поля — {site, delivery, time_work, average_check}.
+        """
+        try:
+            stored = self._read(place_cache_key(place))
+        except (sqlite3.Error, ValueError):
+            self._count("errors")
+            stored = None
+        if not stored or any(field not in stored for field in ENRICHMENT_FIELDS):
+            self._count("misses")
+            return "miss", None
+
+        now = time.time()
+        ages = {field: now - float(stored[field]["fetched_at"]) for field in ENRICHMENT_FIELDS}
+        values = {field: stored[field]["value"] for field in ENRICHMENT_FIELDS}
+        if all(ages[f] <= self._ttl[f] for f in ENRICHMENT_FIELDS):
+            self._count("hits")
+            return "fresh", values
+        if all(ages[f] <= self._ttl[f] + self._stale for f in ENRICHMENT_FIELDS):
+            self._count("stale")
+            return "stale", values
+        self._count("misses")
+        return "miss", None
+
+    def store(self, place: dict, values: dict[str, Any], model: str = "") -> None:
+        """
+        Записать свежий ответ. Поле обновляется, если новое значение не null или старое уже протухло:
+        так случайный null от LLM не затирает ещё свежий сайт/часы работы.
+        """
+        key = place_cache_key(place)
+        now = time.time()
+        try:
+            stored = self._read(key) or {}
+            merged: dict[str, dict[str, Any]] = {}
+            for field in ENRICHMENT_FIELDS:
+                old = stored.get(field)
+                old_fresh = old is not None and now - float(old["fetched_at"]) <= self._ttl[field]
+                if values.get(field) is None and old_fresh:
+                    merged[field] = old
+                else:
+                    merged[field] = {"value": values.get(field), "fetched_at": now}
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO place_enrichment (key, name, address, fields, model, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        str(place.get("название") or ""),
+                        str(place.get("адрес") or ""),
+                        json.dumps(merged, ensure_ascii=False),
+                        model,
+                        now,
+                    ),
+                )
+                self._conn.commit()
+                self.stats["writes"] += 1
+        except (sqlite3.Error, ValueError):
+            self._count("errors")
+
+    def revalidate(self, place: dict, fetch: Callable[[dict], Optional[dict[str, Any]]], model: str = "") -> None:
+        """
+        Фоновое обновление устаревшей записи: fetch(place) → поля (или None при ошибке) → store.
+        Повторный запрос для ключа, который уже обновляется, не ставится.
+        """
+        key = place_cache_key(place)
+        with _REFRESH_LOCK:
+            if key in _REFRESH_IN_FLIGHT:
+                return
+            _REFRESH_IN_FLIGHT.add(key)
+
+        self._count("revalidations")
+        snapshot = dict(place)
+
+        def _task() -> None:
+            try:
+                values = fetch(snapshot)
+                if values is not None:
+                    self.store(snapshot, values, model=model)
+            except Exception:
+                self._count("errors")
+            finally:
+                with _REFRESH_LOCK:
+                    _REFRESH_IN_FLIGHT.discard(key)
+
+        _REFRESH_EXECUTOR.submit(_task)
+
+    def stats_snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def stats_since(self, before: dict[str, int]) -> dict[str, int]:
+        """Счётчики с момента снимка before (кэш общий на процесс — так считаются счётчики одного прогона)."""
+        return {name: value - before.get(name, 0) for name, value in self.stats_snapshot().items()}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def shared_cache() -> Optional[EnrichmentCache]:
+    """Кэш обогащения процесса (EnrichmentCache.from_env при первом вызове); None — выключен или недоступен."""
+    global _SHARED
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            _SHARED = EnrichmentCache.from_env()
+        return _SHARED
@@ -3,12 +3,16 @@ import os
 import re
 import sys
 from pathlib import Path
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 
 import pandas as pd
 from pydantic import BaseModel, Field
 from typing import Optional
 
+if TYPE_CHECKING:
+    from name_index import NameIndex
+    from restaurant_pipeline.blocks.block1_relevance.enrichment_cache import EnrichmentCache
+
 class EnrichmentResponse(BaseModel):
     site: Optional[str] = Field(default=None)
     delivery: Optional[bool] = Field(default=None)
@@ -386,10 +390,12 @@ def _inject_exact_name_match_from_df(
     df: pd.DataFrame,
     query_text: str,
     top_n: int,
+    name_index: Optional["NameIndex"] = None,
 ) -> list[dict]:
     """
     Если точного совпадения названия нет в текущем топе,
     добавляет его из исходного df в начало.
+    name_index — индекс названий df (PlaceSearch.name_index()), чтобы не сканировать весь df.
     """
     q = (query_text or "").strip().casefold()
     if not q:
@@ -405,7 +411,11 @@ def _inject_exact_name_match_from_df(
     if "название" not in df.columns:
         return places
 
-    exact_df = df[df["название"].fillna("").astype(str).str.strip().str.casefold() == q]
+    if name_index is not None:
+        rows = name_index.exact(q)
+        exact_df = df.iloc[rows[:1]]
+    else:
+        exact_df = df[df["название"].fillna("").astype(str).str.strip().str.casefold() == q]
     if len(exact_df) == 0:
         return places
 
@@ -486,16 +496,11 @@ class EnrichmentResponse(BaseModel):
 
 
 
-def _enrich_place_with_perplexity(place: dict, api_key: str, model: str = "sonar") -> dict:
+def _fetch_enrichment(place: dict, api_key: str, model: str = "sonar") -> dict | None:
     """
-    Обогащает заведение полями через Perplexity API:
-    - сайт (официальный URL заведения, НЕ агрегатора/каталога)
-    - доставка (True/False/None)
-    - время_работы (строка или 'закрыто навсегда')
+    Запрос к Perplexity: проверенные поля EnrichmentResponse
+    {site (только собственный сайт), delivery, time_work, average_check} или None, если ответ не получен/не разобран.
     """
-    if not api_key:
-        return place
-
     try:
         from langchain_perplexity import ChatPerplexity
     except Exception:
@@ -568,31 +573,40 @@ def _enrich_place_with_perplexity(place: dict, api_key: str, model: str = "sonar
             content = match.group(1)
 
         enriched: EnrichmentResponse = parser.parse(content)
+    except (OutputParserException, Exception):
+        return None
+
+    site = enriched.site
+    time_work = enriched.time_work
+    average_check = enriched.average_check
+    return {
+        # Только официальный сайт (не агрегатор)
+        "site": site.strip() if isinstance(site, str) and site.strip() and _is_own_site(site) else None,
+        "delivery": enriched.delivery if isinstance(enriched.delivery, bool) else None,
+        "time_work": time_work.strip() if isinstance(time_work, str) and time_work.strip() else None,
+        "average_check": (
+            float(average_check) if isinstance(average_check, (int, float)) and average_check > 0 else None
+        ),
+    }
 
-        site = enriched.site
-        delivery = enriched.delivery
-        time_work = enriched.time_work
 
-        # 1) Обновляем официальный сайт
-        if isinstance(site, str) and site.strip() and _is_own_site(site):
-            place["сайт"] = site.strip()
+def _apply_enrichment(place: dict, fields: dict | None) -> dict:
+    """Переносит поля обогащения (из ответа Perplexity или из кэша) в карточку заведения."""
+    if fields is not None:
+        # 1) Официальный сайт
+        if fields.get("site"):
+            place["сайт"] = fields["site"]
 
         # 2) Доставка
-        if isinstance(delivery, (bool, type(None))):
-            place["доставка"] = delivery
+        place["доставка"] = fields.get("delivery")
 
         # 3) Время работы
-        if isinstance(time_work, str) and time_work.strip():
-            place["время_работы"] = time_work.strip()
+        if fields.get("time_work"):
+            place["время_работы"] = fields["time_work"]
 
         # 4) Средний чек — только если отсутствует или NaN
-        average_check = enriched.average_check
-        if _check_is_missing(place.get("средний_чек")):
-            if isinstance(average_check, (int, float)) and average_check > 0:
-                place["средний_чек"] = float(average_check)
-
-    except (OutputParserException, Exception):
-        pass
+        if _check_is_missing(place.get("средний_чек")) and fields.get("average_check"):
+            place["средний_чек"] = float(fields["average_check"])
 
     # Fallback: если после Perplexity чек всё ещё пустой — дефолт по типу
     if _check_is_missing(place.get("средний_чек")):
@@ -601,6 +615,37 @@ def _enrich_place_with_perplexity(place: dict, api_key: str, model: str = "sonar
     return place
 
 
+def _enrich_place_with_perplexity(
+    place: dict,
+    api_key: str,
+    model: str = "sonar",
+    cache: "EnrichmentCache | None" = None,
+) -> dict:
+    """
+    Обогащает заведение полями через Perplexity API:
+    - сайт (официальный URL заведения, НЕ агрегатора/каталога)
+    - доставка (True/False/None)
+    - время_работы (строка или 'закрыто навсегда')
+
+    С кэшем (enrichment_cache.py): свежая запись — без запроса к LLM; устаревшая — отдаём
+    из кэша и обновляем в фоне; промах — запрос и запись ответа в кэш.
+    """
+    if not api_key:
+        return place
+
+    if cache is not None:
+        status, fields = cache.lookup(place)
+        if status == "stale":
+            cache.revalidate(place, lambda p: _fetch_enrichment(p, api_key, model=model), model=model)
+        if status != "miss":
+            return _apply_enrichment(place, fields)
+
+    fields = _fetch_enrichment(place, api_key, model=model)
+    if cache is not None and fields is not None:
+        cache.store(place, fields, model=model)
+    return _apply_enrichment(place, fields)
+
+
 
 def _is_place_valid(place: dict) -> bool:
     """
@@ -624,6 +669,81 @@ def _is_place_valid(place: dict) -> bool:
     return True
 
 
+def _open_enrichment_cache() -> "EnrichmentCache | None":
+    """Кэш обогащения процесса по настройкам из env (None — выключен или недоступен)."""
+    root = _project_root()
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from restaurant_pipeline.blocks.block1_relevance.enrichment_cache import shared_cache
+
+    return shared_cache()
+
+
+# Обогащение кандидатов через Perplexity: сколько запросов одновременно и сколько резервных
+# кандидатов обогащать заранее, не дожидаясь отказа основного (1 и 0 — последовательный обход)
+_ENRICH_CONCURRENCY = max(1, int(os.environ.get("BLOCK1_ENRICH_CONCURRENCY", "4")))
+_ENRICH_SPECULATIVE = max(0, int(os.environ.get("BLOCK1_ENRICH_SPECULATIVE", "2")))
+
+
+def _enrich_and_select(
+    candidates: list[dict],
+    reserve: list[dict],
+    api_key: str,
+    model: str = "sonar",
+    cache: "EnrichmentCache | None" = None,
+) -> list[dict]:
+    """
+    Обогащает кандидатов и подбирает замены из резерва. Результат — как у последовательного обхода:
+    кандидаты в исходном порядке; невалидный (_is_place_valid) заменяется первым валидным из ещё
+    не просмотренного резерва (просмотренные невалидные резервные отбрасываются); если резерв
+    кончился — остаётся сам невалидный кандидат.
+
+    Запросы идут параллельно (до _ENRICH_CONCURRENCY), а _ENRICH_SPECULATIVE следующих резервных
+    обогащаются заранее. Ещё не начатые ненужные запросы отменяются при выходе.
+    """
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+    executor = ThreadPoolExecutor(max_workers=_ENRICH_CONCURRENCY, thread_name_prefix="block1-enrich")
+    reserve_futures: dict[int, Future] = {}
+
+    def _submit(place: dict) -> Future:
+        return executor.submit(_enrich_place_with_perplexity, place, api_key, model, cache)
+
+    def _reserve_future(idx: int) -> Future:
+        # Запрос для reserve[idx] + спекулятивные запросы для следующих _ENRICH_SPECULATIVE
+        for j in range(idx, min(len(reserve), idx + 1 + _ENRICH_SPECULATIVE)):
+            if j not in reserve_futures:
+                reserve_futures[j] = _submit(reserve[j])
+        return reserve_futures[idx]
+
+    final_places: list[dict] = []
+    try:
+        candidate_futures = [_submit(p) for p in candidates]
+        for j in range(min(len(reserve), _ENRICH_SPECULATIVE)):
+            reserve_futures[j] = _submit(reserve[j])
+
+        reserve_idx = 0
+        for future in candidate_futures:
+            enriched = future.result()
+            if _is_place_valid(enriched):
+                final_places.append(enriched)
+                continue
+            replaced = False
+            while reserve_idx < len(reserve):
+                enriched_reserve = _reserve_future(reserve_idx).result()
+                reserve_idx += 1
+                if _is_place_valid(enriched_reserve):
+                    final_places.append(enriched_reserve)
+                    replaced = True
+                    break
+            if not replaced:
+                final_places.append(enriched)
+    finally:
+        # Незапущенные спекулятивные запросы отменяем; уже идущие дорабатывают в фоне, не блокируя блок
+        executor.shutdown(wait=False, cancel_futures=True)
+    return final_places
+
+
 class ReferenceEnrichment(BaseModel):
     """Обогащение карточки reference_place (без описания — оно приходит из query_from_perplexity)."""
 
@@ -752,7 +872,7 @@ def _build_reference_card(ref: dict, api_key: str | None, model: str = "sonar")
 
 def _run_market(request: dict, root: Path) -> dict:
     """Сценарий «обзор рынка» — логика без изменений."""
-    from place_search import PlaceSearch
+    from place_search import get_place_search
     from search_unified import search_unified
 
     mode = request.get("mode", "template")
@@ -762,7 +882,7 @@ def _run_market(request: dict, root: Path) -> dict:
     source_csv = request.get("source_csv", str(root / "final_blyat_v3.csv"))
     source_csv = str(Path(source_csv))
 
-    engine = PlaceSearch.from_csv(source_csv, collapse=True)
+    engine = get_place_search(source_csv, collapse=True)
     df = engine.df
 
     if mode == "template":
@@ -777,37 +897,30 @@ def _run_market(request: dict, root: Path) -> dict:
     api_key = os.environ.get("PPLX_API_KEY")
 
     search_limit = top_n * 3
-    places = search_unified(df, query_or_text, n=search_limit, api_key=api_key)
+    places = search_unified(df, query_or_text, n=search_limit, api_key=api_key, engine=engine)
 
     if mode == "free_form":
-        places = _inject_exact_name_match_from_df(places, df, query_or_text, top_n)
+        places = _inject_exact_name_match_from_df(
+            places, df, query_or_text, top_n, name_index=engine.name_index()
+        )
         places = _prioritize_exact_name_match(places, query_or_text)
 
     normalized = [_normalize_place(p) for p in places]
 
     final_places = []
+    enrichment_cache = None
+    cache_stats_before: dict = {}
     if enrich_with_perplexity and api_key:
-        candidates = normalized[:top_n]
-        reserve = normalized[top_n:]
-        reserve_idx = 0
-        for candidate in candidates:
-            enriched = _enrich_place_with_perplexity(candidate, api_key, model=perplexity_model)
-            if _is_place_valid(enriched):
-                final_places.append(enriched)
-            else:
-                replaced = False
-                while reserve_idx < len(reserve):
-                    reserve_candidate = reserve[reserve_idx]
-                    reserve_idx += 1
-                    enriched_reserve = _enrich_place_with_perplexity(
-                        reserve_candidate, api_key, model=perplexity_model
-                    )
-                    if _is_place_valid(enriched_reserve):
-                        final_places.append(enriched_reserve)
-                        replaced = True
-                        break
-                if not replaced:
-                    final_places.append(enriched)
+        enrichment_cache = _open_enrichment_cache()
+        if enrichment_cache is not None:
+            cache_stats_before = enrichment_cache.stats_snapshot()
+        final_places = _enrich_and_select(
+            normalized[:top_n],
+            normalized[top_n:],
+            api_key,
+            model=perplexity_model,
+            cache=enrichment_cache,
+        )
     else:
         final_places = normalized[:top_n]
 
@@ -827,6 +940,7 @@ def _run_market(request: dict, root: Path) -> dict:
         "perplexity_model": perplexity_model,
         "source_csv": source_csv,
         "query_context": query_context,
+        "enrichment_cache": enrichment_cache.stats_since(cache_stats_before) if enrichment_cache else None,
         "общий_вывод": overall_summary,
         "selected_places": final_places,
     }
@@ -838,7 +952,7 @@ def _run_competitive(request: dict, root: Path) -> dict:
     По данным опорного заведения определяет тип/кухню/цену → ищет 10 конкурентов из БД →
     собирает 11-ю карточку из reference_place → возвращает 11 мест.
     """
-    from place_search import PlaceSearch, search_places, get_available_cuisines
+    from place_search import get_place_search, search_places
     from query_from_perplexity import query_from_perplexity
 
     ref = request.get("reference_place", {})
@@ -853,17 +967,17 @@ def _run_competitive(request: dict, root: Path) -> dict:
 
     api_key = os.environ.get("PPLX_API_KEY")
 
-    engine = PlaceSearch.from_csv(source_csv, collapse=True)
+    engine = get_place_search(source_csv, collapse=True)
     df = engine.df
 
     ref_query = f"{ref.get('name', '')} {ref.get('address', '')}".strip()
     search_limit = top_n * 3
 
-    available_cuisines = get_available_cuisines(df)
+    available_cuisines = engine.available_cuisines()
     parsed_query = query_from_perplexity(ref_query, available_cuisines=available_cuisines, api_key=api_key)
     ref_описание_полное = parsed_query.get("описание_полное")
 
-    places = search_places(df, parsed_query, n=search_limit)
+    places = search_places(df, parsed_query, n=search_limit, engine=engine)
 
     normalized = [_normalize_place(p) for p in places]
     ref_name_norm = _norm_name_for_dedup(ref.get("name", ""))
@@ -882,28 +996,19 @@ def _run_competitive(request: dict, root: Path) -> dict:
     normalized = deduped
 
     final_places = []
+    enrichment_cache = None
+    cache_stats_before: dict = {}
     if enrich_with_perplexity and api_key:
-        candidates = normalized[:top_n]
-        reserve = normalized[top_n:]
-        reserve_idx = 0
-        for candidate in candidates:
-            enriched = _enrich_place_with_perplexity(candidate, api_key, model=perplexity_model)
-            if _is_place_valid(enriched):
-                final_places.append(enriched)
-            else:
-                replaced = False
-                while reserve_idx < len(reserve):
-                    reserve_candidate = reserve[reserve_idx]
-                    reserve_idx += 1
-                    enriched_reserve = _enrich_place_with_perplexity(
-                        reserve_candidate, api_key, model=perplexity_model
-                    )
-                    if _is_place_valid(enriched_reserve):
-                        final_places.append(enriched_reserve)
-                        replaced = True
-                        break
-                if not replaced:
-                    final_places.append(enriched)
+        enrichment_cache = _open_enrichment_cache()
+        if enrichment_cache is not None:
+            cache_stats_before = enrichment_cache.stats_snapshot()
+        final_places = _enrich_and_select(
+            normalized[:top_n],
+            normalized[top_n:],
+            api_key,
+            model=perplexity_model,
+            cache=enrichment_cache,
+        )
     else:
         final_places = normalized[:top_n]
 
@@ -929,6 +1034,7 @@ def _run_competitive(request: dict, root: Path) -> dict:
         "perplexity_model": perplexity_model,
         "source_csv": source_csv,
         "reference_place": ref,
+        "enrichment_cache": enrichment_cache.stats_since(cache_stats_before) if enrichment_cache else None,
         "вывод_по_опорному": вывод_по_опорному,
         "selected_places": final_places,
     }
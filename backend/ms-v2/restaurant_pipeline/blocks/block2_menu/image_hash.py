@@ -0,0 +1,171 @@
+"""
+Дедупликация полос меню внутри одного файла по перцептивному хешу: одна и та же страница,
+повторённая в PDF или отрендеренная дважды, отличается байтами JPEG и поэтому не находится
+в кэше по содержимому (menu_cache.py).
+
+Два шага:
+1) dHash — знаки горизонтальных перепадов яркости на сетке 32×32 (1024 бита): кандидаты —
+   полосы того же размера в пикселях с расстоянием Хэмминга не больше порога. Хеш грубый:
+   смену цен в той же вёрстке он не замечает;
+2) сверка в полном разрешении: средние яркости по блокам 2×2 не должны расходиться больше чем
+   на _MAX_BLOCK_DIFF ни в одном блоке — другая цифра в цене (даже мелким шрифтом) даёт
+   расхождение в несколько раз больше.
+Совпала — позиции берутся у найденной полосы.
+
+Сравниваются только полосы одного файла в одном прогоне (file_scope): у филиалов сети и у
+разных ссылок меню могут быть разные цены, а перерендер или масштаб другой страницы отличается
+от неё так же сильно, как сменённая цена, — такие полосы уходят в vision. Отпечатки живут
+в памяти (пиксели сжаты zlib) и отпускаются вместе с файлом. Почти однотонные полосы (мало
+перепадов) не хешируются.
+
+Настройки (env):
+  BLOCK2_IMAGE_DEDUP=0              — выключить;
+  BLOCK2_IMAGE_DEDUP_DISTANCE       — порог расстояния Хэмминга dHash из 1024 бит (по умолчанию 32).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import zlib
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+_GRID = 32
+_HASH_BYTES = _GRID * _GRID // 8
+# Меньше стольких перепадов (или больше N − столько) — полоса почти однотонная, не хешируем
+_MIN_EDGES = 64
+# Блок сверки в полном разрешении и предел расхождения средних яркостей в нём (0..255)
+_BLOCK = 2
+_MAX_BLOCK_DIFF = 32.0
+# Сколько ближайших по хешу кандидатов сверять попиксельно
+_MAX_CANDIDATES = 3
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+class ImageFingerprint(NamedTuple):
+    phash: bytes             # dHash, 128 байт
+    size: tuple[int, int]    # (ширина, высота) полосы
+    pixels: bytes            # оттенки серого в полном разрешении, zlib
+
+
+def fingerprint(image) -> Optional[ImageFingerprint]:
+    """Отпечаток полосы (PIL Image); None — полоса почти однотонная."""
+    from PIL import Image
+
+    gray = image.convert("L")
+    pixels = np.asarray(gray.resize((_GRID + 1, _GRID), Image.Resampling.BOX), dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    n_edges = int(bits.sum())
+    if n_edges < _MIN_EDGES or n_edges > bits.size - _MIN_EDGES:
+        return None
+    return ImageFingerprint(np.packbits(bits).tobytes(), gray.size, zlib.compress(gray.tobytes(), 1))
+
+
+def _pixels(fp: ImageFingerprint) -> np.ndarray:
+    width, height = fp.size
+    return np.frombuffer(zlib.decompress(fp.pixels), dtype=np.uint8).reshape(height, width)
+
+
+def _block_means(pixels: np.ndarray) -> np.ndarray:
+    b = _BLOCK
+    h, w = pixels.shape[0] // b * b, pixels.shape[1] // b * b
+    return pixels[:h, :w].astype(np.float32).reshape(h // b, b, w // b, b).mean(axis=(1, 3))
+
+
+def _same_content(a: ImageFingerprint, b: ImageFingerprint) -> bool:
+    """Одна и та же полоса: тот же размер и ни в одном блоке 2×2 яркости не расходятся сильно."""
+    if a.size != b.size:
+        return False
+    return float(np.abs(_block_means(_pixels(a)) - _block_means(_pixels(b))).max()) <= _MAX_BLOCK_DIFF
+
+
+class FileImageHashes:
+    """Отпечатки разобранных полос одного файла → позиции (см. ImageHashStore.file_scope)."""
+
+    def __init__(self, store: "ImageHashStore"):
+        self._store = store
+        self._lock = threading.Lock()
+        self._hashes = np.empty((0, _HASH_BYTES), dtype=np.uint8)
+        self._entries: list[tuple[ImageFingerprint, list[dict]]] = []
+
+    def _candidates(self, fp: ImageFingerprint) -> list[int]:
+        """Номера полос того же размера в пределах порога — ближайшие первыми (вызывать под self._lock)."""
+        if not self._entries:
+            return []
+        distance = _POPCOUNT[self._hashes ^ np.frombuffer(fp.phash, dtype=np.uint8)].sum(axis=1)
+        found = sorted(
+            (int(distance[k]), int(k)) for k in np.flatnonzero(distance <= self._store.max_distance)
+            if self._entries[k][0].size == fp.size
+        )
+        return [k for _, k in found[:_MAX_CANDIDATES]]
+
+    def find(self, fp: Optional[ImageFingerprint]) -> Optional[list[dict]]:
+        """Позиции такой же уже разобранной полосы этого файла или None. fp=None — полоса не хешировалась."""
+        if fp is None:
+            self._store._count("checked", "low_detail")
+            return None
+        with self._lock:
+            candidates = [self._entries[k] for k in self._candidates(fp)]
+        rejected = 0
+        try:
+            for other, items in candidates:
+                if _same_content(fp, other):
+                    self._store._count("checked", "hits", rejected=rejected)
+                    return [dict(item) for item in items]
+                rejected += 1
+        except (zlib.error, ValueError):
+            self._store._count("errors")
+        self._store._count("checked", "misses", rejected=rejected)
+        return None
+
+    def put(self, fp: Optional[ImageFingerprint], items: list[dict]) -> None:
+        if fp is None or not items:
+            return
+        with self._lock:
+            self._hashes = np.vstack([self._hashes, np.frombuffer(fp.phash, dtype=np.uint8)[None, :]])
+            self._entries.append((fp, [dict(item) for item in items]))
+        self._store._count("writes")
+
+
+class ImageHashStore:
+    """
+    Счётчики перцептивной дедупликации за один прогон block2
+    (checked / hits / misses / rejected / low_detail / writes / errors); сами отпечатки —
+    в file_scope() на время разбора одного файла. rejected — кандидаты по хешу, не прошедшие
+    попиксельную сверку. Потокобезопасен.
+    """
+
+    def __init__(self, max_distance: Optional[int] = None):
+        if max_distance is None:
+            max_distance = int(os.environ.get("BLOCK2_IMAGE_DEDUP_DISTANCE", "32"))
+        self.max_distance = max(0, max_distance)
+        self._lock = threading.Lock()
+        self.stats = {
+            "checked": 0, "hits": 0, "misses": 0, "rejected": 0, "low_detail": 0, "writes": 0, "errors": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> Optional["ImageHashStore"]:
+        """Дедупликация с настройками из env; None — если выключена (BLOCK2_IMAGE_DEDUP=0)."""
+        if os.environ.get("BLOCK2_IMAGE_DEDUP", "1") == "0":
+            return None
+        return cls()
+
+    def file_scope(self) -> FileImageHashes:
+        """Пустой набор отпечатков для разбора одного файла: полосы других файлов в нём не ищутся."""
+        return FileImageHashes(self)
+
+    def _count(self, *names: str, rejected: int = 0) -> None:
+        with self._lock:
+            for name in names:
+                self.stats[name] += 1
+            self.stats["rejected"] += rejected
+
+    def stats_snapshot(self) -> dict[str, float]:
+        """Счётчики + dedup_rate — доля проверенных полос, взятых у таких же уже разобранных."""
+        with self._lock:
+            snapshot: dict[str, float] = dict(self.stats)
+        snapshot["dedup_rate"] = round(snapshot["hits"] / snapshot["checked"], 4) if snapshot["checked"] else 0.0
+        return snapshot
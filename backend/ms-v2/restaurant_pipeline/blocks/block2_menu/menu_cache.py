@@ -0,0 +1,125 @@
+"""
+Кэш разбора меню по содержимому (SQLite), общий для всех отчётов: sha256 байтов файла меню
+(или JPEG одной страницы/полосы, отправляемого в vision-модель) → распознанные позиции MenuItem.
+
+Ключ включает версию разбора — хеш промпта, схемы ответа, модели и параметров растеризации/нарезки:
+изменили промпт или модель — старые записи просто перестают находиться. Одинаковые PDF сетевых
+заведений и неизменившиеся меню разбираются один раз; в vision уходят только новые файлы/полосы.
+Пустые результаты не сохраняются (пустой ответ может быть и сбоем разбора).
+
+Настройки (env):
+  MENU_CACHE=0        — выключить кэш;
+  MENU_CACHE_PATH     — путь к файлу SQLite (по умолчанию <project>/cache/menu_parse.sqlite).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+# Уровни ключа: целый файл меню и одна страница/полоса
+KIND_FILE = "file"
+KIND_SLICE = "slice"
+
+
+def _project_root() -> Path:
+    return Path(__file__).resolve().parents[3]
+
+
+def content_hash(data: bytes | str) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def parse_version(*parts: object) -> str:
+    """Версия разбора: хеш всего, от чего зависит результат (промпт, схема, модель, параметры)."""
+    payload = json.dumps([str(p) for p in parts], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class MenuParseCache:
+    """
+    Кэш разобранных меню + счётчики за один прогон block2
+    (file_hits / file_misses / slice_hits / slice_misses / writes / errors). Потокобезопасен.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get("MENU_CACHE_PATH") or str(
+            _project_root() / "cache" / "menu_parse.sqlite"
+        )
+        self._lock = threading.Lock()
+        self.stats = {"file_hits": 0, "file_misses": 0, "slice_hits": 0, "slice_misses": 0, "writes": 0, "errors": 0}
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS menu_parse ("
+            " kind TEXT NOT NULL,"
+            " hash TEXT NOT NULL,"
+            " version TEXT NOT NULL,"
+            " items TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (kind, hash, version))"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["MenuParseCache"]:
+        """Кэш с настройками из env; None — если выключен (MENU_CACHE=0) или файл недоступен."""
+        if os.environ.get("MENU_CACHE", "1") == "0":
+            return None
+        try:
+            return cls()
+        except (OSError, sqlite3.Error) as e:
+            print(f"[block2] Кэш разбора меню недоступен: {e}", flush=True)
+            return None
+
+    def get(self, kind: str, digest: str, version: str) -> Optional[list[dict]]:
+        """Позиции из кэша или None (промах)."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT items FROM menu_parse WHERE kind = ? AND hash = ? AND version = ?",
+                    (kind, digest, version),
+                ).fetchone()
+            items = json.loads(row[0]) if row else None
+        except (sqlite3.Error, ValueError):
+            items = None
+            self._count("errors")
+        self._count(f"{kind}_hits" if items is not None else f"{kind}_misses")
+        return items
+
+    def put(self, kind: str, digest: str, version: str, items: list[dict]) -> None:
+        if not items:
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO menu_parse (kind, hash, version, items, created_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (kind, digest, version, json.dumps(items, ensure_ascii=False), time.time()),
+                )
+                self._conn.commit()
+                self.stats["writes"] += 1
+        except (sqlite3.Error, TypeError, ValueError):
+            self._count("errors")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def stats_snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
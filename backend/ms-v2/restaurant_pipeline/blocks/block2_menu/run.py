@@ -3,16 +3,26 @@ from __future__ import annotations
 import base64
 import io
 import json
+import math
 import os
 import re
 import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+from urllib.parse import urlparse
 
-import pandas as pd
 import requests
 from pydantic import BaseModel, Field
 
+if TYPE_CHECKING:
+    from restaurant_pipeline.blocks.http_cache import HttpCache
+    import numpy as np
+    from name_index import NameIndex
+    from restaurant_pipeline.blocks.block2_menu.image_hash import FileImageHashes, ImageFingerprint, ImageHashStore
+    from restaurant_pipeline.blocks.block2_menu.menu_cache import MenuParseCache
+
 
 class MenuItem(BaseModel):
     category: Optional[str] = Field(None, description="Категория блюда (супы, салаты, горячее, напитки и т.д.)")
@@ -24,36 +34,88 @@ class MenuParseResult(BaseModel):
     items: list[MenuItem] = Field(description="Список позиций меню")
 
 
+class MenuBatchItem(MenuItem):
+    image: int = Field(1, description="Номер изображения в запросе (1..N), на котором позиция")
+
+
+class MenuBatchParseResult(BaseModel):
+    items: list[MenuBatchItem] = Field(description="Список позиций меню со всех изображений запроса")
+
+
 def _project_root() -> Path:
     return Path(__file__).resolve().parents[3]
 
 
-def _norm(s: str) -> str:
-    return re.sub(r"\s+", " ", str(s or "").strip().lower().replace("ё", "е"))
+class _MenuLinkIndex:
+    """
+    Ссылки на меню всех строк базы: индекс названий (name_index.py) + колонки меню_ссылки/меню_типы.
+    Строится одной загрузкой колонок на CSV и живёт в процессе (_load_menu_link_index), так что
+    заведения отчёта — и следующих отчётов в том же воркере — ищутся без повторного чтения базы.
+    """
 
+    def __init__(self, names: "NameIndex", links: np.ndarray, types: np.ndarray):
+        self.names = names
+        self.links = links
+        self.types = types
 
-def _find_menu_links(source_csv: str, place_name: str) -> tuple[list[str], list[str]]:
-    """Ищет ссылки на меню в source_csv по названию заведения. Возвращает (urls, types)."""
-    df = pd.read_csv(source_csv, usecols=["название", "меню_ссылки", "меню_типы"], low_memory=False)
-    df["_norm"] = df["название"].fillna("").map(_norm)
-    target = _norm(place_name)
+    def lookup(self, place_name: str) -> tuple[list[str], list[str]]:
+        """(urls, types) первой строки с тем же названием, иначе — содержащей его; ([], []) — нет ссылок."""
+        from catalog import normalize_name
+
+        pos = self.names.first(normalize_name(place_name))
+        if pos is None:
+            return [], []
+
+        raw_links = str(self.links[pos] or "")
+        raw_types = str(self.types[pos] or "")
+
+        if not raw_links.strip() or raw_links == "nan":
+            return [], []
 
-    row = df[df["_norm"] == target]
-    if len(row) == 0:
-        row = df[df["_norm"].str.contains(target, regex=False)]
-    if len(row) == 0:
-        return [], []
+        urls = [u.strip() for u in raw_links.split("|") if u.strip()]
+        types = [t.strip() for t in raw_types.split("|")] if raw_types.strip() and raw_types != "nan" else []
 
-    raw_links = str(row.iloc[0]["меню_ссылки"] or "")
-    raw_types = str(row.iloc[0]["меню_типы"] or "")
+        return urls, types
 
-    if not raw_links.strip() or raw_links == "nan":
-        return [], []
 
-    urls = [u.strip() for u in raw_links.split("|") if u.strip()]
-    types = [t.strip() for t in raw_types.split("|")] if raw_types.strip() and raw_types != "nan" else []
+# Процессный кэш _load_menu_link_index: путь к CSV → (размер, mtime, индекс)
+_MENU_LINKS: dict[str, tuple[int, int, _MenuLinkIndex]] = {}
+_MENU_LINKS_LOCK = threading.Lock()
 
-    return urls, types
+
+def _load_menu_link_index(source_csv: str) -> _MenuLinkIndex:
+    """
+    Индекс ссылок на меню для source_csv: строки читаются из колоночного каталога (catalog.py),
+    если он собран, — только нужные колонки. Перестраивается, только если изменился CSV.
+    """
+    project_root = _project_root()
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+    from catalog import load_rows
+    from name_index import NameIndex
+
+    abs_path = os.path.abspath(source_csv)
+    st = os.stat(abs_path)
+    with _MENU_LINKS_LOCK:
+        cached = _MENU_LINKS.get(abs_path)
+        if cached is not None and cached[:2] == (st.st_size, st.st_mtime_ns):
+            return cached[2]
+        df = load_rows(abs_path, columns=["_name_key", "меню_ссылки", "меню_типы"])
+        index = _MenuLinkIndex(
+            NameIndex(df["_name_key"]),
+            df["меню_ссылки"].to_numpy(dtype=object),
+            df["меню_типы"].to_numpy(dtype=object),
+        )
+        _MENU_LINKS[abs_path] = (st.st_size, st.st_mtime_ns, index)
+        return index
+
+
+def _find_menu_links(source_csv: str, place_name: str) -> tuple[list[str], list[str]]:
+    """
+    Ищет ссылки на меню в source_csv по названию заведения. Возвращает (urls, types).
+    Строка ищется по индексу названий: точное совпадение, иначе — по вхождению (_MenuLinkIndex).
+    """
+    return _load_menu_link_index(source_csv).lookup(place_name)
 
 
 _BROWSER_HEADERS = {
@@ -126,71 +188,399 @@ def _download_with_playwright(url: str, timeout: int = 30) -> tuple[bytes, str]:
     return content, ext
 
 
-def _download_file(url: str, timeout: int = 30) -> tuple[bytes, str]:
-    """Скачивает файл. Цепочка: requests → cloudscraper → Playwright."""
-    from urllib.parse import urlparse
-
-    origin = urlparse(url).scheme + "://" + urlparse(url).netloc
-
-    resp = requests.get(url, timeout=timeout, headers={
-        **_BROWSER_HEADERS, "Referer": origin + "/",
-    })
-
-    if resp.status_code in (403, 412):
+# Скачивание меню: всего одновременных загрузок, не больше N на один хост,
+# и на сколько файлов вперёд качаем, пока разбираются уже скачанные
+_DOWNLOAD_CONCURRENCY = max(1, int(os.environ.get("BLOCK2_DOWNLOAD_CONCURRENCY", "8")))
+_DOWNLOAD_PER_HOST = max(1, int(os.environ.get("BLOCK2_DOWNLOAD_PER_HOST", "2")))
+_DOWNLOAD_AHEAD = max(1, int(os.environ.get("BLOCK2_DOWNLOAD_AHEAD", "8")))
+
+
+class _MenuDownloader:
+    """
+    Загрузчик меню на один прогон block2: общий requests.Session с пулом соединений,
+    cloudscraper-сессия на origin (прогрев origin — один раз), лимит одновременных запросов на хост.
+    Playwright (запуск Chromium) — не больше одного одновременно.
+    С http_cache (blocks/http_cache.py) неизменившийся файл не скачивается заново: свежий — из кэша,
+    устаревший — условным запросом (304).
+    """
+
+    def __init__(
+        self,
+        per_host: int = _DOWNLOAD_PER_HOST,
+        pool_size: int = _DOWNLOAD_CONCURRENCY,
+        http_cache: "HttpCache | None" = None,
+    ):
+        from requests.adapters import HTTPAdapter
+
+        self._http_cache = http_cache
+        self._per_host = per_host
+        self._session = requests.Session()
+        self._session.headers.update(_BROWSER_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._host_slots: dict[str, threading.BoundedSemaphore] = {}
+        self._scrapers: dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._playwright_lock = threading.Lock()
+
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self._per_host)
+            return self._host_slots[host]
+
+    def _scraper(self, origin: str):
+        """cloudscraper-сессия для origin (None — если cloudscraper не установлен)."""
+        with self._lock:
+            if origin in self._scrapers:
+                return self._scrapers[origin]
         try:
             import cloudscraper
-            scraper = cloudscraper.create_scraper()
-            scraper.headers.update({**_BROWSER_HEADERS, "Referer": origin + "/"})
-            scraper.get(origin, timeout=10)
-            resp = scraper.get(url, timeout=timeout)
         except ImportError:
-            pass
-
-    if resp.status_code in (403, 412):
-        print(f"      ↳ requests/cloudscraper не помогли ({resp.status_code}), пробую Playwright…",
-              flush=True)
-        return _download_with_playwright(url, timeout)
-
-    resp.raise_for_status()
-    ext = _guess_ext(
-        resp.headers.get("content-type", ""), url, resp.content,
-    )
-    return resp.content, ext
+            return None
+        scraper = cloudscraper.create_scraper()
+        scraper.headers.update({**_BROWSER_HEADERS, "Referer": origin + "/"})
+        scraper.get(origin, timeout=10)
+        with self._lock:
+            return self._scrapers.setdefault(origin, scraper)
+
+    def _get(self, session, url: str, timeout: int, headers: Optional[dict] = None) -> requests.Response:
+        if self._http_cache is None:
+            return session.get(url, timeout=timeout, headers=headers)
+        return self._http_cache.get(url, session=session, headers=headers, timeout=timeout)
+
+    def fetch(self, url: str, timeout: int = 30) -> tuple[bytes, str]:
+        """Скачивает файл. Цепочка: requests → cloudscraper → Playwright."""
+        parsed = urlparse(url)
+        origin = parsed.scheme + "://" + parsed.netloc
+
+        with self._slot(parsed.netloc):
+            resp = self._get(self._session, url, timeout, headers={"Referer": origin + "/"})
+
+            if resp.status_code in (403, 412):
+                scraper = self._scraper(origin)
+                if scraper is not None:
+                    resp = self._get(scraper, url, timeout)
+
+        if resp.status_code in (403, 412):
+            print(f"      ↳ requests/cloudscraper не помогли ({resp.status_code}), пробую Playwright…",
+                  flush=True)
+            with self._playwright_lock:
+                return _download_with_playwright(url, timeout)
+
+        resp.raise_for_status()
+        ext = _guess_ext(
+            resp.headers.get("content-type", ""), url, resp.content,
+        )
+        return resp.content, ext
+
+    def close(self) -> None:
+        self._session.close()
+        with self._lock:
+            scrapers = list(self._scrapers.values())
+            self._scrapers.clear()
+        for scraper in scrapers:
+            try:
+                scraper.close()
+            except Exception:
+                pass
 
 
-def _convert_to_images(file_bytes: bytes, ext: str, max_dpi: int = 150) -> list:
-    """Конвертирует PDF/изображение в список PIL Image."""
+def _download_file(url: str, timeout: int = 30, downloader: Optional[_MenuDownloader] = None) -> tuple[bytes, str]:
+    """Скачивает файл. Цепочка: requests → cloudscraper → Playwright (через общий загрузчик, если передан)."""
+    if downloader is not None:
+        return downloader.fetch(url, timeout)
+    own = _MenuDownloader()
+    try:
+        return own.fetch(url, timeout)
+    finally:
+        own.close()
+
+
+def _load_menu_source(url: str, downloader: Optional[_MenuDownloader] = None) -> tuple[bytes, str]:
+    """Байты и расширение файла меню: локальный путь (файлы опорного заведения) или URL."""
+    if url.startswith("/") or url.startswith("."):
+        file_bytes = Path(url).read_bytes()
+        ext = Path(url).suffix.lower()
+        if ext not in (".pdf", ".png", ".jpg", ".jpeg"):
+            ext = ".pdf" if b"%PDF" in file_bytes[:10] else ".jpeg"
+        return file_bytes, ext
+    return _download_file(url, downloader=downloader)
+
+
+# Растеризация и нарезка: от них зависит, что видит vision-модель (входят в версию кэша разбора)
+_RENDER_DPI = 150
+_SLICE_MAX_HEIGHT = 2000
+_SLICE_OVERLAP = 80
+
+# Потолок памяти на растеризацию (МБ): страница в RGB и её полоса в работе укладываются в него.
+# Страница, которая при _RENDER_DPI больше половины бюджета, рендерится с пониженным dpi
+# (огромные картинки — уменьшаются); одновременно в работе — не больше 2 × BLOCK2_VISION_CONCURRENCY полос
+_IMAGE_MEMORY_MB = max(16, int(os.environ.get("BLOCK2_IMAGE_MEMORY_MB", "256")))
+_MAX_PAGE_PIXELS = _IMAGE_MEMORY_MB * 1024 * 1024 // 3 // 2
+
+
+def _iter_page_images(
+    file_bytes: bytes,
+    ext: str,
+    max_dpi: int = _RENDER_DPI,
+    pages: Optional[list[int]] = None,
+) -> Iterator[tuple[int, object]]:
+    """
+    (номер страницы, PIL Image) по одной: страница PDF рендерится сразу в RGB нужного размера
+    (без промежуточного JPEG) и освобождается, как только потребитель перешёл к следующей.
+    pages — только эти страницы PDF (по умолчанию все).
+    """
     from PIL import Image
     Image.MAX_IMAGE_PIXELS = 300_000_000
 
     if ext == ".pdf":
         import fitz  # PyMuPDF
         doc = fitz.open(stream=file_bytes, filetype="pdf")
-        images = []
+        try:
+            for page_no in (range(doc.page_count) if pages is None else pages):
+                page = doc[page_no]
+                dpi = float(max_dpi)
+                pixels = (page.rect.width * dpi / 72) * (page.rect.height * dpi / 72)
+                if pixels > _MAX_PAGE_PIXELS:
+                    dpi *= (_MAX_PAGE_PIXELS / pixels) ** 0.5
+                pix = page.get_pixmap(dpi=max(1, int(dpi)), alpha=False)
+                image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+                del pix
+                yield page_no, image
+                del image
+        finally:
+            doc.close()
+    else:
+        image = Image.open(io.BytesIO(file_bytes))
+        w, h = image.size
+        if w * h > _MAX_PAGE_PIXELS:
+            factor = int((w * h / _MAX_PAGE_PIXELS) ** 0.5) + 1
+            # JPEG декодируется сразу в уменьшенном размере; остальные форматы — уменьшаются после чтения
+            image.draft("RGB", (w // factor, h // factor))
+            if image.size[0] * image.size[1] > _MAX_PAGE_PIXELS:
+                image = image.reduce(factor)
+        yield 0, image
+
+
+def _convert_to_images(
+    file_bytes: bytes,
+    ext: str,
+    max_dpi: int = _RENDER_DPI,
+    pages: Optional[list[int]] = None,
+) -> list:
+    """Конвертирует PDF/изображение в список PIL Image. pages — только эти страницы PDF (по умолчанию все)."""
+    return [image for _, image in _iter_page_images(file_bytes, ext, max_dpi=max_dpi, pages=pages)]
+
+
+def _iter_menu_slices(
+    file_bytes: bytes,
+    ext: str,
+    pages: Optional[list[int]] = None,
+) -> Iterator[tuple[int, object]]:
+    """(номер страницы, полоса) по одной — страницы рендерятся и режутся по мере потребления."""
+    for page_no, image in _iter_page_images(file_bytes, ext, pages=pages):
+        for piece in _iter_slices(image):
+            yield page_no, piece
+
+
+# Текстовый слой PDF: страницы, с которых удалось снять не меньше N позиций с ценами,
+# разбираются без vision-модели (BLOCK2_PDF_TEXT_LAYER=0 — всегда через изображения)
+_PDF_TEXT_LAYER = os.environ.get("BLOCK2_PDF_TEXT_LAYER", "1") != "0"
+_PDF_TEXT_MIN_ITEMS = max(1, int(os.environ.get("BLOCK2_PDF_TEXT_MIN_ITEMS", "3")))
+# Повышать при изменении правил разбора текстового слоя (входит в версию кэша разбора)
+_PDF_TEXT_VERSION = 1
+
+_PRICE_TOKEN_RE = re.compile(r"^\d{1,6}(?:[.,]\d{1,2})?$")
+_CURRENCY_TOKENS = {"₽", "р", "р.", "руб", "руб.", "rub", "rub."}
+_UNIT_TOKEN_RE = re.compile(r"^(?:г|гр|г\.|гр\.|кг|мл|л|шт|шт\.|см|g|kg|ml|l|cl|pcs)[.,;)]?$", re.IGNORECASE)
+_LEADER_RE = re.compile(r"[\s.…·•_\-–—:|]+$")
+
+
+def _price_value(tokens: list[str], i: int) -> tuple[Optional[float], int]:
+    """
+    Цена, начинающаяся с tokens[i]: (значение, сколько токенов занято) или (None, 0).
+    «1 200» — одна цена; число перед единицей измерения (250 г, 0,5 л) — не цена, а часть названия.
+    """
+    tok = tokens[i].rstrip("₽")
+    if not _PRICE_TOKEN_RE.match(tok):
+        return None, 0
+    candidates = [(tok, 1)]
+    if len(tok) <= 3 and tok.isdigit() and i + 1 < len(tokens) and re.fullmatch(r"\d{3}₽?", tokens[i + 1]):
+        candidates.insert(0, (tok + tokens[i + 1].rstrip("₽"), 2))
+    for digits, used in candidates:
+        nxt = tokens[i + used] if i + used < len(tokens) else ""
+        if _UNIT_TOKEN_RE.match(nxt):
+            return None, 0
+        value = float(digits.replace(",", "."))
+        if not 10 <= value <= 200_000:
+            continue
+        if nxt.lower() in _CURRENCY_TOKENS:
+            used += 1
+        return value, used
+    return None, 0
+
+
+def _clean_item_name(tokens: list[str]) -> str:
+    """Название позиции без точек-заполнителей и разделителей по краям."""
+    return _LEADER_RE.sub("", " ".join(tokens)).strip(" .…·•_-–—:|")
+
+
+def _pdf_page_text_items(page) -> tuple[list[dict], int]:
+    """
+    Позиции меню с текстового слоя страницы PDF: (позиции, сколько из них с ценой).
+    Строки одной высоты склеиваются слева направо (название слева, цена справа — одна позиция;
+    несколько колонок — несколько пар «название — цена»). Строки без цены крупнее основного
+    шрифта или капсом — заголовки разделов (category); остальные строки без цены — описания, пропускаются.
+    """
+    lines = []
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            spans = [sp for sp in line.get("spans", []) if sp.get("text", "").strip()]
+            if not spans:
+                continue
+            x0, y0, x1, y1 = line["bbox"]
+            text = " ".join(sp["text"].strip() for sp in spans)
+            lines.append((y0, y1, x0, text, max(sp.get("size", 0.0) for sp in spans)))
+    if not lines:
+        return [], 0
+
+    sizes = sorted(line[4] for line in lines)
+    body_size = sizes[len(sizes) // 2]
+
+    # Строка, центр которой попадает в высоту текущего ряда, — продолжение этого ряда
+    lines.sort(key=lambda ln: ((ln[0] + ln[1]) / 2, ln[2]))
+    rows: list[list[tuple]] = []
+    for line in lines:
+        center = (line[0] + line[1]) / 2
+        if rows and min(ln[0] for ln in rows[-1]) <= center <= max(ln[1] for ln in rows[-1]):
+            rows[-1].append(line)
+            continue
+        rows.append([line])
+
+    items: list[dict] = []
+    priced = 0
+    category: Optional[str] = None
+    for row in rows:
+        row.sort(key=lambda ln: ln[2])
+        tokens = " ".join(ln[3] for ln in row).split()
+        row_items: list[dict] = []
+        name_tokens: list[str] = []
+        i = 0
+        while i < len(tokens):
+            price, used = _price_value(tokens, i)
+            if price is not None and name_tokens:
+                name = _clean_item_name(name_tokens)
+                if name and re.search(r"[^\W\d_]", name):
+                    row_items.append({"category": category, "name": name, "price": price})
+                name_tokens = []
+                i += used
+                continue
+            name_tokens.append(tokens[i])
+            i += 1
+
+        if row_items:
+            items.extend(row_items)
+            priced += len(row_items)
+            continue
+
+        text = _clean_item_name(tokens)
+        size = max(ln[4] for ln in row)
+        has_letters = re.search(r"[^\W\d_]", text) is not None
+        is_header = has_letters and not re.search(r"\d", text) and len(text) <= 60 and (
+            size >= body_size * 1.15 or text.isupper()
+        )
+        if is_header:
+            category = text
+    return items, priced
+
+
+def _pdf_text_layer_items(file_bytes: bytes) -> list[Optional[list[dict]]]:
+    """
+    Для каждой страницы PDF — позиции с текстового слоя или None, если слой непригоден
+    (скан, картинка с подписью, «битые» шрифты): такие страницы идут в vision через изображения.
+    """
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(stream=file_bytes, filetype="pdf")
+    try:
+        pages: list[Optional[list[dict]]] = []
         for page in doc:
-            pix = page.get_pixmap(dpi=max_dpi)
-            images.append(Image.open(io.BytesIO(pix.tobytes("jpeg"))))
+            text = page.get_text("text")
+            broken = text.count("\ufffd") > max(3, len(text) // 100)
+            items, priced = ([], 0) if broken else _pdf_page_text_items(page)
+            pages.append(items if priced >= _PDF_TEXT_MIN_ITEMS else None)
+        return pages
+    finally:
         doc.close()
-        return images
-    else:
-        return [Image.open(io.BytesIO(file_bytes))]
 
 
-def _slice_tall_image(image, max_height: int = 2000, overlap: int = 80) -> list:
-    """Нарезает высокое изображение на полосы с перекрытием, чтобы не потерять строки на стыках."""
+def _iter_slices(image, max_height: int = _SLICE_MAX_HEIGHT, overlap: int = _SLICE_OVERLAP) -> Iterator:
+    """Полосы высокого изображения с перекрытием — по одной (crop делается, когда полосу запросили)."""
     w, h = image.size
     if h <= max_height:
-        return [image]
+        yield image
+        return
 
-    slices = []
     y = 0
     while y < h:
         bottom = min(y + max_height, h)
-        slices.append(image.crop((0, y, w, bottom)))
+        yield image.crop((0, y, w, bottom))
         y = bottom - overlap
         if bottom == h:
             break
-    return slices
+
+
+# Предфильтр страниц/полос перед vision: оценка «похожести на меню» по плотности и строчной
+# структуре контуров (CPU, ~миллисекунды на полосу); ниже порога — не отправляем
+_PAGE_FILTER = os.environ.get("BLOCK2_PAGE_FILTER", "1") != "0"
+_PAGE_MIN_SCORE = float(os.environ.get("BLOCK2_PAGE_MIN_SCORE", "0.15"))
+_PAGE_FILTER_WIDTH = 512
+
+
+def _menu_likeness(image) -> tuple[float, str]:
+    """
+    (оценка 0..1, причина низкой оценки: "blank" | "picture" | "low_text").
+    Меню — это текст: заметная доля контуров и строки, разделённые пустыми полосами.
+    Пустая страница — контуров нет; фото/арт — много полутонов и нет пустых строк между контурами.
+    """
+    import numpy as np
+
+    gray = image.convert("L")
+    w, h = gray.size
+    if w > _PAGE_FILTER_WIDTH:
+        gray = gray.resize((_PAGE_FILTER_WIDTH, max(1, round(h * _PAGE_FILTER_WIDTH / w))))
+    a = np.asarray(gray, dtype=np.float32) / 255.0
+    if a.shape[0] < 2 or a.shape[1] < 2:
+        return 0.0, "blank"
+
+    edges = (np.abs(np.diff(a, axis=1))[:-1] + np.abs(np.diff(a, axis=0))[:, :-1]) > 0.2
+    edge_density = float(edges.mean())
+    blank_rows = float((edges.mean(axis=1) < 0.002).mean())
+    midtones = float(((a > 0.25) & (a < 0.75)).mean())
+
+    ink = min(1.0, edge_density / 0.02)
+    has_lines = 0.05 <= blank_rows <= 0.97
+    picture = 0.0 if has_lines else min(1.0, max(0.0, (midtones - 0.5) / 0.3))
+    score = ink * (1.0 if has_lines else 0.5) * (1.0 - picture)
+
+    if picture >= 0.5:
+        reason = "picture"
+    elif edge_density < 0.001:
+        reason = "blank"
+    else:
+        reason = "low_text"
+    return score, reason
+
+
+def _new_page_filter_stats() -> dict[str, int]:
+    return {"scored": 0, "skipped": 0, "skipped_blank": 0, "skipped_picture": 0, "skipped_low_text": 0}
+
+
+def _slice_tall_image(image, max_height: int = _SLICE_MAX_HEIGHT, overlap: int = _SLICE_OVERLAP) -> list:
+    """Нарезает высокое изображение на полосы с перекрытием, чтобы не потерять строки на стыках."""
+    return list(_iter_slices(image, max_height=max_height, overlap=overlap))
 
 
 def _image_to_data_url(image) -> str:
@@ -227,6 +617,17 @@ _MENU_TASK = (
     "КРИТИЧЕСКОЕ ПРАВИЛО: лучше вернуть лишнюю позицию с price=null, чем пропустить позицию.\n"
 )
 
+# Добавка к промпту, когда в одном запросе несколько полос подряд (см. _parse_menu_slices)
+_MENU_BATCH_NOTE = (
+    "\nНЕСКОЛЬКО ИЗОБРАЖЕНИЙ:\n"
+    "- В запросе {n} изображений — последовательные полосы одного меню сверху вниз, "
+    "перед каждым указан его номер (1..{n}).\n"
+    "- Обработай каждое изображение по правилам выше, по порядку номеров.\n"
+    "- image: номер изображения, на котором позиция.\n"
+    "- Соседние полосы одной страницы перекрываются на {overlap}px по высоте: строку, попавшую "
+    "в перекрытие, верни ОДИН раз — с номером изображения, где она видна целиком.\n\n"
+)
+
 
 def _detect_kids_menu(items: list[dict]) -> bool:
     """Определяет наличие детского меню по категориям и названиям позиций."""
@@ -527,78 +928,433 @@ def _apply_competitive_llm_analysis_block2(
         return fallback_ref
 
 
+# Vision-запросы по страницам/полосам одного файла: сколько одновременно, таймаут одного вызова (с)
+# и сколько раз повторять только упавшие полосы (1 — последовательный обход, как раньше)
+_VISION_CONCURRENCY = max(1, int(os.environ.get("BLOCK2_VISION_CONCURRENCY", "4")))
+_VISION_TIMEOUT = float(os.environ.get("BLOCK2_VISION_TIMEOUT", "120"))
+_VISION_RETRIES = max(0, int(os.environ.get("BLOCK2_VISION_RETRIES", "2")))
+# Несколько полос подряд (одного файла) — в одном запросе: промпт и инструкции формата уходят
+# один раз на пачку. Пачка ограничена числом изображений и оценкой их токенов (_vision_image_tokens);
+# BLOCK2_VISION_BATCH_IMAGES=1 — по одной полосе на запрос, как раньше
+_VISION_BATCH_IMAGES = max(1, int(os.environ.get("BLOCK2_VISION_BATCH_IMAGES", "4")))
+_VISION_BATCH_TOKENS = max(1, int(os.environ.get("BLOCK2_VISION_BATCH_TOKENS", "4500")))
+# Сколько последних/первых позиций соседних полос сравнивать при снятии дублей на стыке
+_SEAM_WINDOW = 3
+
+
+def _vision_image_tokens(width: int, height: int) -> int:
+    """
+    Оценка входных токенов изображения (detail=high, правила OpenAI): вписать в 2048×2048,
+    короткую сторону — до 768, затем 85 + 170 за каждый тайл 512×512.
+    """
+    scale = min(1.0, 2048 / max(width, height, 1))
+    w, h = width * scale, height * scale
+    scale = min(1.0, 768 / max(min(w, h), 1))
+    w, h = w * scale, h * scale
+    return 85 + 170 * math.ceil(w / 512) * math.ceil(h / 512)
+
+
+def _parse_menu_response(content: str, parser) -> list[dict]:
+    """Позиции из ответа модели: JSON по схеме, иначе первый {...} или [...] в тексте."""
+    # Убираем блоки <think>...</think> у thinking-моделей
+    content = re.sub(r"<think>.*?</think>", "", content, flags=re.DOTALL).strip()
+
+    try:
+        result: MenuParseResult = parser.parse(content)
+        return [item.model_dump() for item in result.items]
+    except Exception:
+        try:
+            match = re.search(r"\{.*\}", content, re.DOTALL)
+            if match:
+                result = parser.parse(match.group(0))
+                return [item.model_dump() for item in result.items]
+            match_arr = re.search(r"\[.*\]", content, re.DOTALL)
+            if match_arr:
+                return list(json.loads(match_arr.group(0)))
+        except Exception:
+            pass
+    return []
+
+
+_MENU_MODEL = "openai/gpt-4o"
+
+
+def _menu_parse_versions() -> tuple[str, str]:
+    """
+    Версии разбора для кэша (menu_cache.py): (для целого файла, для одной полосы).
+    Полоса зависит от промпта, схемы ответа и модели; файл — ещё и от растеризации/нарезки,
+    правил разбора текстового слоя PDF, предфильтра страниц, размера пачек и снятия дублей на стыках.
+    """
+    from restaurant_pipeline.blocks.block2_menu.menu_cache import parse_version
+
+    schema = json.dumps(MenuParseResult.model_json_schema(), ensure_ascii=False, sort_keys=True)
+    batch_schema = json.dumps(MenuBatchParseResult.model_json_schema(), ensure_ascii=False, sort_keys=True)
+    slice_version = parse_version(_MENU_TASK, schema, _MENU_MODEL, "jpeg=85", _MENU_BATCH_NOTE, batch_schema)
+    text_layer = f"text_layer={_PDF_TEXT_VERSION}:{_PDF_TEXT_MIN_ITEMS}" if _PDF_TEXT_LAYER else "text_layer=off"
+    render = f"render=rgb:{_RENDER_DPI}:{_MAX_PAGE_PIXELS}"
+    page_filter = f"page_filter=1:{_PAGE_MIN_SCORE}" if _PAGE_FILTER else "page_filter=off"
+    file_version = parse_version(
+        slice_version, render, _SLICE_MAX_HEIGHT, _SLICE_OVERLAP, text_layer, page_filter,
+        f"batch={_VISION_BATCH_IMAGES}:{_VISION_BATCH_TOKENS}", f"seam={_SEAM_WINDOW}",
+    )
+    return file_version, slice_version
+
+
+def _open_menu_cache() -> "MenuParseCache | None":
+    """Кэш разбора меню по настройкам из env (None — выключен или недоступен)."""
+    root = _project_root()
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from restaurant_pipeline.blocks.block2_menu.menu_cache import MenuParseCache
+
+    return MenuParseCache.from_env()
+
+
+def _open_http_cache() -> "HttpCache | None":
+    """Общий HTTP-кэш блоков (blocks/http_cache.py) по настройкам из env (None — выключен)."""
+    root = _project_root()
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from restaurant_pipeline.blocks.http_cache import HttpCache
+
+    return HttpCache.from_env("block2")
+
+
+def _open_image_hashes() -> "ImageHashStore | None":
+    """Перцептивная дедупликация полос (image_hash.py) по настройкам из env (None — выключена)."""
+    root = _project_root()
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from restaurant_pipeline.blocks.block2_menu.image_hash import ImageHashStore
+
+    return ImageHashStore.from_env()
+
+
 def _parse_menu_images(
-    images: list,
-    api_key: str
-    # model: str = "qwen/qwen3-vl-235b-a22b-thinking" ,
+    images: Iterable,
+    api_key: str,
+    cache: "MenuParseCache | None" = None,
+    cache_version: str = "",
 ) -> list[dict]:
     """Отправляет изображения в OpenRouter (Vision) через LangChain, возвращает список позиций меню."""
+    per_image, _ = _parse_menu_slices(images, api_key, cache=cache, cache_version=cache_version)
+    return [item for items in per_image for item in items]
+
+
+def _parse_menu_slices(
+    images: Iterable,
+    api_key: str,
+    cache: "MenuParseCache | None" = None,
+    cache_version: str = "",
+    image_hashes: "FileImageHashes | None" = None,
+    # model: str = "qwen/qwen3-vl-235b-a22b-thinking" ,
+) -> tuple[list[list[dict]], int]:
+    """
+    (позиции по каждому изображению — в порядке images, сколько изображений так и не разобрано).
+    images может быть генератором: каждое изображение кодируется в JPEG один раз и сразу
+    отпускается; в работе не больше 2 × BLOCK2_VISION_CONCURRENCY пачек закодированных полос
+    (плюс упавшие — до повтора).
+    Подряд идущие полосы собираются в пачки (до BLOCK2_VISION_BATCH_IMAGES изображений и
+    BLOCK2_VISION_BATCH_TOKENS токенов): одна пачка — один запрос с общим промптом, модель
+    помечает каждую позицию номером изображения, и позиции раскладываются обратно по полосам.
+    Запросы идут параллельно (BLOCK2_VISION_CONCURRENCY), позиции собираются в порядке страниц/полос;
+    упавшие вызовы (ошибка, таймаут) повторяются только для своих пачек.
+    С кэшем полоса, уже разобранная в другом отчёте (тот же JPEG), в vision не отправляется;
+    с image_hashes — и визуально такая же полоса этого же файла (перцептивный отпечаток со сверкой
+    в полном разрешении, image_hash.py): её позиции берутся у найденной.
+    """
     from langchain_openai import ChatOpenAI
     from langchain_core.messages import HumanMessage
     from langchain_core.output_parsers import PydanticOutputParser
 
     parser = PydanticOutputParser(pydantic_object=MenuParseResult)
     prompt = _MENU_TASK + parser.get_format_instructions()
+    batch_parser = PydanticOutputParser(pydantic_object=MenuBatchParseResult)
+    batch_format = batch_parser.get_format_instructions()
 
     llm = ChatOpenAI(
-    model="openai/gpt-4o",          # или переменная model
+    model=_MENU_MODEL,          # или переменная model
     api_key=api_key,                      # <-- ключ OpenRouter
     base_url="https://openrouter.ai/api/v1",
     temperature=0.0,                      # для извлечения лучше 0
-    max_tokens=4096,
+    max_tokens=min(16384, 4096 * _VISION_BATCH_IMAGES),  # ответ растёт с числом полос в пачке
+    timeout=_VISION_TIMEOUT,
+    max_retries=0,                        # повторы — ниже, только для упавших пачек
     default_headers={
         "HTTP-Referer": "https://your-app.example",      # рекомендуется
         "X-OpenRouter-Title": "menu-parser",             # рекомендуется (иногда X-Title)
     },
 )
 
-    all_items: list[dict] = []
+    digests: dict[int, str] = {}  # номер изображения → ключ кэша полосы
+    fingerprints: dict[int, Optional["ImageFingerprint"]] = {}  # → отпечаток полосы (image_hash.py)
 
-    for image in images:
-        data_url = _image_to_data_url(image)
-
-        message = HumanMessage(content=[
-            {"type": "image_url", "image_url": {"url": data_url}},
-            {"type": "text", "text": prompt},
-        ])
+    def _parse_batch(batch: list[tuple[int, str]]) -> list[list[dict]]:
+        """Позиции по каждой полосе пачки (в порядке batch)."""
+        if len(batch) == 1:
+            message = HumanMessage(content=[
+                {"type": "image_url", "image_url": {"url": batch[0][1]}},
+                {"type": "text", "text": prompt},
+            ])
+        else:
+            content: list[dict] = []
+            for k, (_, data_url) in enumerate(batch, 1):
+                content.append({"type": "text", "text": f"Изображение {k}:"})
+                content.append({"type": "image_url", "image_url": {"url": data_url}})
+            note = _MENU_BATCH_NOTE.format(n=len(batch), overlap=_SLICE_OVERLAP)
+            content.append({"type": "text", "text": _MENU_TASK + note + batch_format})
+            message = HumanMessage(content=content)
 
         response = llm.invoke([message])
         content = response.content if hasattr(response, "content") else str(response)
+        if len(batch) == 1:
+            per_slice = [_parse_menu_response(content, parser)]
+        else:
+            # Номер изображения → полоса; без номера или вне 1..N — к ближайшей допустимой
+            per_slice = [[] for _ in batch]
+            for item in _parse_menu_response(content, batch_parser):
+                try:
+                    k = int(item.pop("image", 1) or 1)
+                except (TypeError, ValueError):
+                    k = 1
+                per_slice[min(max(k, 1), len(batch)) - 1].append(item)
+
+        if cache is not None:
+            from restaurant_pipeline.blocks.block2_menu.menu_cache import KIND_SLICE
+
+            for (idx, _), items in zip(batch, per_slice):
+                cache.put(KIND_SLICE, digests[idx], cache_version, items)
+        if image_hashes is not None:
+            for (idx, _), items in zip(batch, per_slice):
+                image_hashes.put(fingerprints.pop(idx, None), items)
+        return per_slice
+
+    results: list[Optional[list[dict]]] = []
+    failed: list[list[tuple[int, str]]] = []  # упавшие пачки (номер изображения, закодированная полоса)
+    last_error: Optional[Exception] = None
+    n_sent = n_requests = n_similar = 0  # полос отправлено в vision / запросов (с повторами) / взято у похожих
+
+    def _record(batch: list[tuple[int, str]], outcome) -> None:
+        nonlocal last_error
+        if isinstance(outcome, Exception):
+            failed.append(batch)
+            last_error = outcome
+        else:
+            for (idx, _), items in zip(batch, outcome):
+                results[idx] = items
+
+    pool = ThreadPoolExecutor(max_workers=_VISION_CONCURRENCY, thread_name_prefix="block2-vision") \
+        if _VISION_CONCURRENCY > 1 else None
+    in_flight: dict[Future, list[tuple[int, str]]] = {}
+
+    def _drain(block_until: int) -> None:
+        while len(in_flight) > block_until:
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                _record(batch, future.exception() or future.result())
+
+    def _submit(batch: list[tuple[int, str]]) -> None:
+        nonlocal n_requests
+        n_requests += 1
+        if pool is None:
+            try:
+                _record(batch, _parse_batch(batch))
+            except Exception as e:
+                _record(batch, e)
+        else:
+            in_flight[pool.submit(_parse_batch, batch)] = batch
+            _drain(2 * _VISION_CONCURRENCY - 1)
 
-        # Убираем блоки <think>...</think> у thinking-моделей
-        content = re.sub(r"<think>.*?</think>", "", content, flags=re.DOTALL).strip()
+    try:
+        batch: list[tuple[int, str]] = []
+        batch_tokens = 0
+        for idx, image in enumerate(images):
+            tokens = _vision_image_tokens(*image.size)
+            data_url = _image_to_data_url(image)
+            if image_hashes is not None:
+                from restaurant_pipeline.blocks.block2_menu.image_hash import fingerprint
+
+                fingerprints[idx] = fingerprint(image)
+            del image
+            results.append(None)
+            if cache is not None:
+                from restaurant_pipeline.blocks.block2_menu.menu_cache import KIND_SLICE, content_hash
+
+                digests[idx] = content_hash(data_url)
+                cached = cache.get(KIND_SLICE, digests[idx], cache_version)
+                if cached is not None:
+                    results[idx] = cached
+                    continue
+            if image_hashes is not None:
+                similar = image_hashes.find(fingerprints[idx])
+                if similar is not None:
+                    del fingerprints[idx]
+                    results[idx] = similar
+                    n_similar += 1
+                    continue
+            if batch and (len(batch) >= _VISION_BATCH_IMAGES or batch_tokens + tokens > _VISION_BATCH_TOKENS):
+                _submit(batch)
+                batch, batch_tokens = [], 0
+            batch.append((idx, data_url))
+            batch_tokens += tokens
+            n_sent += 1
+        if batch:
+            _submit(batch)
+        _drain(0)
+
+        for _ in range(_VISION_RETRIES):
+            if not failed:
+                break
+            n_retry = sum(len(b) for b in failed)
+            print(f"      ↳ повтор vision для {n_retry} из {len(results)} изображений…", flush=True)
+            retry = sorted(failed)
+            failed.clear()
+            for batch in retry:
+                _submit(batch)
+            _drain(0)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    n_failed = sum(len(b) for b in failed)
+    if n_requests and n_sent > 1:
+        print(f"      ↳ vision: {n_sent} изображений в {n_requests} запросах", flush=True)
+    if n_similar:
+        print(f"      ↳ без vision (повторы уже разобранных полос): {n_similar}", flush=True)
+    if failed:
+        if n_failed == len(results) and last_error is not None:
+            raise last_error
+        print(f"      ↳ vision не ответил для {n_failed} из {len(results)} изображений: {last_error}", flush=True)
+
+    return [items or [] for items in results], n_failed
+
+
+def _dedup_slice_seams(per_slice: list[list[dict]], slice_parts: list[tuple[int, int]]) -> int:
+    """
+    Снимает дубли на стыках полос одной страницы (перекрытие _SLICE_OVERLAP): позиции из первых
+    _SEAM_WINDOW следующей полосы, совпавшие (название без регистра/пробелов + цена) с одной из
+    последних _SEAM_WINDOW предыдущей, удаляются. slice_parts — (страница, номер полосы) каждой полосы.
+    Правит per_slice на месте; возвращает число снятых дублей.
+    """
+    def _key(item: dict) -> tuple[str, object]:
+        name = " ".join(str(item.get("name") or "").casefold().split())
+        return name, item.get("price")
+
+    removed = 0
+    # С конца: хвост предыдущей полосы сравнивается до того, как с неё самой сняты дубли
+    for k in range(len(per_slice) - 1, 0, -1):
+        (page, part), (prev_page, prev_part) = slice_parts[k], slice_parts[k - 1]
+        if page != prev_page or part != prev_part + 1 or not per_slice[k - 1]:
+            continue
+        tail = {_key(item) for item in per_slice[k - 1][-_SEAM_WINDOW:]}
+        head = per_slice[k][:_SEAM_WINDOW]
+        kept = [item for item in head if _key(item) not in tail]
+        removed += len(head) - len(kept)
+        per_slice[k] = kept + per_slice[k][_SEAM_WINDOW:]
+    return removed
 
-        try:
-            result: MenuParseResult = parser.parse(content)
-            all_items.extend(item.model_dump() for item in result.items)
-        except Exception:
-            try:
-                match = re.search(r"\{.*\}", content, re.DOTALL)
-                if match:
-                    result = parser.parse(match.group(0))
-                    all_items.extend(item.model_dump() for item in result.items)
-                else:
-                    match_arr = re.search(r"\[.*\]", content, re.DOTALL)
-                    if match_arr:
-                        raw = json.loads(match_arr.group(0))
-                        all_items.extend(raw)
-            except Exception:
-                pass
 
-    return all_items
+def _dump_dir(tmp_dir: Path, place_name: str) -> Path:
+    return tmp_dir / re.sub(r"[^\w\-]", "_", place_name)
 
 
-def _dump_images_to_tmp(images: list, place_name: str, file_idx: int, tmp_dir: Path) -> None:
-    """Сохраняет сконвертированные изображения в tmp/ для отладки."""
-    safe_name = re.sub(r"[^\w\-]", "_", place_name)
-    place_dir = tmp_dir / safe_name
+def _dump_image_to_tmp(img, place_name: str, file_idx: int, page_idx: int, tmp_dir: Path) -> None:
+    """Сохраняет сконвертированное изображение (полосу) в tmp/ для отладки."""
+    place_dir = _dump_dir(tmp_dir, place_name)
     place_dir.mkdir(parents=True, exist_ok=True)
-    for page_idx, img in enumerate(images):
-        if img.mode in ("RGBA", "P", "LA"):
-            img = img.convert("RGB")
-        path = place_dir / f"file{file_idx}_page{page_idx}.jpg"
-        img.save(path, format="JPEG", quality=90)
-    print(f"    Изображения сохранены: {place_dir}/")
+    if img.mode in ("RGBA", "P", "LA"):
+        img = img.convert("RGB")
+    img.save(place_dir / f"file{file_idx}_page{page_idx}.jpg", format="JPEG", quality=90)
+
+
+def _parse_menu_file(
+    file_bytes: bytes,
+    ext: str,
+    api_key: str,
+    cache: "MenuParseCache | None" = None,
+    cache_version: str = "",
+    dump_to: Optional[tuple[str, int, Path]] = None,
+    page_filter_stats: Optional[dict[str, int]] = None,
+    image_hashes: "ImageHashStore | None" = None,
+) -> tuple[list[dict], int]:
+    """
+    Разбор одного файла меню: (позиции в порядке страниц, сколько полос не разобрано).
+    Страницы PDF с пригодным текстовым слоем — без vision; остальные рендерятся, режутся и уходят
+    в vision потоком (страница за страницей, без списка всех изображений в памяти).
+    Полосы, не похожие на меню (_menu_likeness ниже BLOCK2_PAGE_MIN_SCORE), не отправляются;
+    счётчики — в page_filter_stats (None — предфильтр выключен). Позиции, повторённые в перекрытии
+    соседних полос одной страницы, остаются один раз (_dedup_slice_seams). С image_hashes повторы
+    полос ищутся только внутри этого файла.
+    dump_to — (название заведения, номер файла, папка) для --dump-images.
+    """
+    # PDF с текстовым слоем: такие страницы разбираем без vision, остальные — через изображения
+    text_pages: list[Optional[list[dict]]] = []
+    if ext == ".pdf" and _PDF_TEXT_LAYER:
+        text_pages = _pdf_text_layer_items(file_bytes)
+    image_pages = [k for k, page_items in enumerate(text_pages) if page_items is None]
+
+    slice_pages: list[int] = []  # номер страницы каждой отправленной полосы
+    slice_parts: list[tuple[int, int]] = []  # (страница, номер полосы на странице)
+    n_slices = 0
+
+    def _to_vision() -> Iterator:
+        nonlocal n_slices
+        if text_pages and not image_pages:
+            return
+        part, prev_page = 0, None
+        for page_no, piece in _iter_menu_slices(file_bytes, ext, pages=image_pages if text_pages else None):
+            part = part + 1 if page_no == prev_page else 0
+            prev_page = page_no
+            if dump_to is not None:
+                _dump_image_to_tmp(piece, dump_to[0], dump_to[1], n_slices, dump_to[2])
+            n_slices += 1
+            if page_filter_stats is not None:
+                score, reason = _menu_likeness(piece)
+                page_filter_stats["scored"] += 1
+                if score < _PAGE_MIN_SCORE:
+                    page_filter_stats["skipped"] += 1
+                    page_filter_stats[f"skipped_{reason}"] += 1
+                    continue
+            slice_pages.append(page_no)
+            slice_parts.append((page_no, part))
+            yield piece
+    if text_pages and not image_pages:
+        per_image, n_failed = [], 0
+    else:
+        per_image, n_failed = _parse_menu_slices(
+            _to_vision(), api_key, cache=cache, cache_version=cache_version,
+            image_hashes=image_hashes.file_scope() if image_hashes is not None else None,
+        )
+    n_seam = _dedup_slice_seams(per_image, slice_parts)
+    if dump_to is not None and n_slices:
+        print(f"    Изображения сохранены: {_dump_dir(dump_to[2], dump_to[0])}/")
+
+    n_pages = len(set(slice_pages))
+    skipped = f", пропущено предфильтром: {n_slices - len(slice_pages)}" if n_slices > len(slice_pages) else ""
+    if n_seam:
+        skipped += f", дублей на стыках полос: {n_seam}"
+    if text_pages:
+        print(
+            f"    Страниц PDF: {len(text_pages)}, с текстовым слоем: {len(text_pages) - len(image_pages)}; "
+            f"в vision: {n_pages} → {len(slice_pages)} (после нарезки){skipped}"
+        )
+    else:
+        print(f"    Страниц/изображений: {n_pages} → {len(slice_pages)} (после нарезки){skipped}")
+
+    # Позиции — в порядке страниц: текстовые как есть, остальные из vision по своим полосам
+    vision_pages: dict[int, list[dict]] = {}
+    for page_no, items in zip(slice_pages, per_image):
+        vision_pages.setdefault(page_no, []).extend(items)
+    if text_pages:
+        items = [
+            it
+            for page_no, page_items in enumerate(text_pages)
+            for it in (page_items if page_items is not None else vision_pages.get(page_no, []))
+        ]
+    else:
+        items = [it for page_no in sorted(vision_pages) for it in vision_pages[page_no]]
+    return items, n_failed
 
 
 def _collect_reference_menu_sources(place: dict) -> list[str]:
@@ -655,99 +1411,163 @@ def run(input_json_path: str, output_json_path: str, dump_images: bool = False,
 
     menu_by_place: dict[str, dict] = {}
 
+    # Ссылки на меню всех заведений — заранее, чтобы скачивание шло конвейером впереди разбора;
+    # база читается один раз на отчёт (и переиспользуется воркером, пока CSV не изменился)
+    plan: list[tuple[list[str], list[str]]] = []
+    link_index: Optional[_MenuLinkIndex] = None
     for i, place in enumerate(places, 1):
-        name = place.get("название", f"place_{i}")
-        is_ref = place.get("is_reference_place", False)
-        print(f"  [{i}/{len(places)}] Меню «{name}»{'  [reference]' if is_ref else ''}...", flush=True)
-
-        if is_ref:
+        if place.get("is_reference_place", False):
             ref_urls = _collect_reference_menu_sources(place)
-            if not ref_urls:
-                print(f"    Нет файлов/URL меню для опорного заведения")
+            plan.append((ref_urls, ["user_provided"] * len(ref_urls)))
+        else:
+            if link_index is None:
+                link_index = _load_menu_link_index(source_csv)
+            plan.append(link_index.lookup(place.get("название", f"place_{i}")))
+
+    # Файлы качаются в пуле (не больше _DOWNLOAD_AHEAD вперёд), пока основной поток
+    # конвертирует и отправляет в vision уже скачанные — в исходном порядке
+    file_urls = [url for urls, _ in plan for url in urls] if api_key else []
+    # Файлы меню по URL — через общий HTTP-кэш блоков (ETag/Last-Modified, срок свежести)
+    http_cache = _open_http_cache() if file_urls else None
+    downloader = _MenuDownloader(http_cache=http_cache) if file_urls else None
+    # Разбор меню по содержимому файла/полосы — общий для всех отчётов (menu_cache.py)
+    menu_cache = _open_menu_cache() if file_urls else None
+    # Визуально одинаковые полосы внутри одного файла (повторённые страницы) — image_hash.py
+    image_hashes = _open_image_hashes() if file_urls else None
+    file_version, slice_version = (
+        _menu_parse_versions() if menu_cache is not None else ("", "")
+    )
+    page_filter_stats = _new_page_filter_stats() if _PAGE_FILTER and file_urls else None
+    download_pool = ThreadPoolExecutor(max_workers=_DOWNLOAD_CONCURRENCY, thread_name_prefix="block2-download")
+    downloads: dict[int, Future] = {}
+    next_download = 0
+    next_file = 0
+
+    def _take_download() -> Future:
+        nonlocal next_download, next_file
+        while next_download < min(len(file_urls), next_file + _DOWNLOAD_AHEAD):
+            downloads[next_download] = download_pool.submit(
+                _load_menu_source, file_urls[next_download], downloader
+            )
+            next_download += 1
+        future = downloads.pop(next_file)
+        next_file += 1
+        return future
+
+    try:
+        for i, (place, (urls, types)) in enumerate(zip(places, plan), 1):
+            name = place.get("название", f"place_{i}")
+            is_ref = place.get("is_reference_place", False)
+            print(f"  [{i}/{len(places)}] Меню «{name}»{'  [reference]' if is_ref else ''}...", flush=True)
+
+            if not urls:
+                if is_ref:
+                    print(f"    Нет файлов/URL меню для опорного заведения")
+                else:
+                    print(f"    Нет ссылок на меню в базе")
                 menu_by_place[name] = {
                     "status": "no_menu_links",
                     "items": [],
-                    "is_reference_place": True,
                 }
+                if is_ref:
+                    menu_by_place[name]["is_reference_place"] = True
                 if is_market or is_competitive:
                     menu_by_place[name]["вывод"] = _menu_place_conclusion({"status": "no_menu_links", "items": []})
                 continue
-            urls, types = ref_urls, ["user_provided"] * len(ref_urls)
-        else:
-            urls, types = _find_menu_links(source_csv, name)
-            if not urls:
-                print(f"    Нет ссылок на меню в базе")
-                menu_by_place[name] = {
-                    "status": "no_menu_links",
+
+            if not api_key:
+                print(f"    Нет OPENROUTER_API_KEY — пропуск")
+                entry = {
+                    "status": "no_api_key",
+                    "menu_urls": urls,
                     "items": [],
                 }
                 if is_market or is_competitive:
-                    menu_by_place[name]["вывод"] = _menu_place_conclusion({"status": "no_menu_links", "items": []})
+                    entry["вывод"] = _menu_place_conclusion({
+                        "status": "no_api_key",
+                        "menu_urls": urls,
+                        "items": [],
+                    })
+                if is_ref:
+                    entry["is_reference_place"] = True
+                menu_by_place[name] = entry
                 continue
 
-        if not api_key:
-            print(f"    Нет OPENROUTER_API_KEY — пропуск")
+            all_items = []
+            for j, url in enumerate(urls):
+                file_type = types[j] if j < len(types) else "unknown"
+                print(f"    [{j+1}/{len(urls)}] {file_type}: {url[:80]}...")
+                download = _take_download()
+
+                try:
+                    file_bytes, ext = download.result()
+
+                    file_digest = ""
+                    if menu_cache is not None:
+                        from restaurant_pipeline.blocks.block2_menu.menu_cache import KIND_FILE, content_hash
+
+                        file_digest = content_hash(file_bytes)
+                        cached = menu_cache.get(KIND_FILE, file_digest, file_version)
+                        if cached is not None and not dump_images:
+                            print(f"    Позиций найдено: {len(cached)} (из кэша разбора)")
+                            all_items.extend(cached)
+                            continue
+
+                    items, n_failed = _parse_menu_file(
+                        file_bytes, ext, api_key,
+                        cache=menu_cache,
+                        cache_version=slice_version,
+                        dump_to=(name, j, tmp_dir) if dump_images else None,
+                        page_filter_stats=page_filter_stats,
+                        image_hashes=image_hashes,
+                    )
+                    print(f"    Позиций найдено: {len(items)}")
+                    all_items.extend(items)
+                    if menu_cache is not None and n_failed == 0:
+                        menu_cache.put(KIND_FILE, file_digest, file_version, items)
+                except Exception as e:
+                    print(f"    Ошибка: {e}")
+
             entry = {
-                "status": "no_api_key",
+                "status": "parsed",
                 "menu_urls": urls,
-                "items": [],
+                "items_count": len(all_items),
+                "has_kids_menu": _detect_kids_menu(all_items),
+                "categories": _extract_categories(all_items),
+                "items": all_items,
             }
             if is_market or is_competitive:
-                entry["вывод"] = _menu_place_conclusion({
-                    "status": "no_api_key",
-                    "menu_urls": urls,
-                    "items": [],
-                })
+                entry["вывод"] = _menu_place_conclusion(entry)
             if is_ref:
                 entry["is_reference_place"] = True
             menu_by_place[name] = entry
-            continue
-
-        all_items = []
-        for j, url in enumerate(urls):
-            file_type = types[j] if j < len(types) else "unknown"
-            print(f"    [{j+1}/{len(urls)}] {file_type}: {url[:80]}...")
-
-            try:
-                if url.startswith("/") or url.startswith("."):
-                    file_bytes = Path(url).read_bytes()
-                    ext = Path(url).suffix.lower()
-                    if ext not in (".pdf", ".png", ".jpg", ".jpeg"):
-                        ext = ".pdf" if b"%PDF" in file_bytes[:10] else ".jpeg"
-                else:
-                    file_bytes, ext = _download_file(url)
-
-                raw_images = _convert_to_images(file_bytes, ext)
-                images = []
-                for img in raw_images:
-                    images.extend(_slice_tall_image(img))
-                print(f"    Страниц/изображений: {len(raw_images)} → {len(images)} (после нарезки)")
-                if dump_images:
-                    _dump_images_to_tmp(images, name, j, tmp_dir)
-                items = _parse_menu_images(images, api_key)
-                print(f"    Позиций найдено: {len(items)}")
-                all_items.extend(items)
-            except Exception as e:
-                print(f"    Ошибка: {e}")
-
-        entry = {
-            "status": "parsed",
-            "menu_urls": urls,
-            "items_count": len(all_items),
-            "has_kids_menu": _detect_kids_menu(all_items),
-            "categories": _extract_categories(all_items),
-            "items": all_items,
-        }
-        if is_market or is_competitive:
-            entry["вывод"] = _menu_place_conclusion(entry)
-        if is_ref:
-            entry["is_reference_place"] = True
-        menu_by_place[name] = entry
+    finally:
+        download_pool.shutdown(wait=False, cancel_futures=True)
+        if downloader is not None:
+            downloader.close()
+        menu_cache_stats = menu_cache.stats_snapshot() if menu_cache is not None else None
+        if menu_cache is not None:
+            menu_cache.close()
+        image_dedup_stats = image_hashes.stats_snapshot() if image_hashes is not None else None
+        http_cache_stats = http_cache.stats_snapshot() if http_cache is not None else None
+        if http_cache is not None:
+            http_cache.close()
+
+    if image_dedup_stats and image_dedup_stats["checked"]:
+        print(
+            f"[block2] Повторы полос внутри файлов (перцептивный отпечаток): {image_dedup_stats['hits']} "
+            f"из {image_dedup_stats['checked']} (dedup_rate={image_dedup_stats['dedup_rate']:.0%})",
+            flush=True,
+        )
 
     payload = {
         "block": "block2_menu",
         "source_csv": source_csv,
         "menu_by_place": menu_by_place,
+        "menu_cache": menu_cache_stats,
+        "page_filter": page_filter_stats,
+        "image_dedup": image_dedup_stats,
+        "http_cache": http_cache_stats,
     }
     if is_market:
         payload["общий_вывод"] = _apply_market_llm_analysis(
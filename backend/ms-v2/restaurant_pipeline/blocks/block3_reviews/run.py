@@ -48,15 +48,24 @@ def _pick_rows_for_selected_places(source_df: pd.DataFrame, selected_places: lis
     """
     Матчим выбранные заведения (название + адрес) к исходной базе.
     Возвращаем строки для передачи в parse_yandex_reviews.
+    Колонки _name_norm/_addr_norm, если уже есть (каталог catalog.py), не пересчитываются.
+    Поиск по названию — через индекс (name_index.py), а не маской по всей базе на каждое заведение.
     """
-    df = source_df.copy()
+    from name_index import NameIndex
+
+    df = source_df.reset_index(drop=True)
     if "название" not in df.columns or "адрес" not in df.columns:
         raise ValueError("В source_csv должны быть колонки 'название' и 'адрес'.")
 
-    df["_name_norm"] = df["название"].fillna("").astype(str).map(_norm_text)
-    df["_addr_norm"] = df["адрес"].fillna("").astype(str).map(_norm_text)
+    if "_name_norm" not in df.columns:
+        df["_name_norm"] = df["название"].fillna("").astype(str).map(_norm_text)
+    if "_addr_norm" not in df.columns:
+        df["_addr_norm"] = df["адрес"].fillna("").astype(str).map(_norm_text)
+
+    name_index = NameIndex(df["_name_norm"])
+    addrs = df["_addr_norm"].to_numpy()
 
-    picked_indices: list[int] = []
+    picked_positions: list[int] = []
     for place in selected_places:
         name_norm = _norm_text(place.get("название"))
         addr_norm = _norm_text(place.get("адрес"))
@@ -64,31 +73,28 @@ def _pick_rows_for_selected_places(source_df: pd.DataFrame, selected_places: lis
             continue
 
         # 1) Точное совпадение по нормализованному названию
-        cand = df[df["_name_norm"] == name_norm]
+        cand = name_index.exact(name_norm)
 
-        # 2) Если несколько - уточняем по адресу
+        # 2) Если несколько - уточняем по адресу (совпадение или вхождение адреса из block1)
         if len(cand) > 1 and addr_norm:
-            cand_addr = cand[
-                (cand["_addr_norm"] == addr_norm)
-                | (cand["_addr_norm"].str.contains(addr_norm, regex=False))
-                | (pd.Series([addr_norm] * len(cand), index=cand.index).str.contains(cand["_addr_norm"], regex=False))
-            ]
-            if len(cand_addr) > 0:
+            cand_addr = [pos for pos in cand if addr_norm in str(addrs[pos])]
+            if cand_addr:
                 cand = cand_addr
 
         # 3) Если нет точного - мягкий поиск по вхождению названия
         if len(cand) == 0:
-            cand = df[df["_name_norm"].str.contains(name_norm, regex=False)]
+            cand = name_index.contains(name_norm)
 
         if len(cand) == 0:
             continue
 
-        picked_indices.append(int(cand.index[0]))
+        picked_positions.append(int(cand[0]))
 
-    if not picked_indices:
-        return df.iloc[0:0].drop(columns=["_name_norm", "_addr_norm"], errors="ignore")
+    norm_columns = ["_name_key", "_name_norm", "_addr_norm"]
+    if not picked_positions:
+        return df.iloc[0:0].drop(columns=norm_columns, errors="ignore")
 
-    out = df.loc[sorted(set(picked_indices))].drop(columns=["_name_norm", "_addr_norm"], errors="ignore")
+    out = df.iloc[sorted(set(picked_positions))].drop(columns=norm_columns, errors="ignore")
     return out.reset_index(drop=True)
 
 
@@ -588,7 +594,12 @@ def run(
         regular_places = [p for p in selected if not p.get("is_reference_place")]
         ref_places = [p for p in selected if p.get("is_reference_place")]
 
-        source_df = pd.read_csv(source_csv)
+        if str(root) not in sys.path:
+            sys.path.insert(0, str(root))
+        from catalog import load_rows
+
+        # Из каталога (если собран) — без повторного парсинга CSV и с готовыми нормализованными колонками
+        source_df = load_rows(str(source_csv))
         matched_df = _pick_rows_for_selected_places(source_df, regular_places)
 
         if ref_places:
@@ -2,10 +2,24 @@
 Модуль оценки тональности отзывов на русском языке.
 Использует seara/rubert-tiny2-russian-sentiment — лёгкую модель для ~1000 отзывов.
 Метки: -1 (негатив), 0 (нейтрал), 1 (позитив).
+
+Модель загружается один раз на процесс (воркер держит её между задачами, прогрев — при старте
+процесса, см. warm_up). Отзывы токенизируются один раз, сортируются по длине в токенах и режутся
+на батчи под бюджет токенов: короткие отзывы идут большими батчами и не добиваются паддингом
+до длинных. Инференс — под torch.inference_mode с заданным числом потоков или, при
+INFERENCE_BACKEND=onnx, в ONNX Runtime с int8-весами (onnx_backend.py).
+
+Настройки (env):
+  SENTIMENT_BATCH_TOKENS    — бюджет батча: текстов × длина самого длинного (по умолчанию 4096);
+  SENTIMENT_MAX_BATCH       — предел текстов в батче (по умолчанию 64);
+  SENTIMENT_THREADS         — потоков torch на инференс (по умолчанию min(4, число ядер)).
 """
 
 from __future__ import annotations
 
+import contextlib
+import os
+import threading
 from typing import Optional
 
 # Маппинг выхода модели в -1/0/1 (зависит от модели)
@@ -13,22 +27,76 @@ from typing import Optional
 _LABEL_TO_SENTIMENT = {0: 0, 1: 1, 2: -1}
 
 _MODEL_ID = "seara/rubert-tiny2-russian-sentiment"
-_BATCH_SIZE = 32
+_BATCH_SIZE = int(os.environ.get("SENTIMENT_MAX_BATCH", "64"))
+_BATCH_TOKENS = int(os.environ.get("SENTIMENT_BATCH_TOKENS", "4096"))
+_THREADS = int(os.environ.get("SENTIMENT_THREADS", "0")) or min(4, os.cpu_count() or 1)
 _MAX_LENGTH = 256
 
-
-def _get_model_and_tokenizer():
-    """Ленивая загрузка модели и токенизатора."""
-    from transformers import AutoModelForSequenceClassification, AutoTokenizer
-    import torch
-
-    tokenizer = AutoTokenizer.from_pretrained(_MODEL_ID)
-    model = AutoModelForSequenceClassification.from_pretrained(_MODEL_ID)
-    model.eval()
-    return model, tokenizer
+# Модель и токенизатор на процесс: блоки работают потоками, загрузка — под замком
+_MODEL_LOCK = threading.Lock()
+_MODEL: Optional[tuple] = None
 
 
-def predict_sentiment(texts: list[str], batch_size: int = _BATCH_SIZE) -> list[int]:
+def _get_model_and_tokenizer():
+    """Модель и токенизатор процесса: первая загрузка — from_pretrained, дальше — из памяти."""
+    global _MODEL
+    with _MODEL_LOCK:
+        if _MODEL is None:
+            _MODEL = _load_onnx()
+        if _MODEL is None:
+            from transformers import AutoModelForSequenceClassification, AutoTokenizer
+            import torch
+
+            torch.set_num_threads(max(1, _THREADS))
+            tokenizer = AutoTokenizer.from_pretrained(_MODEL_ID)
+            model = AutoModelForSequenceClassification.from_pretrained(_MODEL_ID)
+            model.eval()
+            _MODEL = (model, tokenizer)
+        return _MODEL
+
+
+def _load_onnx() -> Optional[tuple]:
+    """ONNX-классификатор и токенизатор, если выбран INFERENCE_BACKEND=onnx; не вышло — None (PyTorch)."""
+    from onnx_backend import load_sequence_classifier, onnx_enabled
+
+    if not onnx_enabled():
+        return None
+    try:
+        return load_sequence_classifier(_MODEL_ID)
+    except Exception as e:
+        print(f"[block3] ONNX-модель тональности недоступна, PyTorch: {e}", flush=True)
+        return None
+
+
+def warm_up() -> None:
+    """Загрузить модель заранее (при старте процесса воркера), чтобы задача не ждала загрузки."""
+    _get_model_and_tokenizer()
+
+
+def _length_batches(lengths: list[int], batch_size: int, batch_tokens: int) -> list[list[int]]:
+    """
+    Номера текстов, разбитые на батчи: по возрастанию длины, в батче — пока
+    (текстов + 1) × длина самого длинного укладывается в бюджет и текстов не больше batch_size.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches: list[list[int]] = []
+    current: list[int] = []
+    for k in order:
+        # Длины отсортированы — самый длинный в батче всегда текущий
+        if current and (len(current) >= batch_size or (len(current) + 1) * lengths[k] > batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(k)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def predict_sentiment(
+    texts: list[str],
+    batch_size: int = _BATCH_SIZE,
+    batch_tokens: int = _BATCH_TOKENS,
+) -> list[int]:
     """
     Предсказывает тональность для списка текстов.
     Возвращает список значений: -1 (негатив), 0 (нейтрал), 1 (позитив).
@@ -36,37 +104,42 @@ def predict_sentiment(texts: list[str], batch_size: int = _BATCH_SIZE) -> list[i
     if not texts:
         return []
 
-    import torch
-
     model, tokenizer = _get_model_and_tokenizer()
     results = [0] * len(texts)  # по умолчанию нейтрал
-
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i : i + batch_size]
-        batch_clean = []
-        batch_positions = []
-        for j, t in enumerate(batch):
-            s = str(t or "").strip()
-            if len(s) >= 3:
-                batch_clean.append(s)
-                batch_positions.append(i + j)
-
-        if not batch_clean:
-            continue
-
-        enc = tokenizer(
-            batch_clean,
-            padding=True,
-            truncation=True,
-            max_length=_MAX_LENGTH,
-            return_tensors="pt",
-        )
-        with torch.no_grad():
-            logits = model(**enc).logits
-        preds = logits.argmax(dim=1).tolist()
-
-        for pos, pred in zip(batch_positions, preds):
-            results[pos] = _LABEL_TO_SENTIMENT.get(pred, 0)
+    # ONNX-модель принимает массивы NumPy, PyTorch — тензоры
+    tensors = getattr(model, "return_tensors", "pt")
+
+    clean: list[str] = []
+    positions: list[int] = []
+    for i, t in enumerate(texts):
+        s = str(t or "").strip()
+        if len(s) >= 3:
+            clean.append(s)
+            positions.append(i)
+    if not clean:
+        return results
+
+    # Одна токенизация без паддинга: длины для батчей, паддинг — внутри каждого батча
+    encoded = tokenizer(clean, truncation=True, max_length=_MAX_LENGTH)
+    input_ids = encoded["input_ids"]
+    lengths = [len(ids) for ids in input_ids]
+
+    if tensors == "pt":
+        import torch
+
+        mode = torch.inference_mode()
+    else:
+        mode = contextlib.nullcontext()
+    with mode:
+        for batch in _length_batches(lengths, max(1, batch_size), batch_tokens):
+            enc = tokenizer.pad(
+                {key: [encoded[key][k] for k in batch] for key in encoded.keys()},
+                padding=True,
+                return_tensors=tensors,
+            )
+            preds = model(**enc).logits.argmax(1).tolist()
+            for k, pred in zip(batch, preds):
+                results[positions[k]] = _LABEL_TO_SENTIMENT.get(pred, 0)
 
     return results
 
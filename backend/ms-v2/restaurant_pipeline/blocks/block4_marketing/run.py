@@ -14,10 +14,14 @@ import os
 import random
 import re
 import sys
+import time
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 from urllib.parse import parse_qs, urljoin, urlparse, urlunparse
 
+if TYPE_CHECKING:
+    from restaurant_pipeline.blocks.http_cache import HttpCache
+
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 logger = logging.getLogger(__name__)
 
@@ -25,6 +29,77 @@ logger = logging.getLogger(__name__)
 def _project_root() -> Path:
     return Path(__file__).resolve().parents[3]
 
+
+def _open_http_cache() -> "HttpCache | None":
+    """Общий HTTP-кэш блоков (blocks/http_cache.py) по настройкам из env (None — выключен)."""
+    project_root = _project_root()
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+    from restaurant_pipeline.blocks.http_cache import HttpCache
+
+    return HttpCache.from_env("block4")
+
+
+# Расширения статики: такие URL не перехватываются вовсе (не гоняются через Python)
+_STATIC_EXTENSIONS = frozenset({
+    ".js", ".mjs", ".css", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg", ".ico",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot", ".mp4", ".webm", ".mp3", ".json", ".map", ".pdf",
+})
+
+
+def _document_url_matcher(site: str):
+    """
+    Какие URL перехватывать для HTTP-кэша: только страницы самого сайта (хост без «www.»),
+    а не статика и не сторонние ресурсы (CDN, счётчики, виджеты) — им маршрут не нужен.
+    """
+    host = (urlparse(site).hostname or "").lower().removeprefix("www.")
+
+    def _match(url: str) -> bool:
+        parsed = urlparse(url)
+        if (parsed.hostname or "").lower().removeprefix("www.") != host:
+            return False
+        return os.path.splitext(parsed.path)[1].lower() not in _STATIC_EXTENSIONS
+
+    return _match
+
+
+async def _route_through_http_cache(route, http_cache: "HttpCache") -> None:
+    """
+    HTML-документы (сайт, страницы лояльности) — через общий HTTP-кэш: свежая копия отдаётся
+    браузеру без запроса, устаревшая перепроверяется условным запросом (304 — копия из кэша).
+    Редиректы не раскрываются (браузер проходит их сам); прочие запросы сайта (XHR и т. п.) —
+    без изменений. Ответы с Set-Cookie не кэшируются (HttpCache.store), так что cookie и
+    согласия выставляются так же, как без кэша.
+    """
+    request = route.request
+    if request.method != "GET" or request.resource_type != "document":
+        await route.continue_()
+        return
+    try:
+        entry = http_cache.lookup(request.url, variant="browser")
+        body = http_cache.read_body(entry) if entry is not None else None
+        if entry is not None and body is not None and entry.is_fresh():
+            http_cache.record_hit(entry)
+            await route.fulfill(status=entry.status, headers=entry.headers, body=body)
+            return
+
+        conditional = http_cache.conditional_headers(entry) if body is not None else {}
+        start = time.perf_counter()
+        response = await route.fetch(headers={**request.headers, **conditional}, max_redirects=0)
+        if response.status == 304 and entry is not None and body is not None:
+            http_cache.record_hit(entry, revalidated_headers=response.headers)
+            await route.fulfill(status=entry.status, headers=entry.headers, body=body)
+            return
+        fetched = await response.body()
+        http_cache.store(request.url, "browser", response.status, response.headers, fetched,
+                         time.perf_counter() - start)
+        await route.fulfill(response=response, body=fetched)
+    except Exception:
+        try:
+            await route.continue_()
+        except Exception:
+            pass
+
 # ---------------------------------------------------------------------------
 # Соцсети (Playwright)
 # ---------------------------------------------------------------------------
@@ -626,7 +701,9 @@ async def _parse_loyalty(page, website_url: str, company_name: str) -> dict[str,
     return result
 
 
-async def _process_place(browser, place: dict, idx: int, total: int, add_conclusion: bool) -> tuple[str, dict]:
+async def _process_place(
+    browser, place: dict, idx: int, total: int, add_conclusion: bool, http_cache: "HttpCache | None" = None,
+) -> tuple[str, dict]:
     name = place.get("название", f"place_{idx}")
     site = (place.get("сайт") or "").strip()
     is_ref = place.get("is_reference_place", False)
@@ -657,6 +734,10 @@ async def _process_place(browser, place: dict, idx: int, total: int, add_conclus
         locale="ru-RU",
         viewport={"width": 1920, "height": 1080},
     )
+    if http_cache is not None:
+        await context.route(
+            _document_url_matcher(site), lambda route: _route_through_http_cache(route, http_cache)
+        )
     page = await context.new_page()
     await page.add_init_script("Object.defineProperty(navigator,'webdriver',{get:()=>undefined})")
 
@@ -682,14 +763,16 @@ async def _process_place(browser, place: dict, idx: int, total: int, add_conclus
     return name, entry
 
 
-async def _run_async(places: list[dict], add_conclusion: bool) -> dict[str, dict]:
+async def _run_async(
+    places: list[dict], add_conclusion: bool, http_cache: "HttpCache | None" = None,
+) -> dict[str, dict]:
     from playwright.async_api import async_playwright
     marketing: dict[str, dict] = {}
     total = len(places)
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True, args=["--disable-blink-features=AutomationControlled"])
         for idx, place in enumerate(places, 1):
-            name, entry = await _process_place(browser, place, idx, total, add_conclusion)
+            name, entry = await _process_place(browser, place, idx, total, add_conclusion, http_cache)
             marketing[name] = entry
             await asyncio.sleep(random.uniform(2, 4))
         await browser.close()
@@ -716,7 +799,14 @@ def run(input_json_path: str, output_json_path: str) -> dict:
 
     logger.info(f"[block4] Обработка {len(places)} заведений")
     add_conclusion = is_market or is_competitive
-    marketing_by_place = asyncio.run(_run_async(places, add_conclusion))
+    # Страницы сайтов — через общий HTTP-кэш блоков (ETag/Last-Modified, срок свежести)
+    http_cache = _open_http_cache() if places else None
+    try:
+        marketing_by_place = asyncio.run(_run_async(places, add_conclusion, http_cache))
+    finally:
+        http_cache_stats = http_cache.stats_snapshot() if http_cache is not None else None
+        if http_cache is not None:
+            http_cache.close()
 
     logger.info("[block4] Обогащение соцсетей Perplexity (активность)…")
     _enrich_socials_with_perplexity(marketing_by_place, api_key, model)
@@ -724,6 +814,7 @@ def run(input_json_path: str, output_json_path: str) -> dict:
     payload: dict[str, Any] = {
         "block": "block4_marketing",
         "marketing_by_place": marketing_by_place,
+        "http_cache": http_cache_stats,
     }
     if is_market:
         payload["общий_вывод"] = _apply_market_llm_analysis(
@@ -3,10 +3,14 @@ import os
 import sys
 import time
 from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
 import requests
 from bs4 import BeautifulSoup
 
+if TYPE_CHECKING:
+    from restaurant_pipeline.blocks.http_cache import HttpCache
+
 try:
     import cloudscraper
     _scraper = cloudscraper.create_scraper()
@@ -49,6 +53,41 @@ def _project_root() -> Path:
     return Path(__file__).resolve().parents[3]
 
 
+def _open_http_cache() -> "HttpCache | None":
+    """Общий HTTP-кэш блоков (blocks/http_cache.py) по настройкам из env (None — выключен)."""
+    project_root = _project_root()
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+    from restaurant_pipeline.blocks.http_cache import HttpCache
+
+    return HttpCache.from_env("block5")
+
+
+def _timed_get(
+    url: str,
+    headers: Optional[dict],
+    timeout: int,
+    session=None,
+    http_cache: "HttpCache | None" = None,
+    variant: str = "",
+) -> tuple[requests.Response, float, str]:
+    """
+    (ответ, время полной загрузки, с; откуда время). Запрос к сайту уходит всегда — статус
+    проверяется вживую. С http_cache запрос условный (If-None-Match / If-Modified-Since): на 304
+    тело для разбора HTML и время берутся из кэша — время последней полной загрузки страницы
+    ("cached"), а не пустого ответа 304; иначе время измерено этим запросом ("live").
+    """
+    session = session or requests
+    if http_cache is not None:
+        response = http_cache.get(
+            url, session=session, headers=headers, timeout=timeout, variant=variant, revalidate=True,
+        )
+        return response, round(response.load_time, 2), "cached" if response.from_cache else "live"
+    start = time.perf_counter()
+    response = session.get(url, headers=headers, timeout=timeout)
+    return response, round(time.perf_counter() - start, 2), "live"
+
+
 def _detect_chrome_version() -> int | None:
     """Определяет мажорную версию установленного Chrome."""
     import subprocess, re
@@ -114,19 +153,22 @@ def _parse_html(html: bytes, result: dict) -> None:
     result["has_viewport"] = soup.find("meta", attrs={"name": "viewport"}) is not None
 
 
-def check_website(url: str) -> dict:
+def check_website(url: str, http_cache: "HttpCache | None" = None) -> dict:
     """Проверяет сайт: статус, время загрузки, размер, title, meta-теги.
 
     Цепочка попыток:
       1. requests + браузерные заголовки
       2. cloudscraper (если 401/403)
       3. headless Chrome через undetected_chromedriver (если всё ещё 401/403)
+    Шаги 1–2 и мобильный запрос идут через http_cache, если он передан.
     """
     result = {
         "url": url,
         "status_code": None,
         "load_time_sec": 0,
+        "load_time_source": None,  # live — измерено сейчас, cached — последняя полная загрузка (304)
         "mobile_load_time_sec": None,
+        "mobile_load_time_source": None,
         "page_size_kb": 0,
         "title": None,
         "meta_description": None,
@@ -139,9 +181,7 @@ def check_website(url: str) -> dict:
 
     # --- 1) Обычный requests ---
     try:
-        start = time.perf_counter()
-        response = requests.get(url, headers=_DESKTOP_HEADERS, timeout=10)
-        elapsed = round(time.perf_counter() - start, 2)
+        response, elapsed, source = _timed_get(url, _DESKTOP_HEADERS, 10, http_cache=http_cache, variant="desktop")
         status_code = response.status_code
     except requests.RequestException as e:
         result["error"] = str(e)
@@ -150,9 +190,9 @@ def check_website(url: str) -> dict:
     # --- 2) cloudscraper fallback ---
     if status_code in (401, 403) and _scraper is not None:
         try:
-            start = time.perf_counter()
-            response = _scraper.get(url, timeout=15)
-            elapsed = round(time.perf_counter() - start, 2)
+            response, elapsed, source = _timed_get(
+                url, None, 15, session=_scraper, http_cache=http_cache, variant="desktop",
+            )
             status_code = response.status_code
         except Exception:
             pass  # оставляем предыдущий результат
@@ -167,6 +207,7 @@ def check_website(url: str) -> dict:
 
             result["status_code"] = status_code
             result["load_time_sec"] = elapsed
+            result["load_time_source"] = "live"
             _parse_html(html_bytes, result)
 
             # Если после браузера title «403»/пустой — сайт за жёсткой защитой
@@ -183,10 +224,8 @@ def check_website(url: str) -> dict:
 
         # Мобильный запрос (обычный requests, не через браузер)
         try:
-            mobile_start = time.perf_counter()
-            requests.get(url, headers=_MOBILE_HEADERS, timeout=10)
-            result["mobile_load_time_sec"] = round(
-                time.perf_counter() - mobile_start, 2
+            _, result["mobile_load_time_sec"], result["mobile_load_time_source"] = _timed_get(
+                url, _MOBILE_HEADERS, 10, http_cache=http_cache, variant="mobile",
             )
         except requests.RequestException:
             result["mobile_load_time_sec"] = None
@@ -197,6 +236,7 @@ def check_website(url: str) -> dict:
     if status_code in (401, 403):
         result["status_code"] = status_code
         result["load_time_sec"] = elapsed
+        result["load_time_source"] = source
         result["anti_bot_protected"] = True
         result["error"] = "Сайт вернул 401/403, возможно anti-bot защита"
         return result
@@ -204,14 +244,13 @@ def check_website(url: str) -> dict:
     # --- Обычный путь: requests/cloudscraper сработал ---
     result["status_code"] = status_code
     result["load_time_sec"] = elapsed
+    result["load_time_source"] = source
     _parse_html(response.content, result)
 
     # Мобильный запрос
     try:
-        mobile_start = time.perf_counter()
-        requests.get(url, headers=_MOBILE_HEADERS, timeout=10)
-        result["mobile_load_time_sec"] = round(
-            time.perf_counter() - mobile_start, 2
+        _, result["mobile_load_time_sec"], result["mobile_load_time_source"] = _timed_get(
+            url, _MOBILE_HEADERS, 10, http_cache=http_cache, variant="mobile",
         )
     except requests.RequestException:
         result["mobile_load_time_sec"] = None
@@ -473,6 +512,8 @@ def run(input_json_path: str, output_json_path: str) -> dict:
     ref_name = str((block1.get("reference_place") or {}).get("name") or "").strip()
 
     tech_by_place: dict[str, dict] = {}
+    # Страницы сайтов — через общий HTTP-кэш блоков (ETag/Last-Modified, срок свежести)
+    http_cache = _open_http_cache() if places else None
 
     for p in places:
         name = p.get("название", "unknown")
@@ -493,7 +534,7 @@ def run(input_json_path: str, output_json_path: str) -> dict:
             continue
 
         print(f"  [{name}]{'  [ref]' if is_ref else ''} проверяю {site} …", flush=True)
-        result = check_website(site)
+        result = check_website(site, http_cache=http_cache)
         if is_market or is_competitive:
             result["вывод"] = _tech_place_conclusion(result)
         if is_ref:
@@ -502,11 +543,17 @@ def run(input_json_path: str, output_json_path: str) -> dict:
         print(
             f"  [{name}] статус={result['status_code']}, "
             f"время={result['load_time_sec']}с"
+            + (" (последняя полная загрузка, 304)" if result.get("load_time_source") == "cached" else "")
         )
 
+    http_cache_stats = http_cache.stats_snapshot() if http_cache is not None else None
+    if http_cache is not None:
+        http_cache.close()
+
     payload = {
         "block": "block5_tech",
         "tech_by_place": tech_by_place,
+        "http_cache": http_cache_stats,
     }
     if is_market:
         payload["общий_вывод"] = _apply_market_llm_analysis(
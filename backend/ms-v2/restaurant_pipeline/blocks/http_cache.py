@@ -0,0 +1,349 @@
+"""
+Локальный HTTP-кэш на диске, общий для блоков: файлы меню (block2), страницы сайтов (block5)
+и документы, которые открывает краулер соцсетей/лояльности (block4, Playwright).
+
+Тело ответа 200 хранится файлом, метаданные (ETag, Last-Modified, срок свежести, время загрузки) —
+в SQLite. Повторный запрос:
+  - запись свежая — ответ из кэша без запроса в сеть (hit);
+  - устарела, но есть ETag/Last-Modified — условный запрос (If-None-Match / If-Modified-Since);
+    304 — тело из кэша, срок свежести продлевается (revalidated);
+  - иначе — обычная загрузка (miss) и запись в кэш.
+get(..., revalidate=True) не отдаёт свежую запись без запроса: block5 проверяет доступность вживую,
+а при 304 берёт из кэша тело и время его последней полной загрузки (не время пустого ответа 304).
+Срок свежести — из Cache-Control: max-age / Expires ответа (no-cache — всегда перепроверять,
+no-store — не сохранять), а если сервер его не задал — HTTP_CACHE_MAX_AGE. Ответы с Set-Cookie
+не сохраняются.
+Размер кэша ограничен HTTP_CACHE_MAX_MB: при превышении удаляются давно не использованные записи.
+
+Ключ — URL + вариант запроса (например, desktop/mobile User-Agent): разные варианты одной
+страницы хранятся отдельно. Счётчики (stats_snapshot) — на экземпляр, то есть на прогон блока.
+
+Настройки (env):
+  HTTP_CACHE=0              — выключить кэш;
+  HTTP_CACHE_DIR            — папка кэша (по умолчанию <project>/cache/http);
+  HTTP_CACHE_MAX_AGE        — срок свежести, с, если сервер его не задал (по умолчанию 3600);
+  HTTP_CACHE_MAX_MB         — предельный размер тел в кэше, МБ (по умолчанию 2048).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Mapping, NamedTuple, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Заголовки ответа, которые храним (остальные при отдаче из кэша не нужны). Content-Encoding
+# не храним: тело сохраняется уже распакованным
+_STORED_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "expires", "date")
+# Источник ответа: из кэша без запроса / после 304 / из сети
+SOURCE_HIT = "hit"
+SOURCE_REVALIDATED = "revalidated"
+
+
+def _project_root() -> Path:
+    return Path(__file__).resolve().parents[2]
+
+
+class CacheEntry(NamedTuple):
+    key: str
+    url: str
+    status: int
+    headers: dict[str, str]
+    fresh_until: float
+    load_time: float
+    size: int
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.headers.get("etag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self.headers.get("last-modified")
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) < self.fresh_until
+
+
+def _cache_control(headers: Mapping[str, str]) -> dict[str, Optional[str]]:
+    directives: dict[str, Optional[str]] = {}
+    for part in str(headers.get("cache-control") or "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip().strip('"') or None
+    return directives
+
+
+def _fresh_until(headers: Mapping[str, str], now: float, default_max_age: float) -> Optional[float]:
+    """До какого момента ответ свежий; None — хранить нельзя (no-store)."""
+    cc = _cache_control(headers)
+    if "no-store" in cc:
+        return None
+    if "no-cache" in cc:
+        return now
+    age = float(re.sub(r"\D", "", str(headers.get("age") or "")) or 0)
+    if cc.get("max-age") is not None:
+        try:
+            return now + max(0.0, float(cc["max-age"]) - age)
+        except ValueError:
+            return now
+    if headers.get("expires"):
+        try:
+            expires = parsedate_to_datetime(headers["expires"]).timestamp()
+            date = parsedate_to_datetime(headers["date"]).timestamp() if headers.get("date") else now
+            return now + max(0.0, expires - date)
+        except (TypeError, ValueError):
+            return now  # некорректный Expires — считаем устаревшим
+    return now + default_max_age
+
+
+def _pick_headers(headers: Mapping[str, str]) -> dict[str, str]:
+    lowered = {str(k).lower(): str(v) for k, v in headers.items()}
+    return {name: lowered[name] for name in _STORED_HEADERS if name in lowered}
+
+
+def make_response(url: str, status: int, headers: Mapping[str, str], body: bytes, load_time: float,
+                  source: Optional[str]) -> requests.Response:
+    """requests.Response из кэша: те же status_code / headers / content / raise_for_status()."""
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers = CaseInsensitiveDict(headers)
+    resp._content = body
+    resp.url = url
+    resp.reason = "OK" if status == 200 else ""
+    resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+    resp.elapsed = timedelta(seconds=load_time)
+    resp.from_cache = source  # type: ignore[attr-defined]
+    resp.load_time = load_time  # type: ignore[attr-defined]
+    return resp
+
+
+class HttpCache:
+    """
+    Кэш + счётчики за один прогон блока
+    (hits / revalidated / misses / stored / not_stored / errors / bytes_from_cache). Потокобезопасен.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_age: Optional[float] = None,
+                 max_mb: Optional[float] = None):
+        self.dir = Path(cache_dir or os.environ.get("HTTP_CACHE_DIR") or _project_root() / "cache" / "http")
+        self.max_age = float(os.environ.get("HTTP_CACHE_MAX_AGE", "3600")) if max_age is None else max_age
+        max_mb = float(os.environ.get("HTTP_CACHE_MAX_MB", "2048")) if max_mb is None else max_mb
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0, "revalidated": 0, "misses": 0, "stored": 0, "not_stored": 0, "errors": 0,
+            "bytes_from_cache": 0,
+        }
+
+        (self.dir / "bodies").mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.dir / "index.sqlite"), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS http_cache ("
+            " key TEXT PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " variant TEXT NOT NULL,"
+            " status INTEGER NOT NULL,"
+            " headers TEXT NOT NULL,"
+            " fresh_until REAL NOT NULL,"
+            " load_time REAL NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " used_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS http_cache_used_at ON http_cache (used_at)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls, block: str = "http_cache") -> Optional["HttpCache"]:
+        """Кэш с настройками из env; None — если выключен (HTTP_CACHE=0) или папка недоступна."""
+        if os.environ.get("HTTP_CACHE", "1") == "0":
+            return None
+        try:
+            return cls()
+        except (OSError, sqlite3.Error) as e:
+            print(f"[{block}] HTTP-кэш недоступен: {e}", flush=True)
+            return None
+
+    # --- низкоуровневые операции (для клиентов не на requests, например Playwright) ---
+
+    @staticmethod
+    def key(url: str, variant: str = "") -> str:
+        return hashlib.sha256(f"{variant}\n{url}".encode("utf-8")).hexdigest()
+
+    def _body_path(self, key: str) -> Path:
+        return self.dir / "bodies" / key[:2] / key
+
+    def lookup(self, url: str, variant: str = "") -> Optional[CacheEntry]:
+        key = self.key(url, variant)
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT url, status, headers, fresh_until, load_time, size FROM http_cache WHERE key = ?",
+                    (key,),
+                ).fetchone()
+            if row is None:
+                return None
+            return CacheEntry(key, row[0], row[1], json.loads(row[2]), row[3], row[4], row[5])
+        except (sqlite3.Error, ValueError):
+            self._count("errors")
+            return None
+
+    def read_body(self, entry: CacheEntry) -> Optional[bytes]:
+        try:
+            return self._body_path(entry.key).read_bytes()
+        except OSError:
+            return None
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CacheEntry]) -> dict[str, str]:
+        """If-None-Match / If-Modified-Since для перепроверки записи ({} — валидаторов нет)."""
+        headers: dict[str, str] = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def record_hit(self, entry: CacheEntry, revalidated_headers: Optional[Mapping[str, str]] = None) -> None:
+        """
+        Запись использована: без запроса (revalidated_headers=None) или после 304 — тогда заголовки
+        ответа 304 обновляют сохранённые и срок свежести.
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                if revalidated_headers is None:
+                    self.stats["hits"] += 1
+                    self._conn.execute("UPDATE http_cache SET used_at = ? WHERE key = ?", (now, entry.key))
+                else:
+                    self.stats["revalidated"] += 1
+                    headers = {**entry.headers, **_pick_headers(revalidated_headers)}
+                    fresh_until = _fresh_until(headers, now, self.max_age) or now
+                    self._conn.execute(
+                        "UPDATE http_cache SET headers = ?, fresh_until = ?, used_at = ? WHERE key = ?",
+                        (json.dumps(headers), fresh_until, now, entry.key),
+                    )
+                self.stats["bytes_from_cache"] += entry.size
+                self._conn.commit()
+        except sqlite3.Error:
+            self._count("errors")
+
+    def store(self, url: str, variant: str, status: int, headers: Mapping[str, str], body: bytes,
+              load_time: float) -> None:
+        """
+        Ответ из сети (промах кэша): сохранить, если можно — только 200, не no-store и без Set-Cookie
+        (ответ из кэша не выставил бы cookie, и страницы с согласием/сессией вели бы себя иначе).
+        """
+        self._count("misses")
+        now = time.time()
+        picked = _pick_headers(headers)
+        sets_cookie = any(str(name).lower() == "set-cookie" for name in headers.keys())
+        fresh_until = _fresh_until(picked, now, self.max_age) if status == 200 and not sets_cookie else None
+        if fresh_until is None or len(body) > self.max_bytes:
+            self._count("not_stored")
+            return
+        key = self.key(url, variant)
+        path = self._body_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{key}.tmp{os.getpid()}.{threading.get_ident()}")
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO http_cache"
+                    " (key, url, variant, status, headers, fresh_until, load_time, size, stored_at, used_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, url, variant, status, json.dumps(picked), fresh_until, load_time, len(body), now, now),
+                )
+                self._evict()
+                self._conn.commit()
+                self.stats["stored"] += 1
+        except (OSError, sqlite3.Error):
+            self._count("errors")
+
+    def _evict(self) -> None:
+        """
+        Кэш больше предела — удаляет давно не использованные записи, пока не станет меньше 90% предела.
+        Вызывать под self._lock в открытой транзакции записи: размер считается в ней же, так что
+        записи других экземпляров (блоки 2, 4, 5 пишут в один файл параллельно) тоже учитываются.
+        """
+        total = int(self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0])
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        removed = []
+        for key, size in self._conn.execute("SELECT key, size FROM http_cache ORDER BY used_at").fetchall():
+            if total <= target:
+                break
+            removed.append(key)
+            total -= size
+        self._conn.executemany("DELETE FROM http_cache WHERE key = ?", [(key,) for key in removed])
+        for key in removed:
+            try:
+                self._body_path(key).unlink()
+            except OSError:
+                pass
+
+    # --- GET через requests ---
+
+    def get(
+        self,
+        url: str,
+        session: Any = None,
+        headers: Optional[Mapping[str, str]] = None,
+        timeout: float = 30,
+        variant: str = "",
+        revalidate: bool = False,
+    ) -> requests.Response:
+        """
+        GET через кэш. session — requests.Session (или cloudscraper), по умолчанию модуль requests.
+        У ответа есть from_cache (hit / revalidated / None — из сети) и load_time — время полной
+        загрузки, с (для ответа из кэша — измеренное при последней загрузке тела).
+        revalidate=True — запрос уходит всегда, даже если запись свежая (проверка доступности);
+        при 304 ответ тот же, что и без него: тело из кэша и load_time последней полной загрузки.
+        """
+        session = session or requests
+        entry = self.lookup(url, variant)
+        body = self.read_body(entry) if entry is not None else None
+        if not revalidate and entry is not None and body is not None and entry.is_fresh():
+            self.record_hit(entry)
+            return make_response(url, entry.status, entry.headers, body, entry.load_time, SOURCE_HIT)
+
+        conditional = self.conditional_headers(entry) if body is not None else {}
+        start = time.perf_counter()
+        resp = session.get(url, headers={**(headers or {}), **conditional}, timeout=timeout)
+        load_time = time.perf_counter() - start
+        if resp.status_code == 304 and entry is not None and body is not None:
+            self.record_hit(entry, revalidated_headers=resp.headers)
+            return make_response(url, entry.status, {**entry.headers, **_pick_headers(resp.headers)}, body,
+                                 entry.load_time, SOURCE_REVALIDATED)
+
+        self.store(url, variant, resp.status_code, resp.headers, resp.content, load_time)
+        resp.from_cache = None
+        resp.load_time = load_time
+        return resp
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def stats_snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
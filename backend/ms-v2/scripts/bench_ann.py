@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк IVF (ann_index.py) против точного косинуса по всем отфильтрованным строкам:
+recall@n и задержка запроса в зависимости от nprobe и доли строк, прошедших фильтр.
+
+Эмбеддинги синтетические (кластеры на сфере, как у описаний похожих заведений),
+запросы — зашумлённые строки каталога. Можно подставить реальный индекс: --embeddings путь/к/embeddings.npy.
+
+Пример:
+  python scripts/bench_ann.py --sizes 100000 500000 --nprobe 4 8 16 32 64
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from ann_index import IVFIndex, top_n  # noqa: E402
+
+
+def make_embeddings(n: int, dim: int, n_topics: int, seed: int = 0) -> np.ndarray:
+    """Нормированные эмбеддинги: центр темы + шум."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    x = centers[rng.integers(0, n_topics, size=n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def make_queries(embeddings: np.ndarray, n_queries: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    q = embeddings[rng.integers(0, len(embeddings), size=n_queries)]
+    q = q + 0.5 * rng.normal(size=q.shape).astype(np.float32) / np.sqrt(q.shape[1])
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def exact_search(embeddings: np.ndarray, query: np.ndarray, n: int, mask: np.ndarray) -> np.ndarray:
+    positions = np.flatnonzero(mask)
+    scores = embeddings[positions] @ query
+    return positions[top_n(scores, n)]
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Бенчмарк IVF: recall@n против задержки")
+    p.add_argument("--sizes", type=int, nargs="+", default=[100_000, 500_000])
+    p.add_argument("--embeddings", type=Path, default=None, help="Реальный embeddings.npy вместо синтетики")
+    p.add_argument("--dim", type=int, default=312, help="Размерность синтетики (rubert-mini-frida — 312)")
+    p.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    p.add_argument("--selectivity", type=float, nargs="+", default=[1.0, 0.2, 0.02],
+                   help="Доля строк, прошедших фильтр тип/кухня/цена")
+    p.add_argument("--queries", type=int, default=50)
+    p.add_argument("-n", type=int, default=20, help="Размер топа")
+    args = p.parse_args()
+
+    datasets = []
+    if args.embeddings is not None:
+        datasets.append((args.embeddings.name, np.load(args.embeddings, mmap_mode="r")))
+    else:
+        for size in args.sizes:
+            datasets.append((f"synthetic {size}", make_embeddings(size, args.dim, n_topics=max(50, size // 500))))
+
+    for label, embeddings in datasets:
+        t0 = time.perf_counter()
+        index = IVFIndex.build(embeddings)
+        build_s = time.perf_counter() - t0
+        print(f"\n{label}: {len(embeddings)} строк, n_lists={index.n_lists}, построение {build_s:.1f} s")
+        print(f"{'filter':>7} {'nprobe':>7} {'recall@n':>9} {'ann, ms':>8} {'exact, ms':>10} {'speedup':>8}")
+
+        queries = make_queries(np.asarray(embeddings), args.queries)
+        rng = np.random.default_rng(2)
+        for selectivity in args.selectivity:
+            mask = rng.random(len(embeddings)) < selectivity
+            t0 = time.perf_counter()
+            truth = [exact_search(embeddings, q, args.n, mask) for q in queries]
+            exact_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+            for nprobe in args.nprobe:
+                t0 = time.perf_counter()
+                found = [index.search(embeddings, q, args.n, mask=mask, nprobe=nprobe)[0] for q in queries]
+                ann_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+                recall = np.mean([
+                    len(np.intersect1d(f, t)) / max(1, len(t)) for f, t in zip(found, truth)
+                ])
+                print(
+                    f"{selectivity:>7.2f} {nprobe:>7} {recall:>9.3f} {ann_ms:>8.2f} {exact_ms:>10.2f} "
+                    f"{exact_ms / ann_ms:>7.1f}x"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
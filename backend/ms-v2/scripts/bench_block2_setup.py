@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Подготовка block2 — поиск ссылок на меню для заведений отчёта: прежняя схема (на каждое заведение
+pd.read_csv + нормализация всех названий, _find_menu_links до индекса) против индекса ссылок
+на отчёт/воркер (_load_menu_link_index: одна загрузка колонок, затем поиск по индексу названий).
+
+Синтетическая база нужного размера пишется в CSV (и, с --catalog, в колоночный каталог);
+сначала проверяется, что обе схемы находят одни и те же ссылки (точные названия, названия
+с другим регистром/пробелами, части названий, отсутствующие), затем печатается время
+подготовки отчёта: холодный старт (из CSV / из каталога) и повторный отчёт в том же воркере.
+Прежняя схема на больших базах меряется на --baseline-places заведениях и пересчитывается на --places.
+
+Пример:
+  python scripts/bench_block2_setup.py --rows 10000 100000 1000000 --places 20 --catalog
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def _norm(s: str) -> str:
+    return re.sub(r"\s+", " ", str(s or "").strip().lower().replace("ё", "е"))
+
+
+def find_menu_links_baseline(source_csv: str, place_name: str) -> tuple[list[str], list[str]]:
+    """_find_menu_links до индекса: полное чтение колонок и нормализация на каждое заведение."""
+    df = pd.read_csv(source_csv, usecols=["название", "меню_ссылки", "меню_типы"], low_memory=False)
+    df["_norm"] = df["название"].fillna("").map(_norm)
+    target = _norm(place_name)
+
+    row = df[df["_norm"] == target]
+    if len(row) == 0:
+        row = df[df["_norm"].str.contains(target, regex=False)]
+    if len(row) == 0:
+        return [], []
+
+    raw_links = str(row.iloc[0]["меню_ссылки"] or "")
+    raw_types = str(row.iloc[0]["меню_типы"] or "")
+
+    if not raw_links.strip() or raw_links == "nan":
+        return [], []
+
+    urls = [u.strip() for u in raw_links.split("|") if u.strip()]
+    types = [t.strip() for t in raw_types.split("|")] if raw_types.strip() and raw_types != "nan" else []
+
+    return urls, types
+
+
+def make_csv(path: Path, n_rows: int, seed: int = 0) -> list[str]:
+    """База: ~2.5 строки на название, у части строк нет меню. Возвращает уникальные названия."""
+    rng = np.random.default_rng(seed)
+    n_names = max(1, int(n_rows / 2.5))
+    ids = rng.integers(0, n_names, size=n_rows)
+    names = np.array([f"Кафе «Ёлка» {i}" if i % 7 == 0 else f"Ресторан  Заведение {i}" for i in range(n_names)])
+    has_menu = rng.random(n_rows) < 0.4
+    links = np.where(has_menu, [f"https://m.ru/{i}/a.pdf | https://m.ru/{i}/b.jpg" for i in ids], None)
+    types = np.where(has_menu, "pdf|img", None)
+    pd.DataFrame({
+        "название": names[ids],
+        "адрес": [f"ул. Тестовая, {i % 997}" for i in range(n_rows)],
+        "тип_заведения": rng.choice(["ресторан", "кафе", "бар"], size=n_rows),
+        "кухня": rng.choice(["русская", "европейская", "грузинская"], size=n_rows),
+        "описание": "Уютное место с авторской кухней",
+        "средний_чек": rng.integers(300, 8000, size=n_rows).astype(float),
+        "ссылка": [f"https://example.ru/{i}" for i in range(n_rows)],
+        "описание_полное": "Полное описание заведения",
+        "меню_ссылки": links,
+        "меню_названия": np.where(has_menu, "Основное|Бар", None),
+        "меню_типы": types,
+        "меню_количество": np.where(has_menu, 2.0, np.nan),
+    }).to_csv(path, index=False)
+    return list(np.unique(names[ids]))
+
+
+def report_places(names: list[str], n_places: int, seed: int = 0) -> list[str]:
+    """Заведения отчёта: точные названия, с другим регистром/пробелами, части названий, отсутствующие."""
+    rng = np.random.default_rng(seed)
+    picked = [names[k] for k in rng.integers(0, len(names), size=n_places)]
+    places = []
+    for k, name in enumerate(picked):
+        if k % 4 == 1:
+            name = f"  {name.upper()} "
+        elif k % 4 == 2:
+            name = name.split()[-1] if k % 8 == 2 else name[-8:]
+        elif k % 4 == 3 and k % 8 == 7:
+            name = f"Нет такого {k}"
+        places.append(name)
+    return places
+
+
+def _timed(fn) -> tuple[float, object]:
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Подготовка block2: ссылки на меню по заведениям отчёта")
+    p.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.add_argument("--places", type=int, default=20, help="Заведений в отчёте")
+    p.add_argument("--baseline-places", type=int, default=8, help="Сколько заведений мерить прежней схемой")
+    p.add_argument("--catalog", action="store_true", help="Дополнительно мерить холодный старт из каталога")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Каталог — во временной папке (переменная читается при импорте catalog)
+        os.environ["PLACE_CATALOG_DIR"] = str(Path(tmp) / "catalog")
+        from catalog import build_catalog
+        from restaurant_pipeline.blocks.block2_menu import run as block2
+
+        print(
+            f"{'rows':>9} {'baseline, s':>12} {'index csv, s':>13} {'index catalog, s':>17} "
+            f"{'warm job, ms':>13} {'speedup':>8}"
+        )
+        for n_rows in args.rows:
+            csv_path = Path(tmp) / f"places_{n_rows}.csv"
+            names = make_csv(csv_path, n_rows, seed=n_rows)
+            places = report_places(names, args.places, seed=n_rows)
+
+            # Прежняя схема: на часть заведений (заодно — эталон для паритета)
+            sample = places[:max(1, min(args.baseline_places, len(places)))]
+            t_base, expected = _timed(lambda: [find_menu_links_baseline(str(csv_path), name) for name in sample])
+            t_base *= len(places) / len(sample)
+
+            block2._MENU_LINKS.clear()
+            t_csv, index = _timed(lambda: [block2._load_menu_link_index(str(csv_path)).lookup(n) for n in places])
+            if index[:len(sample)] != expected:
+                print(f"FAIL: {n_rows} строк — ссылки не совпали с прежней схемой", file=sys.stderr)
+                return 1
+
+            t_catalog = float("nan")
+            if args.catalog:
+                build_catalog(str(csv_path))
+                block2._MENU_LINKS.clear()
+                t_catalog, from_catalog = _timed(
+                    lambda: [block2._load_menu_link_index(str(csv_path)).lookup(n) for n in places]
+                )
+                if from_catalog != index:
+                    print(f"FAIL: {n_rows} строк — каталог и CSV дали разные ссылки", file=sys.stderr)
+                    return 1
+
+            # Следующий отчёт в том же воркере: индекс уже в памяти
+            other = report_places(names, args.places, seed=n_rows + 1)
+            t_warm, _ = _timed(lambda: [block2._load_menu_link_index(str(csv_path)).lookup(n) for n in other])
+
+            best_cold = min(t_csv, t_catalog) if args.catalog else t_csv
+            print(
+                f"{n_rows:>9} {t_base:>12.2f} {t_csv:>13.2f} {t_catalog:>17.2f} "
+                f"{t_warm * 1000:>13.1f} {t_base / best_cold:>7.1f}x"
+            )
+    print("parity: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
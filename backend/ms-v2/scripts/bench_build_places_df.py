@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Паритет и бенчмарк схлопывания CSV по названию: эталонный groupby + Python-агрегаторы
+(_build_places_df_groupby) против векторного build_places_df.
+
+Проверяет, что результаты совпадают побайтно (to_csv) и по dtypes — на синтетике с краевыми
+случаями (NaN, пробелы, регистр, дубли значений, группы без непустых значений) и, если указан,
+на реальном CSV. Затем печатает время обеих версий.
+
+Пример:
+  python scripts/bench_build_places_df.py --rows 20000 200000 --csv /app/final_blyat_v3.csv
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from place_search import build_places_df  # noqa: E402
+
+TYPES = ["ресторан", "Кафе", " бар ", "премиум-ресторан", "кофейня", "", "  "]
+CUISINES = ["русская", "Авторская", "европейская ", "грузинская", "японская", ",", ""]
+
+
+def _build_places_df_groupby(raw_df: pd.DataFrame) -> pd.DataFrame:
+    """Эталонная (медленная) версия build_places_df: groupby + Python-агрегаторы на каждую группу."""
+    def agg_join(ser: pd.Series) -> str:
+        parts = ser.dropna().astype(str).str.strip()
+        uniq = set()
+        for v in parts:
+            for p in str(v).split(","):
+                if p.strip():
+                    uniq.add(p.strip().lower())
+        return ", ".join(sorted(uniq)) if uniq else ""
+
+    def first_val(ser: pd.Series):
+        for v in ser:
+            if pd.notna(v) and str(v).strip():
+                return v
+        return ser.iloc[0] if len(ser) else None
+
+    agg = {
+        "тип_заведения": lambda s: agg_join(s),
+        "кухня": lambda s: agg_join(s),
+        "описание": first_val,
+        "средний_чек": first_val,
+        "ссылка": first_val,
+        "адрес": first_val,
+        "описание_полное": first_val,
+        "меню_ссылки": first_val,
+        "меню_названия": first_val,
+        "меню_типы": first_val,
+        "меню_количество": first_val,
+    }
+    return raw_df.groupby("название", as_index=False).agg(agg)
+
+
+def make_raw(n_rows: int, n_names: int, seed: int = 0) -> pd.DataFrame:
+    """Сырые строки CSV: по несколько строк на название (филиалы, дубли источников)."""
+    rng = np.random.default_rng(seed)
+
+    def _maybe_nan(values: list, p: float) -> list:
+        return [np.nan if rng.random() < p else v for v in values]
+
+    def _joined(vocab: list[str]) -> list[str]:
+        ks = rng.integers(0, 4, size=n_rows)
+        return [",".join(rng.choice(vocab, size=k)) for k in ks]
+
+    names = [f"Заведение {i}" for i in rng.integers(0, n_names, size=n_rows)]
+    prices = rng.integers(300, 8000, size=n_rows).astype(float)
+    return pd.DataFrame({
+        "название": _maybe_nan(names, 0.01),
+        "тип_заведения": _maybe_nan(_joined(TYPES), 0.1),
+        "кухня": _maybe_nan(_joined(CUISINES), 0.1),
+        "описание": _maybe_nan([rng.choice(["", " ", "уютно", "шумно"]) for _ in range(n_rows)], 0.3),
+        "средний_чек": _maybe_nan(list(prices), 0.4),
+        "ссылка": _maybe_nan([f"https://example.ru/{i}" for i in range(n_rows)], 0.2),
+        "адрес": _maybe_nan([f"ул. Тестовая, {i % 97}" for i in range(n_rows)], 0.1),
+        "описание_полное": _maybe_nan([f"Описание {i % 13}" for i in range(n_rows)], 0.5),
+        "меню_ссылки": _maybe_nan(["https://m.ru/a.pdf|https://m.ru/b.pdf"] * n_rows, 0.7),
+        "меню_названия": _maybe_nan(["Основное|Бар"] * n_rows, 0.7),
+        "меню_типы": _maybe_nan(["pdf|pdf"] * n_rows, 0.7),
+        "меню_количество": _maybe_nan(list(rng.integers(0, 3, size=n_rows).astype(float)), 0.7),
+    })
+
+
+def check_parity(raw: pd.DataFrame, label: str) -> tuple[float, float]:
+    """Сравнивает обе версии; возвращает (время эталона, время векторной версии) в секундах."""
+    t0 = time.perf_counter()
+    expected = _build_places_df_groupby(raw)
+    t_ref = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    actual = build_places_df(raw)
+    t_vec = time.perf_counter() - t0
+
+    if list(expected.dtypes) != list(actual.dtypes):
+        raise AssertionError(f"{label}: dtypes differ\n{expected.dtypes}\n{actual.dtypes}")
+    pd.testing.assert_frame_equal(expected, actual, check_exact=True)
+    if expected.to_csv(index=False).encode("utf-8") != actual.to_csv(index=False).encode("utf-8"):
+        raise AssertionError(f"{label}: CSV bytes differ")
+    return t_ref, t_vec
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Паритет и бенчмарк build_places_df")
+    p.add_argument("--rows", type=int, nargs="+", default=[20_000, 200_000])
+    p.add_argument("--dup", type=float, default=2.5, help="Среднее число строк на одно название")
+    p.add_argument("--csv", type=Path, default=None, help="Дополнительно проверить на реальном CSV")
+    args = p.parse_args()
+
+    cases = [(f"synthetic {n}", make_raw(n, max(1, int(n / args.dup)), seed=n)) for n in args.rows]
+    if args.csv is not None:
+        cases.append((f"csv {args.csv.name}", pd.read_csv(args.csv)))
+
+    print(f"{'case':>24} {'rows':>9} {'groupby, s':>11} {'vector, s':>10} {'speedup':>8}")
+    for label, raw in cases:
+        t_ref, t_vec = check_parity(raw, label)
+        print(f"{label:>24} {len(raw):>9} {t_ref:>11.2f} {t_vec:>10.2f} {t_ref / t_vec:>7.1f}x")
+    print("parity: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Пиковая память растеризации меню в block2: потоковый конвейер страница → полоса → JPEG
+(_iter_menu_slices + _image_to_data_url) против прежней схемы «все страницы и полосы списком».
+
+Синтетический PDF (по умолчанию 100 страниц A3 с текстом и картинкой) растеризуется в отдельном
+подпроцессе для каждого режима; сравнивается прирост пикового RSS. Скрипт падает (код 1), если
+потоковый режим вышел за потолок BLOCK2_IMAGE_MEMORY_MB (+ запас на интерпретатор и PyMuPDF).
+Vision-модель не вызывается — меряется только подготовка изображений.
+
+Пример:
+  python scripts/bench_menu_memory.py --pages 100 --memory-mb 128
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def make_pdf(path: Path, n_pages: int) -> None:
+    """PDF: на каждой странице A3 — строки меню и шумная картинка (чтобы JPEG не был пустым)."""
+    import fitz
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    noise = Image.fromarray(rng.integers(0, 255, size=(600, 800, 3), dtype=np.uint8))
+    buf = io.BytesIO()
+    noise.save(buf, format="PNG")
+    picture = buf.getvalue()
+
+    doc = fitz.open()
+    for page_no in range(n_pages):
+        page = doc.new_page(width=842, height=1191)
+        page.insert_image(fitz.Rect(40, 600, 800, 1150), stream=picture)
+        for row in range(40):
+            page.insert_text((40, 40 + row * 14), f"Dish {page_no}-{row} ........ {100 + row * 10}", fontsize=10)
+    doc.save(str(path))
+    doc.close()
+
+
+def _peak_rss_mb() -> float:
+    # Linux: ru_maxrss в КБ
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child(mode: str, pdf_path: str) -> None:
+    """Подпроцесс: растеризация одним из способов, печать JSON с приростом пикового RSS."""
+    import fitz
+    from PIL import Image
+
+    from restaurant_pipeline.blocks.block2_menu import run as block2
+
+    file_bytes = Path(pdf_path).read_bytes()
+    # Прогрев импортов/PyMuPDF, чтобы в прирост не попала загрузка библиотек
+    warm = fitz.open(stream=file_bytes, filetype="pdf")
+    warm[0].get_pixmap(dpi=10)
+    warm.close()
+    base = _peak_rss_mb()
+
+    t0 = time.perf_counter()
+    n_slices = 0
+    encoded_bytes = 0
+    if mode == "stream":
+        for _, piece in block2._iter_menu_slices(file_bytes, ".pdf"):
+            encoded_bytes += len(block2._image_to_data_url(piece))
+            n_slices += 1
+    else:
+        # Прежняя схема: все страницы (через JPEG) → все полосы → все data URL в памяти
+        Image.MAX_IMAGE_PIXELS = 300_000_000
+        doc = fitz.open(stream=file_bytes, filetype="pdf")
+        pages = [Image.open(io.BytesIO(page.get_pixmap(dpi=block2._RENDER_DPI).tobytes("jpeg"))) for page in doc]
+        doc.close()
+        slices = [piece for page in pages for piece in block2._slice_tall_image(page)]
+        urls = [block2._image_to_data_url(piece) for piece in slices]
+        n_slices = len(slices)
+        encoded_bytes = sum(len(u) for u in urls)
+
+    print(json.dumps({
+        "mode": mode,
+        "slices": n_slices,
+        "encoded_mb": round(encoded_bytes / 2**20, 1),
+        "peak_delta_mb": round(_peak_rss_mb() - base, 1),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }))
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Пиковая память растеризации меню (block2)")
+    p.add_argument("--pages", type=int, default=100)
+    p.add_argument("--memory-mb", type=int, default=128, help="BLOCK2_IMAGE_MEMORY_MB для потокового режима")
+    p.add_argument("--slack-mb", type=int, default=64, help="Запас сверх потолка (аллокатор, буферы PyMuPDF)")
+    p.add_argument("--child", choices=["stream", "materialize"], help=argparse.SUPPRESS)
+    p.add_argument("--pdf", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        _child(args.child, args.pdf)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = Path(tmp) / "menu.pdf"
+        make_pdf(pdf_path, args.pages)
+        print(f"PDF: {args.pages} страниц, {pdf_path.stat().st_size / 2**20:.1f} МБ")
+
+        env = {**os.environ, "BLOCK2_IMAGE_MEMORY_MB": str(args.memory_mb)}
+        results = {}
+        for mode in ("stream", "materialize"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--pdf", str(pdf_path)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout.strip().splitlines()[-1]
+            results[mode] = json.loads(out)
+
+    print(f"{'mode':>12} {'slices':>7} {'jpeg, MB':>9} {'peak +RSS, MB':>14} {'time, s':>8}")
+    for mode, r in results.items():
+        print(f"{mode:>12} {r['slices']:>7} {r['encoded_mb']:>9} {r['peak_delta_mb']:>14} {r['seconds']:>8}")
+
+    limit = args.memory_mb + args.slack_mb
+    if results["stream"]["peak_delta_mb"] > limit:
+        print(f"FAIL: потоковый режим превысил {limit} МБ", file=sys.stderr)
+        return 1
+    print(f"OK: потоковый режим в пределах {limit} МБ")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+CPU-инференс через PyTorch против ONNX Runtime (int8, onnx_backend.py) для обеих моделей
+pipeline: энкодера описаний (PlaceSearch._get_model, rubert-mini-frida) и модели тональности
+отзывов (block3 sentiment.py, rubert-tiny2).
+
+Каждый бэкенд запускается в отдельном подпроцессе (INFERENCE_BACKEND=torch / onnx) через те же
+функции, что и pipeline; меряются загрузка модели, тональность --reviews отзывов, кодирование
+--docs описаний, задержка одного запроса (p50) и прирост пикового RSS. Затем сверка:
+доля совпавших меток тональности и косинус между эмбеддингами PyTorch и ONNX (средний и худший).
+Скрипт падает (код 1), если метки совпали реже --min-agreement или худший косинус ниже --min-cosine.
+При первом запуске ONNX-модели экспортируются в ONNX_MODEL_DIR (нужны torch и onnxruntime).
+
+Пример:
+  python scripts/bench_onnx.py --reviews 1000 --docs 2000 --queries 50
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from bench_sentiment import make_reviews  # noqa: E402  (соседний скрипт)
+
+
+def _peak_rss_mb() -> float:
+    # Linux: ru_maxrss в КБ
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child(backend: str, out_dir: str, n_reviews: int, n_docs: int, n_queries: int) -> None:
+    """Подпроцесс одного бэкенда: замеры в JSON (stdout), метки и эмбеддинги — в out_dir."""
+    import pandas as pd
+
+    from place_search import PlaceSearch
+    from restaurant_pipeline.blocks.block3_reviews import sentiment
+
+    reviews = make_reviews(n_reviews, seed=0)
+    docs = make_reviews(n_docs, seed=1)
+    queries = make_reviews(n_queries, seed=2)
+    base = _peak_rss_mb()
+
+    t0 = time.perf_counter()
+    model, _ = sentiment._get_model_and_tokenizer()
+    engine = PlaceSearch(pd.DataFrame({
+        "тип_заведения": ["ресторан"], "средний_чек": [1000.0], "кухня": ["русская"], "описание_полное": ["тест"],
+    }))
+    encoder = engine._get_model()
+    if encoder is None:
+        raise RuntimeError("энкодер не загрузился")
+    t_load = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    labels = sentiment.predict_sentiment(reviews)
+    t_sentiment = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    doc_embs = encoder.encode(docs, normalize_embeddings=True, prompt_name="document", show_progress_bar=False)
+    t_docs = time.perf_counter() - t0
+
+    query_ms = []
+    query_embs = []
+    for q in queries:
+        t0 = time.perf_counter()
+        query_embs.append(encoder.encode([q], normalize_embeddings=True, prompt_name="query")[0])
+        query_ms.append((time.perf_counter() - t0) * 1000)
+
+    np.save(os.path.join(out_dir, f"{backend}_labels.npy"), np.asarray(labels, dtype=np.int8))
+    np.save(os.path.join(out_dir, f"{backend}_docs.npy"), np.asarray(doc_embs, dtype=np.float32))
+    np.save(os.path.join(out_dir, f"{backend}_queries.npy"), np.asarray(query_embs, dtype=np.float32))
+    print(json.dumps({
+        "backend": backend,
+        "sentiment_model": type(model).__name__,
+        "encoder": type(encoder).__name__,
+        "load_s": round(t_load, 2),
+        "reviews_per_s": round(len(reviews) / t_sentiment, 1),
+        "docs_per_s": round(len(docs) / t_docs, 1),
+        "query_p50_ms": round(float(np.median(query_ms)), 2),
+        "peak_delta_mb": round(_peak_rss_mb() - base, 1),
+    }))
+
+
+def _row_cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a * b).sum(axis=1) / np.maximum(np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1), 1e-12)
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="PyTorch против ONNX Runtime (int8): сверка и замеры")
+    p.add_argument("--reviews", type=int, default=1000)
+    p.add_argument("--docs", type=int, default=2000, help="Описаний заведений для кодирования")
+    p.add_argument("--queries", type=int, default=50, help="Одиночных запросов (задержка p50)")
+    p.add_argument("--min-agreement", type=float, default=0.97, help="Минимальная доля совпавших меток")
+    p.add_argument("--min-cosine", type=float, default=0.97, help="Минимальный косинус PyTorch/ONNX")
+    p.add_argument("--child", choices=["torch", "onnx"], help=argparse.SUPPRESS)
+    p.add_argument("--out", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        _child(args.child, args.out, args.reviews, args.docs, args.queries)
+        return 0
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in ("torch", "onnx"):
+            env = {**os.environ, "INFERENCE_BACKEND": backend}
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", backend, "--out", tmp,
+                 "--reviews", str(args.reviews), "--docs", str(args.docs), "--queries", str(args.queries)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout.strip().splitlines()[-1]
+            results[backend] = json.loads(out)
+        labels = {b: np.load(os.path.join(tmp, f"{b}_labels.npy")) for b in results}
+        docs = {b: np.load(os.path.join(tmp, f"{b}_docs.npy")) for b in results}
+        queries = {b: np.load(os.path.join(tmp, f"{b}_queries.npy")) for b in results}
+
+    if results["onnx"]["encoder"] != "OnnxSentenceEncoder" or results["onnx"]["sentiment_model"] != "OnnxSequenceClassifier":
+        print("FAIL: ONNX-бэкенд не загрузился (pipeline откатился на PyTorch)", file=sys.stderr)
+        return 1
+
+    print(f"{'backend':>8} {'load, s':>8} {'reviews/s':>10} {'docs/s':>8} {'query p50, ms':>14} {'peak +RSS, MB':>14}")
+    for backend, r in results.items():
+        print(
+            f"{backend:>8} {r['load_s']:>8} {r['reviews_per_s']:>10} {r['docs_per_s']:>8} "
+            f"{r['query_p50_ms']:>14} {r['peak_delta_mb']:>14}"
+        )
+
+    agreement = float((labels["torch"] == labels["onnx"]).mean())
+    cosine = np.concatenate([_row_cosine(docs["torch"], docs["onnx"]), _row_cosine(queries["torch"], queries["onnx"])])
+    print(
+        f"метки тональности совпали: {agreement:.2%}; косинус эмбеддингов PyTorch/ONNX: "
+        f"средний {cosine.mean():.4f}, худший {cosine.min():.4f}"
+    )
+    if agreement < args.min_agreement or cosine.min() < args.min_cosine:
+        print(f"FAIL: расхождение выше допустимого (метки ≥ {args.min_agreement:.0%}, косинус ≥ {args.min_cosine})",
+              file=sys.stderr)
+        return 1
+    print("parity: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
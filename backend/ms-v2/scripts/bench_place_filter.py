@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк фильтра PlaceSearch: построчный _filter_mask (apply + split) против
+_FilterIndex (битовые матрицы типов/кухонь) на синтетических заведениях.
+
+Для каждого размера проверяет, что маски совпадают, и печатает задержку фильтра.
+
+Пример:
+  python scripts/bench_place_filter.py --sizes 10000 100000 1000000 --repeat 5
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from place_search import PRICE_MARGIN, _FilterIndex, _normalize_set, _split_set  # noqa: E402
+
+TYPES = [
+    "ресторан", "кафе", "бар", "премиум-ресторан", "семейный ресторан", "кофейня", "паб",
+    "лаунж", "гастробар", "винотека", "стейк-хаус", "пиццерия", "антикафе", "фастфуд",
+]
+CUISINES = [
+    "русская", "авторская", "европейская", "итальянская", "грузинская", "японская", "китайская",
+    "паназиатская", "французская", "американская", "узбекская", "средиземноморская", "мексиканская",
+    "индийская", "тайская", "корейская", "вьетнамская", "испанская", "армянская", "азербайджанская",
+]
+
+QUERIES = [
+    {"types": ["ресторан"], "cuisines": ["русская"], "price_min": 2000, "price_max": 5000},
+    {"types": ["бар", "паб", "гастробар"], "cuisines": None, "price_min": None, "price_max": 2500},
+    {"types": ["кафе"], "cuisines": ["грузинская", "европейская"], "price_min": 800, "price_max": None},
+    {"types": None, "cuisines": ["японская"], "price_min": None, "price_max": None},
+]
+
+
+def _filter_mask(
+    df: pd.DataFrame,
+    types: Optional[list[str]] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    cuisines: Optional[list[str]] = None,
+) -> np.ndarray:
+    """
+    Эталонный построчный фильтр (прежняя версия PlaceSearch).
+    Одно логическое условие: (тип ∨ …) И (цена в диапазоне) И (все кухни из запроса есть у заведения).
+    Тип: любое совпадение из списка; цена: средний_чек в [min, max]; кухня: все из запроса должны быть в ответе.
+    Возвращает булеву маску по строкам df.
+    """
+    want_types = _normalize_set(types)
+    want_cuisines = _normalize_set(cuisines)
+
+    mask_type = (
+        df["тип_заведения"].apply(lambda x: bool(_split_set(x) & want_types))
+        if want_types
+        else pd.Series(True, index=df.index)
+    )
+    mask_price = pd.Series(True, index=df.index)
+    if price_min is not None:
+        soft_min = price_min * (1 - PRICE_MARGIN)
+        mask_price &= (df["средний_чек"] >= soft_min) | df["средний_чек"].isna()
+    if price_max is not None:
+        soft_max = price_max * (1 + PRICE_MARGIN)
+        mask_price &= (df["средний_чек"] <= soft_max) | df["средний_чек"].isna()
+    # Все кухни из запроса должны быть у заведения (AND)
+    mask_cuisine = (
+        df["кухня"].apply(lambda x: want_cuisines.issubset(_split_set(x)))
+        if want_cuisines
+        else pd.Series(True, index=df.index)
+    )
+
+    return (mask_type & mask_price & mask_cuisine).to_numpy(dtype=bool)
+
+
+def make_places(n: int, seed: int = 0) -> pd.DataFrame:
+    """Синтетические заведения: 1–3 типа и 1–4 кухни через запятую, средний чек с пропусками."""
+    rng = np.random.default_rng(seed)
+
+    def _joined(vocab: list[str], max_k: int) -> list[str]:
+        ks = rng.integers(1, max_k + 1, size=n)
+        picks = rng.integers(0, len(vocab), size=(n, max_k))
+        return [", ".join(vocab[j] for j in picks[i, :k]) for i, k in enumerate(ks)]
+
+    prices = rng.integers(300, 10000, size=n).astype(float)
+    prices[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        "тип_заведения": _joined(TYPES, 3),
+        "кухня": _joined(CUISINES, 4),
+        "средний_чек": prices,
+    })
+
+
+def _best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Бенчмарк фильтра тип/кухня/цена")
+    p.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.add_argument("--repeat", type=int, default=3, help="Повторов на запрос (берём лучший)")
+    p.add_argument(
+        "--legacy-max",
+        type=int,
+        default=1_000_000,
+        help="Не запускать построчный фильтр для размеров больше этого (он медленный)",
+    )
+    args = p.parse_args()
+
+    print(f"{'places':>10} {'build, ms':>10} {'legacy, ms':>11} {'vector, ms':>11} {'speedup':>8}")
+    for n in args.sizes:
+        df = make_places(n)
+        t0 = time.perf_counter()
+        index = _FilterIndex(df)
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        legacy_total = 0.0
+        vector_total = 0.0
+        run_legacy = n <= args.legacy_max
+        for q in QUERIES:
+            vector_total += _best_ms(lambda: index.mask(**q), args.repeat)
+            if run_legacy:
+                legacy_total += _best_ms(lambda: _filter_mask(df, **q), 1)
+                if not np.array_equal(index.mask(**q), _filter_mask(df, **q)):
+                    print(f"MISMATCH: n={n} query={q}")
+                    return 1
+
+        vector_ms = vector_total / len(QUERIES)
+        if run_legacy:
+            legacy_ms = legacy_total / len(QUERIES)
+            print(f"{n:>10} {build_ms:>10.1f} {legacy_ms:>11.1f} {vector_ms:>11.2f} {legacy_ms / vector_ms:>7.0f}x")
+        else:
+            print(f"{n:>10} {build_ms:>10.1f} {'—':>11} {vector_ms:>11.2f} {'—':>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
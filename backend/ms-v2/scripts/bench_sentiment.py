@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Тональность отзывов block3: прежняя схема (from_pretrained на каждый вызов, батчи по 32 подряд
+с паддингом до самого длинного, torch.no_grad) против модели процесса с батчами по длине
+(sentiment.predict_sentiment: сортировка по токенам, бюджет батча, inference_mode, потоки).
+
+Синтетические отзывы разной длины (от «Вкусно!» до длинных текстов, упирающихся в 256 токенов)
+прогоняются --jobs раз — как несколько задач подряд в одном воркере. Сначала проверяется, что
+метки совпадают, затем печатается скорость (отзывов/с) первой задачи и следующих.
+Нужны transformers и torch; модель скачивается с Hugging Face при первом запуске.
+
+Пример:
+  python scripts/bench_sentiment.py --reviews 1000 --jobs 3
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+_PHRASES = [
+    "Очень вкусно, обязательно вернёмся", "Официант долго не подходил", "Цены выше среднего",
+    "Уютный зал и приятная музыка", "Стейк пережарили, пришлось ждать замену", "Порции маленькие",
+    "Отличная винная карта", "Грязные столы и громкая компания рядом", "Десерты просто супер",
+    "Обычное место, ничего особенного", "Персонал вежливый, кухня на высоте", "Кофе остыл",
+]
+
+
+def make_reviews(n: int, seed: int = 0) -> list[str]:
+    """Отзывы: в основном короткие (1–3 фразы), часть длинных; немного пустых и из 1–2 символов."""
+    rng = np.random.default_rng(seed)
+    n_phrases = np.clip(rng.lognormal(mean=0.8, sigma=1.0, size=n).astype(int), 1, 60)
+    reviews = []
+    for k, m in enumerate(n_phrases):
+        if k % 50 == 0:
+            reviews.append("" if k % 100 == 0 else "ок")
+            continue
+        reviews.append(". ".join(_PHRASES[j] for j in rng.integers(0, len(_PHRASES), size=m)) + ".")
+    return reviews
+
+
+def predict_sentiment_baseline(texts: list[str], batch_size: int = 32) -> list[int]:
+    """predict_sentiment до модели процесса: загрузка модели на вызов, батчи подряд по batch_size."""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    from restaurant_pipeline.blocks.block3_reviews import sentiment
+
+    tokenizer = AutoTokenizer.from_pretrained(sentiment._MODEL_ID)
+    model = AutoModelForSequenceClassification.from_pretrained(sentiment._MODEL_ID)
+    model.eval()
+    results = [0] * len(texts)
+    for i in range(0, len(texts), batch_size):
+        batch_clean, batch_positions = [], []
+        for j, t in enumerate(texts[i:i + batch_size]):
+            s = str(t or "").strip()
+            if len(s) >= 3:
+                batch_clean.append(s)
+                batch_positions.append(i + j)
+        if not batch_clean:
+            continue
+        enc = tokenizer(batch_clean, padding=True, truncation=True, max_length=sentiment._MAX_LENGTH,
+                        return_tensors="pt")
+        with torch.no_grad():
+            preds = model(**enc).logits.argmax(dim=1).tolist()
+        for pos, pred in zip(batch_positions, preds):
+            results[pos] = sentiment._LABEL_TO_SENTIMENT.get(pred, 0)
+    return results
+
+
+def _timed(fn) -> tuple[float, object]:
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Тональность отзывов block3: отзывов/с до и после")
+    p.add_argument("--reviews", type=int, default=1000, help="Отзывов в одной задаче")
+    p.add_argument("--jobs", type=int, default=3, help="Задач подряд в одном процессе")
+    p.add_argument("--max-mismatch", type=float, default=0.005, help="Допустимая доля несовпавших меток")
+    args = p.parse_args()
+
+    import torch
+
+    from restaurant_pipeline.blocks.block3_reviews import sentiment
+
+    reviews = make_reviews(args.reviews)
+    # Прежняя схема работала с потоками torch по умолчанию
+    default_threads = torch.get_num_threads()
+    base_times, new_times = [], []
+    expected = actual = None
+    for _ in range(args.jobs):
+        torch.set_num_threads(default_threads)
+        t, expected = _timed(lambda: predict_sentiment_baseline(reviews))
+        base_times.append(t)
+    for _ in range(args.jobs):
+        t, actual = _timed(lambda: sentiment.predict_sentiment(reviews))
+        new_times.append(t)
+
+    mismatch = sum(a != b for a, b in zip(expected, actual)) / len(reviews)
+    print(f"отзывов: {len(reviews)}, потоков: {default_threads} → {torch.get_num_threads()}, "
+          f"несовпавших меток: {mismatch:.2%}")
+    if mismatch > args.max_mismatch:
+        print(f"FAIL: метки расходятся больше чем на {args.max_mismatch:.2%}", file=sys.stderr)
+        return 1
+
+    print(f"{'job':>4} {'baseline, rev/s':>16} {'resident+buckets, rev/s':>24} {'speedup':>8}")
+    for k, (tb, tn) in enumerate(zip(base_times, new_times), start=1):
+        print(f"{k:>4} {len(reviews) / tb:>16.1f} {len(reviews) / tn:>24.1f} {tb / tn:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
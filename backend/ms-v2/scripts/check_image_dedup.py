@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Проверка перцептивной дедупликации полос меню (image_hash.py) на синтетической странице:
+страница 1240 px с позициями мелким шрифтом и та же страница со сменёнными ценами.
+
+Ожидается:
+  - та же страница (и её перекодированный JPEG) в том же файле — повтор, позиции берутся у первой;
+  - страница с другими ценами — не повтор, даже в том же файле;
+  - та же страница в другом файле (другое заведение, другая ссылка) — не ищется.
+Код возврата 1, если хоть одна проверка не прошла.
+
+Пример:
+  python scripts/check_image_dedup.py --dishes 40 --font-size 18
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import sys
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from restaurant_pipeline.blocks.block2_menu.image_hash import ImageHashStore, fingerprint  # noqa: E402
+
+
+def _render_page(prices: list[int], font_size: int, width: int = 1240, height: int = 1754) -> Image.Image:
+    page = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=font_size)
+    for i, price in enumerate(prices):
+        y = 60 + i * (font_size + 22)
+        draw.text((80, y), f"Блюдо номер {i + 1} с соусом", fill="black", font=font)
+        draw.text((width - 240, y), f"{price} ₽", fill="black", font=font)
+    return page
+
+
+def _jpeg(image: Image.Image, quality: int) -> Image.Image:
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", quality=quality)
+    return Image.open(io.BytesIO(buf.getvalue())).convert("RGB")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--dishes", type=int, default=40)
+    ap.add_argument("--font-size", type=int, default=18)
+    ap.add_argument("--jpeg-quality", type=int, default=85)
+    args = ap.parse_args()
+
+    prices = [350 + 10 * (i % 7) for i in range(args.dishes)]
+    prices[0], prices[1 % args.dishes] = 350, 400
+    changed = list(prices)
+    changed[0], changed[1 % args.dishes] = 390, 450
+    items = [{"name": f"Блюдо номер {i + 1} с соусом", "price": p} for i, p in enumerate(prices)]
+
+    page = _render_page(prices, args.font_size)
+    store = ImageHashStore()
+    same_file = store.file_scope()
+    same_file.put(fingerprint(page), items)
+
+    checks = [
+        ("та же страница, тот же файл → повтор", same_file, page, True),
+        (f"JPEG q={args.jpeg_quality}, тот же файл → повтор", same_file, _jpeg(page, args.jpeg_quality), True),
+        ("другие цены, тот же файл → не повтор", same_file, _render_page(changed, args.font_size), False),
+        ("та же страница, другой файл → не ищется", store.file_scope(), page, False),
+    ]
+    ok = True
+    for title, scope, image, expect_hit in checks:
+        found = scope.find(fingerprint(image))
+        passed = (found is not None) == expect_hit and (found is None or found == items)
+        ok &= passed
+        print(f"{'OK  ' if passed else 'FAIL'} {title}" + (f" (цена первой позиции: {found[0]['price']})" if found else ""))
+    print(f"Счётчики: {store.stats_snapshot()}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Локальная подмена Яндекс Карт для проверки parse_yandex_reviews.py (в том числе --workers N)
+без запросов к Яндексу: поиск и страницы отзывов отдаются из сохранённых HTML.
+
+  /maps/?text=<запрос>          — выдача со ссылкой /maps/org/<slug>/<org_id>/ на заведение, название
+                                  которого входит в запрос (без учёта регистра и «ё»); иначе — «Ничего не нашлось»;
+  /maps/org/<org_id>/reviews/   — сохранённая страница отзывов: <pages>/<org_id>.html или --default-page.
+
+Заведения и org_id — из --csv (колонка «название»; org_id по порядку строк, с --first-org-id) и/или
+--orgs (JSON {"название": org_id}). Страницы отзывов сохраняются парсером:
+  python parse_yandex_reviews.py --csv ... --limit 1 --save-page page.html
+По завершении (Ctrl+C или SIGTERM) печатается число запросов, пиковая параллельность и минимальный интервал
+между запросами — так видно, что общий интервал (YANDEX_POLITE_INTERVAL) соблюдается всеми драйверами.
+
+Пример:
+  python scripts/yandex_standin_server.py --csv block3_parser_input.csv --default-page page.html --port 8090
+  YANDEX_MAPS_URL=http://127.0.0.1:8090/maps python parse_yandex_reviews.py \\
+      --csv block3_parser_input.csv --output reviews.json --workers 4
+"""
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import re
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+_REVIEWS_PATH = re.compile(r"^/maps/org/(?:[^/]+/)*(\d+)/reviews/?$")
+
+
+def _norm(s: str) -> str:
+    return re.sub(r"\s+", " ", str(s or "").strip().lower().replace("ё", "е"))
+
+
+def load_orgs(csv_path: str | None, orgs_path: str | None, first_org_id: int) -> dict[str, int]:
+    """Нормализованное название → org_id."""
+    orgs: dict[str, int] = {}
+    if csv_path:
+        import pandas as pd
+
+        names = pd.read_csv(csv_path, usecols=["название"])["название"].fillna("").astype(str)
+        for k, name in enumerate(names):
+            if _norm(name):
+                orgs.setdefault(_norm(name), first_org_id + k)
+    if orgs_path:
+        with open(orgs_path, "r", encoding="utf-8") as f:
+            orgs.update({_norm(name): int(org_id) for name, org_id in json.load(f).items()})
+    return orgs
+
+
+class _Stats:
+    """Запросы к подмене: число, пиковая параллельность, минимальный интервал между началами."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+        self.last_at: float | None = None
+        self.min_gap: float | None = None
+
+    def begin(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            if self.last_at is not None:
+                gap = now - self.last_at
+                self.min_gap = gap if self.min_gap is None else min(self.min_gap, gap)
+            self.last_at = now
+            self.requests += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    def end(self) -> None:
+        with self.lock:
+            self.active -= 1
+
+
+def make_handler(orgs: dict[str, int], pages_dir: Path | None, default_page: bytes | None,
+                 delay: float, stats: _Stats):
+    # Длинные названия первыми: «Кафе Пушкин» не должно совпасть с «Пушкин»
+    by_length = sorted(orgs.items(), key=lambda item: -len(item[0]))
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: bytes) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):  # noqa: N802
+            stats.begin()
+            try:
+                if delay:
+                    time.sleep(delay)
+                url = urlsplit(self.path)
+                if url.path.rstrip("/") == "/maps":
+                    self._send(200, self._search(parse_qs(url.query).get("text", [""])[0]))
+                    return
+                m = _REVIEWS_PATH.match(url.path)
+                if m:
+                    page = self._reviews(m.group(1))
+                    if page is not None:
+                        self._send(200, page)
+                        return
+                self._send(404, b"<html><body><h1>404</h1></body></html>")
+            finally:
+                stats.end()
+
+        def _search(self, query: str) -> bytes:
+            q = _norm(query)
+            links = [
+                f'<li><a href="/maps/org/standin/{org_id}/">{html.escape(name)}</a></li>'
+                for name, org_id in by_length
+                if name in q
+            ][:1]
+            if not links:
+                return "<html><body><p>Ничего не нашлось</p></body></html>".encode("utf-8")
+            return f"<html><body><ul>{''.join(links)}</ul></body></html>".encode("utf-8")
+
+        def _reviews(self, org_id: str) -> bytes | None:
+            if pages_dir is not None:
+                path = pages_dir / f"{org_id}.html"
+                if path.is_file():
+                    return path.read_bytes()
+            return default_page
+
+        def log_message(self, format, *args):  # noqa: A002
+            return
+
+    return Handler
+
+
+def _stop(*_args) -> None:
+    raise KeyboardInterrupt
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Локальная подмена Яндекс Карт (поиск + сохранённые страницы отзывов)")
+    p.add_argument("--csv", help="CSV с колонкой «название» (org_id — по порядку строк)")
+    p.add_argument("--orgs", help='JSON {"название": org_id}')
+    p.add_argument("--first-org-id", type=int, default=1_000_000)
+    p.add_argument("--pages", help="Папка с сохранёнными страницами отзывов <org_id>.html")
+    p.add_argument("--default-page", help="Страница отзывов для org_id без своей страницы")
+    p.add_argument("--delay", type=float, default=0.0, help="Задержка ответа, с (имитация сети)")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8090)
+    args = p.parse_args()
+
+    orgs = load_orgs(args.csv, args.orgs, args.first_org_id)
+    if not orgs:
+        print("Нет заведений: укажите --csv и/или --orgs", file=sys.stderr)
+        return 1
+    pages_dir = Path(args.pages) if args.pages else None
+    default_page = Path(args.default_page).read_bytes() if args.default_page else None
+    if pages_dir is None and default_page is None:
+        print("Нет страниц отзывов: укажите --pages и/или --default-page", file=sys.stderr)
+        return 1
+
+    stats = _Stats()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(orgs, pages_dir, default_page, args.delay, stats))
+    print(f"Подмена Яндекс Карт: http://{args.host}:{args.port}/maps ({len(orgs)} заведений)", flush=True)
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    min_gap = f"{stats.min_gap:.2f} с" if stats.min_gap is not None else "—"
+    print(f"Запросов: {stats.requests}, пиковая параллельность: {stats.peak_active}, минимальный интервал: {min_gap}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -10,17 +10,21 @@
 
 from __future__ import annotations
 
-from typing import Any, Optional, Union
+from typing import TYPE_CHECKING, Any, Optional, Union
 
 # Для type hint
 import pandas as pd
 
+if TYPE_CHECKING:
+    from place_search import PlaceSearch
+
 
 def search_unified(
     df: pd.DataFrame,
     query_or_text: Union[dict[str, Any], str],
     n: int = 5,
     api_key: Optional[str] = None,
+    engine: Optional["PlaceSearch"] = None,
 ) -> list[dict[str, Any]]:
     """
     Единая точка входа: либо готовые фильтры (dict), либо свободный текст (название/адрес).
@@ -28,6 +32,8 @@ def search_unified(
     - query_or_text: dict с ключами types, cuisines, price_min, price_max, особенности — используем как есть.
     - query_or_text: str — запрос в Perplexity, получаем поля для фильтров, затем поиск.
 
+    engine: загруженный PlaceSearch над df (переиспользует энкодер и индекс эмбеддингов).
+
     Возвращает топ-n заведений (по умолчанию 5).
     """
     from place_search import search_places
@@ -38,11 +44,12 @@ def search_unified(
         text = query_or_text.strip()
         if not text:
             return []
-        available_cuisines = get_available_cuisines(df)
+        # У движка словарь кухонь уже посчитан при загрузке датасета
+        available_cuisines = engine.available_cuisines() if engine is not None else get_available_cuisines(df)
         query = query_from_perplexity(text, available_cuisines=available_cuisines, api_key=api_key)
     else:
         query = dict(query_or_text)
         # Убедиться, что n из аргумента, а не из query
         query.pop("n", None)
 
-    return search_places(df, query, n=n)
+    return search_places(df, query, n=n, engine=engine)
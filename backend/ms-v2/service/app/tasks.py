@@ -6,16 +6,54 @@ import sys
 from pathlib import Path
 
 import redis as redis_lib
+from celery.signals import worker_process_init
 
 from .celery_app import celery_app, REDIS_URL
 
 PROJECT_ROOT = Path(os.getenv("PROJECT_ROOT", "/app"))
 JOBS_DIR = PROJECT_ROOT / "jobs"
 SOURCE_CSV = Path(os.getenv("SOURCE_CSV", str(PROJECT_ROOT / "final_blyat_v3.csv")))
+# Прогрев поискового движка при старте процесса воркера (0 — отключить)
+PLACE_SEARCH_WARMUP = os.getenv("PLACE_SEARCH_WARMUP", "1") != "0"
+# Загрузка модели тональности (block3) при старте процесса воркера (0 — отключить)
+SENTIMENT_WARMUP = os.getenv("SENTIMENT_WARMUP", "1") != "0"
 
 _redis = redis_lib.from_url(REDIS_URL, decode_responses=True)
 
 
+@worker_process_init.connect
+def _warm_up_place_search(**_kwargs) -> None:
+    """
+    Загружает датафрейм, энкодер и индекс эмбеддингов один раз на процесс воркера.
+    Задачи берут тёплый движок через place_search.get_place_search (перезагрузка — при смене CSV).
+    """
+    if not PLACE_SEARCH_WARMUP or not SOURCE_CSV.exists():
+        return
+    if str(PROJECT_ROOT) not in sys.path:
+        sys.path.insert(0, str(PROJECT_ROOT))
+    try:
+        from place_search import warm_up_place_search
+        warm_up_place_search(str(SOURCE_CSV), collapse=True)
+        print(f"[worker] PlaceSearch прогрет: {SOURCE_CSV}", flush=True)
+    except Exception as e:
+        print(f"[worker] Не удалось прогреть PlaceSearch: {e}", flush=True)
+
+
+@worker_process_init.connect
+def _warm_up_sentiment(**_kwargs) -> None:
+    """Модель тональности block3 загружается один раз на процесс воркера и остаётся в памяти."""
+    if not SENTIMENT_WARMUP:
+        return
+    if str(PROJECT_ROOT) not in sys.path:
+        sys.path.insert(0, str(PROJECT_ROOT))
+    try:
+        from restaurant_pipeline.blocks.block3_reviews.sentiment import warm_up
+        warm_up()
+        print("[worker] Модель тональности загружена", flush=True)
+    except Exception as e:
+        print(f"[worker] Не удалось загрузить модель тональности: {e}", flush=True)
+
+
 @celery_app.task(bind=True)
 def run_pipeline(self, input_request: dict):
     job_id = self.request.id
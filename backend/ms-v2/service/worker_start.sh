@@ -8,6 +8,11 @@ export DISPLAY=:99
 
 echo "[worker] Xvfb запущен на DISPLAY=:99"
 
+# Колоночный каталог из CSV (Parquet): блоки читают только нужные колонки, без парсинга CSV.
+# Если каталог уже свежий — команда ничего не пересобирает; при ошибке блоки читают CSV напрямую.
+python catalog.py build-catalog --csv "${SOURCE_CSV:-/app/final_blyat_v3.csv}" \
+    || echo "[worker] build-catalog не удался — работаем с CSV"
+
 exec celery -A service.app.celery_app.celery_app worker \
     --loglevel=info \
     --concurrency="${CELERY_CONCURRENCY:-2}"
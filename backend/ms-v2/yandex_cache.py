@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+Локальные кэши парсера отзывов Яндекс Карт (SQLite): org_id заведений и уже собранные отзывы.
+
+OrgIdCache — нормализованные название + адрес → org_id. org_id организации практически
+не меняется, поэтому найденный org_id хранится долго (YANDEX_ORG_CACHE_TTL_DAYS) и при попадании
+поиск в браузере не запускается вовсе. «Не найдено» тоже запоминается, но на короткий срок
+(YANDEX_ORG_CACHE_NEGATIVE_DAYS): заведение могли добавить в Карты позже. Запоминается только
+загрузившаяся пустая выдача — таймаут или капча в кэш не попадают. Если страница отзывов
+по org_id из кэша не открылась, запись удаляется (forget) и в следующий раз заведение ищется заново.
+Заполнить кэш для всей базы заранее: python parse_yandex_reviews.py --csv <база> --resolve-only.
+
+ReviewStore — отзывы по org_id с датой и хэшем содержимого. Парсер сортирует отзывы по новизне
+и перестаёт скроллить, дойдя до уже известного отзыва; свежие отзывы дописываются в хранилище
+(изменённый текст — обновляется по хэшу), а в результат (и в block3) идёт объединённый набор.
+По заведению хранится не больше YANDEX_REVIEW_STORE_MAX_PER_ORG самых новых отзывов (лишние
+удаляются при записи). Раз в YANDEX_REVIEW_STORE_TTL_DAYS заведение парсится целиком заново, и его
+сохранённые отзывы заменяются свежими — удалённые на Картах отзывы не живут в хранилище вечно.
+
+Настройки (env):
+  YANDEX_ORG_CACHE=0                 — выключить кэш org_id;
+  YANDEX_ORG_CACHE_PATH              — путь к файлу SQLite (по умолчанию <project>/cache/yandex_org_id.sqlite);
+  YANDEX_ORG_CACHE_TTL_DAYS          — сколько дней доверять найденному org_id (по умолчанию 365);
+  YANDEX_ORG_CACHE_NEGATIVE_DAYS     — сколько дней помнить «не найдено» (по умолчанию 7);
+  YANDEX_REVIEW_STORE=0              — выключить хранилище отзывов (каждый раз полный парсинг);
+  YANDEX_REVIEW_STORE_PATH           — путь к файлу SQLite (по умолчанию <project>/cache/yandex_reviews.sqlite);
+  YANDEX_REVIEW_STORE_MAX_PER_ORG    — сколько самых новых отзывов хранить по заведению (по умолчанию 150,
+                                       MAX_REVIEWS_PER_PLACE парсера с запасом);
+  YANDEX_REVIEW_STORE_TTL_DAYS       — через сколько дней парсить заведение целиком заново (по умолчанию 30).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from catalog import normalize_text
+
+_DAY = 86400.0
+
+# Результаты lookup
+ORG_HIT = "hit"
+ORG_NOT_FOUND = "not_found"
+ORG_MISS = "miss"
+
+
+def org_cache_key(name: str, address: str) -> str:
+    """Ключ кэша: нормализованные название и адрес (те же правила, что при матчинге по базе)."""
+    return f"{normalize_text(name)}|{normalize_text(address)}"
+
+
+class OrgIdCache:
+    """
+    Кэш org_id + счётчики за один прогон (hits / negative_hits / misses / writes / forgotten / errors).
+    Потокобезопасен: заведения ищутся из нескольких потоков (--workers).
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_days: Optional[float] = None,
+        negative_days: Optional[float] = None,
+    ):
+        self.path = path or os.environ.get("YANDEX_ORG_CACHE_PATH") or str(
+            Path(__file__).resolve().parent / "cache" / "yandex_org_id.sqlite"
+        )
+        if ttl_days is None:
+            ttl_days = float(os.environ.get("YANDEX_ORG_CACHE_TTL_DAYS", "365"))
+        if negative_days is None:
+            negative_days = float(os.environ.get("YANDEX_ORG_CACHE_NEGATIVE_DAYS", "7"))
+        self._ttl = ttl_days * _DAY
+        self._negative_ttl = negative_days * _DAY
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "writes": 0, "forgotten": 0, "errors": 0}
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS yandex_org_id ("
+            " key TEXT PRIMARY KEY,"
+            " name TEXT,"
+            " address TEXT,"
+            " org_id TEXT,"
+            " resolved_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["OrgIdCache"]:
+        """Кэш с настройками из env; None — если выключен (YANDEX_ORG_CACHE=0) или файл недоступен."""
+        if os.environ.get("YANDEX_ORG_CACHE", "1") == "0":
+            return None
+        try:
+            return cls()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Кэш org_id недоступен: {e}", flush=True)
+            return None
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def lookup(self, name: str, address: str) -> tuple[str, Optional[str]]:
+        """
+        (ORG_HIT, org_id) — org_id известен; (ORG_NOT_FOUND, None) — недавно не нашли;
+        (ORG_MISS, None) — записи нет или она устарела, нужен поиск.
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT org_id, resolved_at FROM yandex_org_id WHERE key = ?", (org_cache_key(name, address),)
+                ).fetchone()
+        except sqlite3.Error:
+            self._count("errors")
+            row = None
+        if row is not None:
+            org_id, resolved_at = row
+            age = time.time() - float(resolved_at)
+            if org_id and age <= self._ttl:
+                self._count("hits")
+                return ORG_HIT, str(org_id)
+            if not org_id and age <= self._negative_ttl:
+                self._count("negative_hits")
+                return ORG_NOT_FOUND, None
+        self._count("misses")
+        return ORG_MISS, None
+
+    def store(self, name: str, address: str, org_id: Optional[str]) -> None:
+        """Записать результат поиска: org_id или None («не найдено»)."""
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO yandex_org_id (key, name, address, org_id, resolved_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (org_cache_key(name, address), name, address, org_id, time.time()),
+                )
+                self._conn.commit()
+                self.stats["writes"] += 1
+        except sqlite3.Error:
+            self._count("errors")
+
+    def forget(self, name: str, address: str) -> None:
+        """Удалить запись (org_id из кэша оказался неверным — в следующий раз искать заново)."""
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM yandex_org_id WHERE key = ?", (org_cache_key(name, address),))
+                self._conn.commit()
+                self.stats["forgotten"] += 1
+        except sqlite3.Error:
+            self._count("errors")
+
+    def stats_snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def review_key(author: str, date: Any) -> str:
+    """
+    Ключ отзыва внутри заведения: автор + дата публикации. По нему же парсер узнаёт
+    уже известный отзыв прямо на странице, не разбирая текст.
+    """
+    try:
+        date_s = f"{float(date or 0):.0f}"
+    except (TypeError, ValueError):
+        date_s = str(date)
+    return hashlib.sha1(f"{author or ''}|{date_s}".encode("utf-8")).hexdigest()
+
+
+def review_content_hash(review: dict[str, Any]) -> str:
+    """Хэш содержимого отзыва (автор, дата, текст, оценка, ответ) — видно, что отзыв отредактирован."""
+    payload = [review.get(k) for k in ("name", "date", "text", "stars", "answer")]
+    return hashlib.sha1(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def _stored_key(review: dict[str, Any]) -> str:
+    # Без автора и даты (разметка не распарсилась) различаем отзывы только по содержимому
+    if not review.get("name") and not review.get("date"):
+        return review_content_hash(review)
+    return review_key(review.get("name"), review.get("date"))
+
+
+class ReviewStore:
+    """
+    Отзывы заведений по org_id + счётчики за один прогон (new / updated / unchanged / dropped / errors).
+    Потокобезопасен: заведения парсятся из нескольких потоков (--workers).
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_per_org: Optional[int] = None,
+        ttl_days: Optional[float] = None,
+    ):
+        self.path = path or os.environ.get("YANDEX_REVIEW_STORE_PATH") or str(
+            Path(__file__).resolve().parent / "cache" / "yandex_reviews.sqlite"
+        )
+        if max_per_org is None:
+            max_per_org = int(os.environ.get("YANDEX_REVIEW_STORE_MAX_PER_ORG", "150"))
+        if ttl_days is None:
+            ttl_days = float(os.environ.get("YANDEX_REVIEW_STORE_TTL_DAYS", "30"))
+        self.max_per_org = max(1, max_per_org)
+        self._ttl = ttl_days * _DAY
+        self._lock = threading.Lock()
+        self.stats = {"new": 0, "updated": 0, "unchanged": 0, "dropped": 0, "errors": 0}
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS yandex_reviews ("
+            " org_id TEXT NOT NULL,"
+            " review_key TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " date REAL,"
+            " review TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " PRIMARY KEY (org_id, review_key))"
+        )
+        # Когда заведение последний раз парсилось целиком (без остановки на известном отзыве)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS yandex_review_orgs ("
+            " org_id TEXT PRIMARY KEY,"
+            " full_scraped_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["ReviewStore"]:
+        """Хранилище с настройками из env; None — если выключено (YANDEX_REVIEW_STORE=0) или файл недоступен."""
+        if os.environ.get("YANDEX_REVIEW_STORE", "1") == "0":
+            return None
+        try:
+            return cls()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Хранилище отзывов недоступно: {e}", flush=True)
+            return None
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += n
+
+    def known_keys(self, org_id: str) -> set[str]:
+        """
+        Ключи (review_key) уже сохранённых отзывов заведения. Пустое множество — нужен полный
+        парсинг: отзывов нет или полный парсинг был раньше YANDEX_REVIEW_STORE_TTL_DAYS.
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT full_scraped_at FROM yandex_review_orgs WHERE org_id = ?", (str(org_id),)
+                ).fetchone()
+                if row is None or time.time() - float(row[0]) > self._ttl:
+                    return set()
+                rows = self._conn.execute(
+                    "SELECT review_key FROM yandex_reviews WHERE org_id = ?", (str(org_id),)
+                ).fetchall()
+        except sqlite3.Error:
+            self._count("errors")
+            return set()
+        return {row[0] for row in rows}
+
+    def reviews(self, org_id: str) -> list[dict[str, Any]]:
+        """Все сохранённые отзывы заведения, новые первыми."""
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT review FROM yandex_reviews WHERE org_id = ? ORDER BY date DESC, review_key",
+                    (str(org_id),),
+                ).fetchall()
+        except sqlite3.Error:
+            self._count("errors")
+            return []
+        return [json.loads(row[0]) for row in rows]
+
+    def merge(
+        self, org_id: str, fresh: list[dict[str, Any]], full: bool = False
+    ) -> tuple[list[dict[str, Any]], int]:
+        """
+        Дописать свежие отзывы (новые — вставка, изменённые по хэшу — замена) и вернуть
+        (объединённый набор заведения, новыми первыми; число новых отзывов).
+        full=True — отзывы собраны полным парсингом: сохранённые заменяются ими целиком
+        (пустой результат ничего не удаляет — скорее сбой разметки, чем заведение без отзывов).
+        В хранилище остаются max_per_org самых новых отзывов заведения.
+        """
+        now = time.time()
+        counts = {"new": 0, "updated": 0, "unchanged": 0, "dropped": 0}
+        org_id = str(org_id)
+        try:
+            with self._lock:
+                stored = dict(self._conn.execute(
+                    "SELECT review_key, content_hash FROM yandex_reviews WHERE org_id = ?", (org_id,)
+                ).fetchall())
+                replace = full and bool(fresh)
+                rows = []
+                for review in fresh:
+                    key, digest = _stored_key(review), review_content_hash(review)
+                    if stored.get(key) == digest:
+                        counts["unchanged"] += 1
+                        if not replace:
+                            continue
+                    else:
+                        counts["updated" if key in stored else "new"] += 1
+                        stored[key] = digest
+                    rows.append((
+                        org_id, key, digest, float(review.get("date") or 0),
+                        json.dumps(review, ensure_ascii=False), now,
+                    ))
+                if replace:
+                    # Сохранённые отзывы, которых нет в полном парсинге, — удалены на Картах
+                    counts["dropped"] += len(set(stored) - {row[1] for row in rows})
+                    self._conn.execute("DELETE FROM yandex_reviews WHERE org_id = ?", (org_id,))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO yandex_reviews"
+                    " (org_id, review_key, content_hash, date, review, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                if replace:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO yandex_review_orgs (org_id, full_scraped_at) VALUES (?, ?)",
+                        (org_id, now),
+                    )
+                # Лишние старые отзывы — в той же транзакции, что и запись
+                counts["dropped"] += self._conn.execute(
+                    "DELETE FROM yandex_reviews WHERE org_id = ? AND review_key NOT IN ("
+                    " SELECT review_key FROM yandex_reviews WHERE org_id = ?"
+                    " ORDER BY date DESC, review_key LIMIT ?)",
+                    (org_id, org_id, self.max_per_org),
+                ).rowcount
+                self._conn.commit()
+                for name, n in counts.items():
+                    self.stats[name] += n
+        except sqlite3.Error:
+            self._count("errors")
+            return list(fresh), len(fresh)
+        return self.reviews(org_id), counts["new"]
+
+    def stats_snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()